@@ -8,21 +8,73 @@ import os
 from siu_routes import siu_bp
 from scheduler_routes import scheduler_bp
 from feedback_routes import feedback_bp
+import metricas
+import busqueda
+import periodos
+import grafo_conflictos
+import versiones
+import feedback
+import usuarios
+from horarios import mascara_intervalo, mascara_a_blob
+import db
+from db import get_db
 
 app = Flask(__name__)
 CORS(app)
 
-DATABASE = 'scheduler.db'
+def agregar_columna_si_falta(cursor, tabla, columna, definicion):
+    """ALTER TABLE ADD COLUMN sólo si la columna todavía no existe"""
+    cursor.execute(f'PRAGMA table_info({tabla})')
+    if columna not in [row['name'] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}')
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+def migrar_horarios(cursor):
+    """
+    Agrega clases.inicio_min/fin_min y cursos.mascara a las BDs viejas
+    y completa las filas que todavía no los tienen
+    """
+    agregar_columna_si_falta(cursor, 'clases', 'inicio_min', 'INTEGER')
+    agregar_columna_si_falta(cursor, 'clases', 'fin_min', 'INTEGER')
+    agregar_columna_si_falta(cursor, 'cursos', 'mascara', 'BLOB')
+    
+    cursor.execute('''
+        UPDATE clases SET
+            inicio_min = CAST(substr(hora_inicio, 1, instr(hora_inicio, ':') - 1) AS INTEGER) * 60
+                       + CAST(substr(hora_inicio, instr(hora_inicio, ':') + 1) AS INTEGER),
+            fin_min = CAST(substr(hora_fin, 1, instr(hora_fin, ':') - 1) AS INTEGER) * 60
+                    + CAST(substr(hora_fin, instr(hora_fin, ':') + 1) AS INTEGER)
+        WHERE inicio_min IS NULL OR fin_min IS NULL
+    ''')
+    
+    cursor.execute('''
+        SELECT cl.curso_codigo, cl.dia, cl.inicio_min, cl.fin_min
+        FROM clases cl
+        JOIN cursos c ON cl.curso_codigo = c.codigo
+        WHERE c.mascara IS NULL
+    ''')
+    mascaras = {}
+    for row in cursor.fetchall():
+        mascaras[row['curso_codigo']] = mascaras.get(row['curso_codigo'], 0) | mascara_intervalo(
+            row['dia'], row['inicio_min'], row['fin_min']
+        )
+    cursor.executemany(
+        'UPDATE cursos SET mascara = ? WHERE codigo = ?',
+        [(mascara_a_blob(mascara), codigo) for codigo, mascara in mascaras.items()]
+    )
 
 def init_db():
     """Initialize the database with normalized tables using natural primary keys"""
     conn = get_db()
+    crear_esquema(conn)
+    conn.commit()
+    conn.close()
+
+def crear_esquema(conn):
+    """
+    Crea las tablas e índices que falten y migra las BDs viejas, sobre
+    'conn' y sin hacer commit (importar_siu.py --dry-run lo usa sobre una
+    copia en memoria)
+    """
     cursor = conn.cursor()
     
     # Tabla de usuarios - PADRON como PRIMARY KEY
@@ -55,6 +107,9 @@ def init_db():
             sede TEXT DEFAULT 'Sede desconocida',
             modalidad TEXT DEFAULT 'sin_confirmar',
             votos_modalidad INTEGER DEFAULT 0,
+            mascara BLOB,
+            huella TEXT,
+            retirado INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (materia_codigo) REFERENCES materias(codigo) ON DELETE CASCADE,
             UNIQUE(materia_codigo, numero_curso, periodo)
@@ -88,6 +143,8 @@ def init_db():
             dia INTEGER NOT NULL,
             hora_inicio TEXT NOT NULL,
             hora_fin TEXT NOT NULL,
+            inicio_min INTEGER,
+            fin_min INTEGER,
             FOREIGN KEY (curso_codigo) REFERENCES cursos(codigo) ON DELETE CASCADE
         )
     ''')
@@ -107,15 +164,61 @@ def init_db():
         )
     ''')
     
+    # Conteos de votos por modalidad, mantenidos en la misma transacción que cada voto
+    feedback.crear_tabla_conteos(cursor)
+    
+    # Migración: horarios en minutos enteros y máscara semanal precompilada
+    migrar_horarios(cursor)
+    
+    # Migración: huella de contenido y baja lógica para la importación diferencial
+    agregar_columna_si_falta(cursor, 'cursos', 'huella', 'TEXT')
+    agregar_columna_si_falta(cursor, 'cursos', 'retirado', 'INTEGER DEFAULT 0')
+    
+    # 7. GRAFO DE CONFLICTOS - Pares de cursos que se solapan (en ambos sentidos)
+    # Se calcula al importar del SIU para no recalcular solapamientos en cada pedido
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conflictos_cursos (
+            curso_a TEXT NOT NULL,
+            curso_b TEXT NOT NULL,
+            periodo TEXT NOT NULL,
+            PRIMARY KEY (curso_a, curso_b),
+            FOREIGN KEY (curso_a) REFERENCES cursos(codigo) ON DELETE CASCADE,
+            FOREIGN KEY (curso_b) REFERENCES cursos(codigo) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conflictos_periodos (
+            periodo TEXT PRIMARY KEY,
+            actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # 8. VERSIONES - Contadores para los ETags de los endpoints de lectura
+    versiones.crear_tabla(cursor)
+    
+    # 9. BÚSQUEDA - Índice FTS5 de materias, cátedras y docentes
+    busqueda.crear_tabla(cursor)
+    
+    # 10. CONFIGURACIÓN - Periodo activo
+    periodos.crear_tabla(cursor)
+    
     # Índices
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_last_login ON users(last_login)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_cursos_materia ON cursos(materia_codigo)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cursos_periodo ON cursos(periodo)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cursos_modalidad ON cursos(modalidad)')
+    # Consultas por periodo (y materia dentro del periodo); reemplaza al índice sólo por periodo
+    cursor.execute('DROP INDEX IF EXISTS idx_cursos_periodo')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cursos_periodo_materia ON cursos(periodo, materia_codigo)')
+    # Filtro de /api/feedback/todos-cursos; reemplaza al índice sólo por modalidad
+    cursor.execute('DROP INDEX IF EXISTS idx_cursos_modalidad')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cursos_modalidad_sede ON cursos(modalidad, sede)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_clases_curso ON clases(curso_codigo)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_feedback_curso ON feedback_modalidad(curso_codigo)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_conflictos_periodo ON conflictos_cursos(periodo)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_conflictos_curso_b ON conflictos_cursos(curso_b)')
     
-    conn.commit()
-    conn.close()
+    # Calcular el grafo de conflictos de los periodos que todavía no lo tienen
+    grafo_conflictos.construir_faltantes(conn)
 
 # Registrar blueprints
 app.register_blueprint(siu_bp, url_prefix='/api/siu')
@@ -135,24 +238,23 @@ def login():
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM users WHERE padron = ?', (padron,))
+        cursor.execute('SELECT last_login FROM users WHERE padron = ?', (padron,))
         user = cursor.fetchone()
         
         if user:
-            cursor.execute(
-                'UPDATE users SET last_login = ? WHERE padron = ?',
-                (datetime.now(), padron)
-            )
-            conn.commit()
+            # El last_login se escribe más tarde, junto con el de los demás logins
+            usuarios.registrar_login(padron, user['last_login'])
             message = 'Login exitoso'
             is_new_user = False
         else:
             try:
                 cursor.execute('INSERT INTO users (padron) VALUES (?)', (padron,))
                 conn.commit()
+                usuarios.registrar_alta()
                 message = 'Usuario registrado exitosamente'
                 is_new_user = True
             except sqlite3.IntegrityError:
+                usuarios.registrar_login(padron)
                 message = 'Login exitoso'
                 is_new_user = False
         
@@ -171,6 +273,7 @@ def login():
 def get_users():
     """Get all users"""
     try:
+        usuarios.vaciar()
         conn = get_db()
         cursor = conn.cursor()
         
@@ -204,7 +307,12 @@ def get_user(padron):
         if not user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
-        return jsonify({'user': dict(user)}), 200
+        user = dict(user)
+        pendiente = usuarios.login_pendiente(padron)
+        if pendiente:
+            user['last_login'] = pendiente
+        
+        return jsonify({'user': user}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -220,6 +328,7 @@ def delete_user(padron):
         deleted = cursor.rowcount
         conn.commit()
         conn.close()
+        usuarios.registrar_baja(padron)
         
         if deleted == 0:
             return jsonify({'error': 'Usuario no encontrado'}), 404
@@ -235,45 +344,7 @@ def delete_user(padron):
 def get_stats():
     """Get database statistics"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as total FROM users')
-        total_users = cursor.fetchone()['total']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as today 
-            FROM users 
-            WHERE DATE(created_at) = DATE('now')
-        ''')
-        new_users = cursor.fetchone()['today']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as active 
-            FROM users 
-            WHERE DATE(last_login) = DATE('now')
-        ''')
-        active_users = cursor.fetchone()['active']
-        
-        cursor.execute('SELECT COUNT(*) as total FROM materias')
-        total_materias = cursor.fetchone()['total']
-        
-        cursor.execute('SELECT COUNT(*) as total FROM cursos')
-        total_cursos = cursor.fetchone()['total']
-        
-        cursor.execute('SELECT COUNT(*) as total FROM docentes')
-        total_docentes = cursor.fetchone()['total']
-        
-        conn.close()
-        
-        return jsonify({
-            'total_users': total_users,
-            'new_users_today': new_users,
-            'active_users_today': active_users,
-            'total_materias': total_materias,
-            'total_cursos': total_cursos,
-            'total_docentes': total_docentes
-        }), 200
+        return jsonify(usuarios.estadisticas_generales()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -284,12 +355,17 @@ def health():
     return jsonify({
         'status': 'ok', 
         'message': 'Backend is running',
-        'database': 'connected' if os.path.exists(DATABASE) else 'not found'
+        'database': 'connected' if os.path.exists(db.DATABASE) else 'not found'
     }), 200
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métricas internas (caches, colas, etc.)"""
+    return jsonify(metricas.recolectar()), 200
+
 if __name__ == '__main__':
     # Initialize database on startup
-    if not os.path.exists(DATABASE):
+    if not os.path.exists(db.DATABASE):
         print('Creating database...')
         init_db()
         print('✅ Database created successfully!')
@@ -304,6 +380,7 @@ if __name__ == '__main__':
     print('📍 Health: http://localhost:5000/api/health')
     print('📍 Stats:  http://localhost:5000/api/stats')
     print('📍 Users:  http://localhost:5000/api/users')
+    print('📍 Metrics: http://localhost:5000/api/metrics')
     print('\n📚 SIU Endpoints:')
     print('📍 Parse SIU: POST http://localhost:5000/api/siu/parse-siu')
     print('📍 Ver materias: GET http://localhost:5000/api/siu/materias')
@@ -0,0 +1,146 @@
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List
+
+from db import get_db
+
+# Pesos de bm25 por columna: nombre de materia, código, cátedra, docentes
+# (la primera columna, curso_codigo, no se indexa)
+PESOS_BM25 = (0.0, 10.0, 5.0, 3.0, 1.0)
+LIMITE_MAXIMO = 50
+
+# Palabras de la consulta; todo lo demás (puntos, guiones, comillas) separa
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def crear_tabla(cursor) -> None:
+    """
+    Crea el índice de búsqueda y lo llena si está vacío y ya hay cursos (la llama init_db).
+
+    Hay una fila por curso activo, con el mismo rowid que en cursos, así
+    una importación puede reemplazar las filas de los cursos que tocó.
+    remove_diacritics 2 hace que 'analisis' encuentre 'Análisis'.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5(
+            curso_codigo UNINDEXED,
+            materia_nombre,
+            materia_codigo,
+            catedra,
+            docentes,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM busqueda_fts)')
+    if not cursor.fetchone()[0]:
+        _indexar(cursor, 'c.retirado = 0', [])
+
+
+def _indexar(cursor, filtro: str, params: List[Any]) -> None:
+    cursor.execute(f'''
+        INSERT INTO busqueda_fts (rowid, curso_codigo, materia_nombre, materia_codigo, catedra, docentes)
+        SELECT c.rowid, c.codigo, m.nombre, m.codigo, COALESCE(c.catedra, ''),
+               COALESCE((SELECT GROUP_CONCAT(cd.docente_nombre, ', ')
+                         FROM curso_docentes cd WHERE cd.curso_codigo = c.codigo), '')
+        FROM cursos c
+        JOIN materias m ON c.materia_codigo = m.codigo
+        WHERE {filtro}
+    ''', params)
+
+
+def actualizar(conn: sqlite3.Connection, cursos: Iterable[str], materias: Iterable[str] = ()) -> int:
+    """
+    Reindexa los cursos indicados y todos los de las materias indicadas
+    (p. ej. renombradas), dentro de la transacción de 'conn'.
+    Los cursos retirados quedan fuera del índice.
+
+    Retorna la cantidad de cursos reindexados.
+    """
+    cursor = conn.cursor()
+    cursos = list(dict.fromkeys(cursos))
+    materias = list(dict.fromkeys(materias))
+    reindexados = 0
+
+    for columna, valores in (('c.codigo', cursos), ('c.materia_codigo', materias)):
+        for i in range(0, len(valores), 500):
+            lote = valores[i:i + 500]
+            marcadores = ','.join('?' * len(lote))
+            cursor.execute(f'''
+                DELETE FROM busqueda_fts WHERE rowid IN (
+                    SELECT c.rowid FROM cursos c WHERE {columna} IN ({marcadores})
+                )
+            ''', lote)
+            _indexar(cursor, f'{columna} IN ({marcadores}) AND c.retirado = 0', lote)
+            reindexados += len(lote)
+
+    return reindexados
+
+
+def armar_consulta(texto: str) -> str:
+    """
+    Convierte lo que escribió el usuario en una consulta FTS5: cada palabra
+    entre comillas (así no se interpreta la sintaxis de FTS5) y como prefijo,
+    para que sirva mientras se escribe. Lanza ValueError si no hay palabras.
+    """
+    palabras = _PALABRA.findall(texto)
+    if not palabras:
+        raise ValueError('La búsqueda no tiene palabras')
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar(texto: str, limite: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Busca materias por nombre o código y cursos por cátedra o docente,
+    sin importar acentos ni mayúsculas. Devuelve materias ordenadas por
+    relevancia (bm25 del mejor de sus cursos), cada una con los cursos que
+    coincidieron; 'limite' y 'offset' paginan sobre las materias.
+    """
+    consulta = armar_consulta(texto)
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            WITH coincidencias AS (
+                SELECT curso_codigo, materia_codigo, materia_nombre, catedra, docentes,
+                       bm25(busqueda_fts, {pesos}) AS puntaje
+                FROM busqueda_fts
+                WHERE busqueda_fts MATCH ?
+            ),
+            pagina AS (
+                SELECT materia_codigo, MIN(puntaje) AS puntaje
+                FROM coincidencias
+                GROUP BY materia_codigo
+                ORDER BY puntaje, materia_codigo
+                LIMIT ? OFFSET ?
+            )
+            SELECT co.curso_codigo, co.materia_codigo, co.materia_nombre, co.catedra, co.docentes,
+                   c.numero_curso, c.periodo, p.puntaje AS puntaje_materia
+            FROM coincidencias co
+            JOIN pagina p ON p.materia_codigo = co.materia_codigo
+            JOIN cursos c ON c.codigo = co.curso_codigo
+            ORDER BY p.puntaje, co.materia_codigo, co.puntaje, c.numero_curso
+        ''', (consulta, limite, offset))
+        filas = cursor.fetchall()
+    finally:
+        conn.close()
+
+    resultados: Dict[str, Dict[str, Any]] = {}
+    for fila in filas:
+        materia = resultados.get(fila['materia_codigo'])
+        if materia is None:
+            materia = resultados[fila['materia_codigo']] = {
+                'materia': {'codigo': fila['materia_codigo'], 'nombre': fila['materia_nombre']},
+                'puntaje': round(-fila['puntaje_materia'], 4),
+                'cursos': []
+            }
+        materia['cursos'].append({
+            'codigo': fila['curso_codigo'],
+            'numero_curso': fila['numero_curso'],
+            'periodo': fila['periodo'],
+            'catedra': fila['catedra'] or None,
+            'docentes': fila['docentes'].split(', ') if fila['docentes'] else []
+        })
+
+    return list(resultados.values())
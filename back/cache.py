@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class LRUCache:
+    """
+    Cache acotado con política LRU, seguro para usar desde varios threads.
+    Lleva la cuenta de aciertos y fallos para reportarlos en las métricas.
+    """
+
+    def __init__(self, capacidad: int = 1024):
+        self.capacidad = capacidad
+        self._datos: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener_o_calcular(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el valor cacheado para la clave o lo calcula y lo guarda"""
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave]
+            self.fallos += 1
+
+        # Se calcula fuera del lock: si dos threads calculan lo mismo
+        # a la vez, el resultado es idéntico y el segundo pisa al primero.
+        valor = calcular()
+
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+        return valor
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'tamanio': len(self._datos),
+                'capacidad': self.capacidad,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+class TTLCache:
+    """
+    Cache de valores que vencen a los 'ttl' segundos, seguro para usar desde
+    varios threads. Sirve para agregados que pueden estar un poco viejos,
+    como los contadores de /api/stats.
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = ttl
+        self._datos: Dict[Hashable, Any] = {}
+        self._vence: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener_o_calcular(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el valor cacheado si no venció, o lo calcula y lo guarda"""
+        with self._lock:
+            if clave in self._datos and self._vence[clave] > time.monotonic():
+                self.aciertos += 1
+                return self._datos[clave]
+            self.fallos += 1
+
+        valor = calcular()
+
+        with self._lock:
+            ahora = time.monotonic()
+            for vencida in [c for c, vence in self._vence.items() if vence <= ahora]:
+                del self._datos[vencida], self._vence[vencida]
+            self._datos[clave] = valor
+            self._vence[clave] = ahora + self.ttl
+        return valor
+
+    def actualizar(self, clave: Hashable, funcion: Callable[[Any], Any]) -> None:
+        """
+        Reemplaza el valor cacheado por funcion(valor), sin cambiar cuándo vence.
+        Si la clave no está o ya venció no hace nada: se recalculará al pedirla.
+        """
+        with self._lock:
+            if clave in self._datos and self._vence[clave] > time.monotonic():
+                self._datos[clave] = funcion(self._datos[clave])
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+            self._vence.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'tamanio': len(self._datos),
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
@@ -0,0 +1,296 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import db
+import metricas
+import versiones
+from db import get_db
+
+
+def _entero_sqlite(texto: str) -> int:
+    """Lo mismo que CAST(texto AS INTEGER) en SQLite: el número del principio, o 0"""
+    digitos = ''
+    for i, caracter in enumerate(texto.strip()):
+        if caracter.isdigit() or (i == 0 and caracter in '+-'):
+            digitos += caracter
+        else:
+            break
+    try:
+        return int(digitos)
+    except ValueError:
+        return 0
+
+
+class Catalogo:
+    """
+    Foto inmutable del catálogo (materias, cursos, docentes y clases) en una versión.
+
+    Se arma entera fuera de línea y se instala con un cambio de referencia, así
+    los lectores nunca ven una importación a medias ni compiten con ella por
+    SQLite. Nadie la modifica después de construida: un cambio arma una foto
+    nueva (con_cambios copia sólo los cursos que cambiaron y comparte el resto).
+
+    Los datos de cada curso tienen la forma de scheduler.obtener_datos_curso y
+    se comparten entre pedidos, por eso no hay que modificarlos.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        ruta: str,
+        materias: Dict[str, Dict[str, Any]],
+        cursos: Dict[str, Dict[str, Any]],
+        votos: Dict[str, int],
+        retirados: FrozenSet[str],
+        _orden: Optional[Tuple[List[str], List[Tuple[str, str, str]], Dict[str, List[str]], List[Dict]]] = None
+    ):
+        self.version = version
+        self.ruta = ruta
+        self.materias = materias
+        self.cursos = cursos
+        self.votos = votos
+        self.retirados = retirados
+
+        if _orden is None:
+            # Mismo orden que ORDER BY m.nombre, c.numero_curso, c.codigo
+            activos = sorted(
+                (c for codigo, c in cursos.items() if codigo not in retirados),
+                key=lambda c: (c['materia']['nombre'], c['numero_curso'], c['codigo'])
+            )
+            ordenados = [c['codigo'] for c in activos]
+            claves = [(c['materia']['nombre'], c['numero_curso'], c['codigo']) for c in activos]
+
+            # Cursos de cada materia como ORDER BY CAST(numero_curso AS INTEGER)
+            por_materia = defaultdict(list)
+            for curso in sorted(activos, key=lambda c: (_entero_sqlite(c['numero_curso']), c['numero_curso'], c['codigo'])):
+                por_materia[curso['materia']['codigo']].append(curso['codigo'])
+
+            materias_ordenadas = sorted(materias.values(), key=lambda m: (m['nombre'], m['codigo']))
+            _orden = (ordenados, claves, dict(por_materia), materias_ordenadas)
+
+        # El orden no depende de la modalidad ni de la sede, así que las fotos
+        # hechas con con_cambios lo comparten con la original
+        self._orden = _orden
+        self._ordenados, self._claves, self._por_materia, self.materias_ordenadas = _orden
+
+    def curso(self, codigo: str) -> Optional[Dict[str, Any]]:
+        return self.cursos.get(codigo)
+
+    def cursos_de_materia(self, materia_codigo: str, periodo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Cursos vigentes de una materia ordenados por número"""
+        cursos = (self.cursos[codigo] for codigo in self._por_materia.get(materia_codigo, ()))
+        return [c for c in cursos if periodo is None or c['periodo'] == periodo]
+
+    def listar(
+        self,
+        periodo: Optional[str] = None,
+        materia: Optional[str] = None,
+        despues: Optional[List[str]] = None,
+        limite: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Cursos vigentes en orden (materia, número de curso, código). Con
+        'despues' (clave de orden del último curso visto) arranca a continuación
+        con una búsqueda binaria, como un keyset sobre la foto.
+        """
+        inicio = bisect_right(self._claves, tuple(despues)) if despues else 0
+        devueltos = 0
+        for codigo in self._ordenados[inicio:]:
+            if limite is not None and devueltos >= limite:
+                return
+            curso = self.cursos[codigo]
+            if periodo is not None and curso['periodo'] != periodo:
+                continue
+            if materia is not None and curso['materia']['codigo'] != materia:
+                continue
+            devueltos += 1
+            yield curso
+
+    def con_cambios(self, filas: Iterable[Any], version: int) -> 'Catalogo':
+        """
+        Foto nueva con la modalidad, sede y votos de algunos cursos cambiados
+        (copy-on-write): copia el índice de cursos y comparte todo lo demás.
+        """
+        cursos = dict(self.cursos)
+        votos = dict(self.votos)
+        for fila in filas:
+            anterior = cursos.get(fila['codigo'])
+            if anterior is None:
+                continue
+            cursos[fila['codigo']] = dict(anterior, modalidad=fila['modalidad'], sede=fila['sede'])
+            votos[fila['codigo']] = fila['votos_modalidad']
+        return Catalogo(version, self.ruta, self.materias, cursos, votos, self.retirados, self._orden)
+
+
+_foto: Optional[Catalogo] = None
+_construyendo = threading.Lock()
+_stats = {
+    'construcciones': 0,
+    'copias': 0,
+    'ultima_construccion_ms': 0.0
+}
+
+
+def _construir(ruta: str) -> Catalogo:
+    """Lee el catálogo entero dentro de una única transacción de lectura"""
+    inicio = time.perf_counter()
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute("SELECT version FROM versiones WHERE nombre = 'catalogo'")
+        fila = cursor.fetchone()
+        version = fila[0] if fila else 0
+
+        cursor.execute('SELECT codigo, nombre, creditos FROM materias')
+        materias = {fila['codigo']: dict(fila) for fila in cursor.fetchall()}
+
+        docentes = defaultdict(list)
+        cursor.execute('SELECT curso_codigo, docente_nombre FROM curso_docentes ORDER BY curso_codigo, docente_nombre')
+        for fila in cursor.fetchall():
+            docentes[fila['curso_codigo']].append(fila['docente_nombre'])
+
+        clases = defaultdict(list)
+        cursor.execute('''
+            SELECT curso_codigo, dia, hora_inicio, hora_fin, inicio_min, fin_min
+            FROM clases
+            ORDER BY curso_codigo, dia, inicio_min
+        ''')
+        for fila in cursor.fetchall():
+            clases[fila['curso_codigo']].append({
+                'dia': fila['dia'],
+                'hora_inicio': fila['hora_inicio'],
+                'hora_fin': fila['hora_fin'],
+                'inicio_min': fila['inicio_min'],
+                'fin_min': fila['fin_min']
+            })
+
+        cursor.execute('''
+            SELECT c.codigo, c.numero_curso, c.catedra, c.periodo, c.sede, c.modalidad,
+                   c.votos_modalidad, c.retirado, m.codigo as materia_codigo
+            FROM cursos c
+            JOIN materias m ON c.materia_codigo = m.codigo
+        ''')
+        cursos, votos, retirados = {}, {}, set()
+        for fila in cursor.fetchall():
+            materia = materias[fila['materia_codigo']]
+            cursos[fila['codigo']] = {
+                'codigo': fila['codigo'],
+                'numero_curso': fila['numero_curso'],
+                'catedra': fila['catedra'],
+                'periodo': fila['periodo'],
+                'sede': fila['sede'],
+                'modalidad': fila['modalidad'],
+                'materia': {
+                    'codigo': materia['codigo'],
+                    'nombre': materia['nombre']
+                },
+                'clases': clases.get(fila['codigo'], []),
+                'docentes': docentes.get(fila['codigo'], []),
+                'retirado': bool(fila['retirado'])
+            }
+            votos[fila['codigo']] = fila['votos_modalidad']
+            if fila['retirado']:
+                retirados.add(fila['codigo'])
+        conn.commit()
+    finally:
+        conn.close()
+
+    foto = Catalogo(version, ruta, materias, cursos, votos, frozenset(retirados))
+    _stats['construcciones'] += 1
+    _stats['ultima_construccion_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    return foto
+
+
+def _instalar(foto: Catalogo) -> Catalogo:
+    """Cambia la foto vigente por 'foto' salvo que la vigente ya sea más nueva"""
+    global _foto
+    vigente = _foto
+    if vigente is None or vigente.ruta != foto.ruta or foto.version >= vigente.version:
+        _foto = foto
+    return _foto
+
+
+def actual() -> Catalogo:
+    """
+    Foto vigente del catálogo. Si otro proceso o un cambio no avisado subió la
+    versión, la reconstruye un solo hilo y los demás esperan a esa foto: con
+    con_etag el ETag ya salió de la versión nueva, y servir la foto anterior
+    con ese ETag dejaría al cliente con datos viejos hasta el próximo cambio.
+    """
+    ruta = os.path.abspath(db.DATABASE)
+    foto = _vigente(ruta)
+    if foto is not None and foto.version >= versiones.actual('catalogo'):
+        return foto
+
+    with _construyendo:
+        # Otro hilo pudo haberla reconstruido mientras se esperaba
+        vigente = _vigente(ruta)
+        if vigente is not None and vigente.version >= versiones.actual('catalogo'):
+            return vigente
+        return _instalar(_construir(ruta))
+
+
+def _vigente(ruta: str) -> Optional[Catalogo]:
+    foto = _foto
+    return foto if foto is not None and foto.ruta == ruta else None
+
+
+def recargar() -> Optional[Catalogo]:
+    """
+    Arma una foto nueva desde la BD y la instala (p. ej. después de importar),
+    antes de publicar la versión nueva, así el primer pedido ya la encuentra.
+    Si todavía nadie leyó el catálogo no hace nada: la arma el primer lector.
+    """
+    ruta = os.path.abspath(db.DATABASE)
+    with _construyendo:
+        if _vigente(ruta) is None:
+            return None
+        return _instalar(_construir(ruta))
+
+
+def actualizar_cursos(codigos: Iterable[str], version: int, incrementos: int = 1) -> Optional[Catalogo]:
+    """
+    Instala una foto con los cursos indicados releídos de la BD, después de un
+    commit que subió la versión del catálogo 'incrementos' veces hasta 'version'
+    (p. ej. un cambio de consenso). Si la foto vigente no es la inmediatamente
+    anterior, algo más cambió en el medio y se reconstruye entera.
+    """
+    codigos = list(dict.fromkeys(codigos))
+    ruta = os.path.abspath(db.DATABASE)
+    with _construyendo:
+        vigente = _vigente(ruta)
+        if vigente is None:
+            return None
+        if vigente.version + incrementos != version:
+            return _instalar(_construir(ruta))
+
+        filas = []
+        if codigos:
+            conn = get_db()
+            try:
+                filas = conn.execute(f'''
+                    SELECT codigo, modalidad, sede, votos_modalidad FROM cursos
+                    WHERE codigo IN ({','.join('?' * len(codigos))})
+                ''', codigos).fetchall()
+            finally:
+                conn.close()
+        _stats['copias'] += 1
+        return _instalar(vigente.con_cambios(filas, version))
+
+
+def estadisticas() -> Dict[str, Any]:
+    foto = _foto
+    return dict(
+        _stats,
+        version=foto.version if foto else None,
+        cursos=len(foto.cursos) if foto else 0,
+        materias=len(foto.materias) if foto else 0
+    )
+
+
+metricas.registrar('catalogo', estadisticas)
@@ -0,0 +1,210 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import catalogo
+import feedback
+import metricas
+import versiones
+from db import get_db
+
+# Tiempo máximo que un voto espera en la cola antes de escribirse
+LATENCIA_MAXIMA = float(os.environ.get('FEEDBACK_LATENCIA_MAXIMA', '0.2'))
+# Votos por transacción como máximo
+LOTE_MAXIMO = int(os.environ.get('FEEDBACK_LOTE_MAXIMO', '500'))
+# Reintentos de un lote con la BD bloqueada (p. ej. detrás de una importación
+# larga), esperando el doble cada vez a partir de ESPERA_REINTENTO segundos
+REINTENTOS = int(os.environ.get('FEEDBACK_REINTENTOS', '6'))
+ESPERA_REINTENTO = 0.1
+
+Voto = Tuple[str, str, Optional[str], str]
+
+_cola: "queue.Queue[Voto]" = queue.Queue()
+_lock = threading.Lock()
+_escritor: Optional[threading.Thread] = None
+_stats = {
+    'encolados': 0,
+    'escritos': 0,
+    'descartados': 0,
+    'reintentos': 0,
+    'lotes': 0,
+    'errores': 0,
+    'ultimo_flush_ms': 0.0,
+    'max_flush_ms': 0.0,
+    'total_flush_ms': 0.0
+}
+
+
+def _escribir_transaccion(votos: List[Voto]):
+    """
+    Escribe los votos en una única transacción: los upserts, los conteos, un
+    solo incremento de la versión de votos y el consenso de cada curso tocado
+    una sola vez. Un voto que falla se deshace con su savepoint sin arrastrar
+    al resto; una BD bloqueada (OperationalError) deshace todo y se propaga.
+
+    Retorna (votos fallidos, versión de votos, versión del catálogo, cursos cuyo consenso cambió)
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        tocados = []
+        fallidos = 0
+        for curso_codigo, modalidad, sede, padron in votos:
+            cursor.execute('SAVEPOINT voto')
+            try:
+                if feedback.registrar_voto(conn, curso_codigo, modalidad, sede, padron):
+                    tocados.append(curso_codigo)
+            except sqlite3.OperationalError:
+                raise
+            except Exception as e:
+                cursor.execute('ROLLBACK TO voto')
+                fallidos += 1
+                print(f"Error al escribir el voto de {padron} para {curso_codigo}: {e}")
+            cursor.execute('RELEASE voto')
+
+        version_votos = version_catalogo = None
+        cambiados = []
+        if tocados:
+            version_votos = versiones.incrementar(conn, 'votos')
+            for curso_codigo in dict.fromkeys(tocados):
+                _, version = feedback.aplicar_consenso(conn, curso_codigo)
+                if version is not None:
+                    version_catalogo = version
+                    cambiados.append(curso_codigo)
+        conn.commit()
+        return fallidos, version_votos, version_catalogo, cambiados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _escribir_lote(votos: List[Voto]) -> None:
+    """
+    Escribe un lote de votos ya aceptados (respondidos con 202). Si la BD
+    está bloqueada se reintenta el lote entero con espera exponencial en
+    lugar de descartarlo.
+    """
+    # Si un usuario votó varias veces el mismo curso dentro del lote, vale el último
+    ultimos: Dict[Tuple[str, str], Voto] = {}
+    for voto in votos:
+        ultimos[(voto[0], voto[3])] = voto
+    unicos = list(ultimos.values())
+
+    inicio = time.perf_counter()
+    resultado = None
+    for intento in range(REINTENTOS + 1):
+        if intento:
+            with _lock:
+                _stats['reintentos'] += 1
+            time.sleep(ESPERA_REINTENTO * 2 ** (intento - 1))
+        try:
+            resultado = _escribir_transaccion(unicos)
+            break
+        except sqlite3.OperationalError as e:
+            error = e
+        except Exception as e:
+            error = e
+            break
+
+    if resultado is None:
+        with _lock:
+            _stats['errores'] += 1
+            _stats['descartados'] += len(unicos)
+        print(f"Error al escribir lote de feedback: {error}")
+        return
+    fallidos, version_votos, version_catalogo, cambiados = resultado
+
+    if version_votos is not None:
+        versiones.publicar('votos', version_votos)
+    if version_catalogo is not None:
+        # Cada consenso que cambió subió la versión una vez
+        catalogo.actualizar_cursos(cambiados, version_catalogo, incrementos=len(cambiados))
+        versiones.publicar('catalogo', version_catalogo)
+
+    milisegundos = (time.perf_counter() - inicio) * 1000
+    with _lock:
+        _stats['escritos'] += len(unicos) - fallidos
+        _stats['descartados'] += fallidos
+        _stats['lotes'] += 1
+        _stats['ultimo_flush_ms'] = round(milisegundos, 2)
+        _stats['max_flush_ms'] = max(_stats['max_flush_ms'], round(milisegundos, 2))
+        _stats['total_flush_ms'] += milisegundos
+
+
+def _escribir_siempre() -> None:
+    while True:
+        votos = [_cola.get()]
+        # Juntar lo que llegue hasta cumplir la latencia máxima del primer voto
+        limite = time.monotonic() + LATENCIA_MAXIMA
+        while len(votos) < LOTE_MAXIMO:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                votos.append(_cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        try:
+            _escribir_lote(votos)
+        finally:
+            for _ in votos:
+                _cola.task_done()
+
+
+def _iniciar_escritor() -> None:
+    global _escritor
+    with _lock:
+        if _escritor is None or not _escritor.is_alive():
+            _escritor = threading.Thread(target=_escribir_siempre, name='escritor-feedback', daemon=True)
+            _escritor.start()
+
+
+def encolar(curso_codigo: str, modalidad: str, sede: Optional[str], padron: str) -> Dict:
+    """
+    Valida el voto y lo deja en la cola del escritor; no espera a que se escriba.
+    Un único hilo escritor lo guarda junto con los demás votos del lote.
+    """
+    try:
+        conn = get_db()
+        try:
+            error = feedback.validar_feedback(conn, curso_codigo, modalidad, sede)
+        finally:
+            conn.close()
+        if error:
+            return {'success': False, 'error': error}
+
+        _iniciar_escritor()
+        _cola.put((curso_codigo, modalidad, sede, padron))
+        with _lock:
+            _stats['encolados'] += 1
+        return {'success': True, 'message': 'Feedback recibido'}
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def vaciar() -> None:
+    """Espera a que se escriban todos los votos encolados"""
+    if _escritor is not None and _escritor.is_alive():
+        _cola.join()
+
+
+def estadisticas() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+    total_flush_ms = stats.pop('total_flush_ms')
+    stats['promedio_flush_ms'] = round(total_flush_ms / stats['lotes'], 2) if stats['lotes'] else 0.0
+    stats['en_cola'] = _cola.qsize()
+    stats['latencia_maxima_ms'] = LATENCIA_MAXIMA * 1000
+    return stats
+
+
+atexit.register(vaciar)
+metricas.registrar('cola_feedback', estadisticas)
@@ -0,0 +1,126 @@
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict
+
+import metricas
+
+# Ruta de la BD; se puede cambiar con la variable de entorno SCHEDULER_DB
+DATABASE = os.environ.get('SCHEDULER_DB', 'scheduler.db')
+
+# Conexiones libres que se guardan para reusar
+MAX_CONEXIONES_LIBRES = 16
+# Sentencias preparadas que sqlite3 guarda por conexión
+SENTENCIAS_CACHEADAS = 256
+
+PRAGMAS = (
+    # Lectores y escritor no se bloquean entre sí
+    'PRAGMA journal_mode = WAL',
+    # Con WAL, NORMAL sigue siendo consistente ante caídas y evita un fsync por commit
+    'PRAGMA synchronous = NORMAL',
+    # 16 MB de caché de páginas por conexión
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+    # Esperar el lock de escritura en lugar de fallar con "database is locked"
+    'PRAGMA busy_timeout = 5000',
+)
+
+_libres: "queue.LifoQueue[ConexionCompartida]" = queue.LifoQueue(maxsize=MAX_CONEXIONES_LIBRES)
+_lock = threading.Lock()
+_abiertas = 0
+_reusos = 0
+
+
+class ConexionCompartida(sqlite3.Connection):
+    """
+    Conexión que vuelve al pool en lugar de cerrarse.
+
+    close() revierte cualquier transacción que haya quedado abierta y la
+    deja lista para el próximo get_db(), así el código existente que hace
+    conn = get_db() ... conn.close() reusa conexiones sin cambios.
+    """
+
+    ruta = ''
+    en_pool = False
+
+    def close(self):
+        if self.en_pool:
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = sqlite3.Row
+        self.en_pool = True
+        try:
+            _libres.put_nowait(self)
+        except queue.Full:
+            self.cerrar()
+
+    def cerrar(self):
+        """Cierra la conexión de verdad"""
+        global _abiertas
+        with _lock:
+            _abiertas -= 1
+        super().close()
+
+
+def _conectar(ruta: str) -> ConexionCompartida:
+    global _abiertas
+    conn = sqlite3.connect(
+        ruta,
+        factory=ConexionCompartida,
+        cached_statements=SENTENCIAS_CACHEADAS,
+        check_same_thread=False
+    )
+    conn.ruta = ruta
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _lock:
+        _abiertas += 1
+    return conn
+
+
+def get_db() -> ConexionCompartida:
+    """
+    Devuelve una conexión a la BD, reusando una libre si la hay.
+    Cada conexión la usa un solo hilo a la vez: se toma con get_db()
+    y se devuelve con close().
+    """
+    global _reusos
+    ruta = os.path.abspath(DATABASE)
+    while True:
+        try:
+            conn = _libres.get_nowait()
+        except queue.Empty:
+            return _conectar(ruta)
+        # Si cambió la BD (p. ej. en los tests) la conexión vieja no sirve
+        if conn.ruta != ruta:
+            conn.cerrar()
+            continue
+        conn.en_pool = False
+        with _lock:
+            _reusos += 1
+        return conn
+
+
+def cerrar_todas() -> None:
+    """Cierra las conexiones libres del pool"""
+    while True:
+        try:
+            _libres.get_nowait().cerrar()
+        except queue.Empty:
+            return
+
+
+def estadisticas() -> Dict[str, Any]:
+    return {
+        'ruta': os.path.abspath(DATABASE),
+        'abiertas': _abiertas,
+        'libres': _libres.qsize(),
+        'reusos': _reusos
+    }
+
+
+metricas.registrar('db', estadisticas)
@@ -1,11 +1,115 @@
-import sqlite3
+import os
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
-def get_db():
-    conn = sqlite3.connect('scheduler.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+import catalogo
+import db
+import metricas
+import versiones
+from cache import LRUCache
+from db import get_db
+
+# Votos que necesita una modalidad para quedar confirmada en un curso
+UMBRAL_CONSENSO = 3
+
+# Listados de cursos con modalidad; la clave incluye la versión del catálogo
+_cache_modalidades = LRUCache(capacidad=256)
+metricas.registrar('listado_modalidades', _cache_modalidades.estadisticas)
+
+# En feedback_conteos la sede va como '' cuando es NULL, para que forme parte de la clave
+SIN_SEDE = ''
+
+def crear_tabla_conteos(cursor) -> None:
+    """
+    Crea la tabla de conteos de votos por (curso, modalidad, sede) y la
+    reconstruye desde feedback_modalidad si no coincide (la llama init_db)
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_conteos (
+            curso_codigo TEXT NOT NULL,
+            modalidad TEXT NOT NULL,
+            sede TEXT NOT NULL DEFAULT '',
+            votos INTEGER NOT NULL,
+            PRIMARY KEY (curso_codigo, modalidad, sede)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM feedback_modalidad),
+               (SELECT COALESCE(SUM(votos), 0) FROM feedback_conteos)
+    ''')
+    votos, contados = cursor.fetchone()
+    if votos != contados:
+        cursor.execute('DELETE FROM feedback_conteos')
+        cursor.execute('''
+            INSERT INTO feedback_conteos (curso_codigo, modalidad, sede, votos)
+            SELECT curso_codigo, modalidad, COALESCE(sede, ''), COUNT(*)
+            FROM feedback_modalidad
+            GROUP BY curso_codigo, modalidad, COALESCE(sede, '')
+        ''')
+
+def _sumar_conteo(cursor, curso_codigo: str, modalidad: str, sede: Optional[str], delta: int) -> None:
+    cursor.execute('''
+        INSERT INTO feedback_conteos (curso_codigo, modalidad, sede, votos)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(curso_codigo, modalidad, sede)
+        DO UPDATE SET votos = votos + excluded.votos
+    ''', (curso_codigo, modalidad, sede or SIN_SEDE, delta))
+    if delta < 0:
+        cursor.execute('''
+            DELETE FROM feedback_conteos
+            WHERE curso_codigo = ? AND modalidad = ? AND sede = ? AND votos <= 0
+        ''', (curso_codigo, modalidad, sede or SIN_SEDE))
+
+def registrar_voto(conn, curso_codigo: str, modalidad: str, sede: Optional[str], padron: str) -> bool:
+    """
+    Guarda el voto de un usuario dentro de la transacción de 'conn' y ajusta
+    los conteos: si el usuario ya había votado otra cosa, se le resta a su
+    voto anterior y se le suma al nuevo.
+    
+    Retorna True si el voto cambió algo
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT modalidad, sede FROM feedback_modalidad
+        WHERE curso_codigo = ? AND usuario_padron = ?
+    ''', (curso_codigo, padron))
+    anterior = cursor.fetchone()
+    
+    if anterior and anterior['modalidad'] == modalidad and anterior['sede'] == sede:
+        return False
+    
+    # Si el usuario ya voto por primera vez, se inserta
+    # Si el usuario voto antes, se actualiza su voto (no se suma un voto nuevo)
+    cursor.execute('''
+        INSERT INTO feedback_modalidad (curso_codigo, modalidad, sede, usuario_padron)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(curso_codigo, usuario_padron)
+        DO UPDATE SET modalidad=excluded.modalidad, sede=excluded.sede
+    ''', (curso_codigo, modalidad, sede, padron))
+    
+    if anterior:
+        _sumar_conteo(cursor, curso_codigo, anterior['modalidad'], anterior['sede'], -1)
+    _sumar_conteo(cursor, curso_codigo, modalidad, sede, 1)
+    return True
+
+def validar_feedback(conn, curso_codigo: str, modalidad: str, sede: Optional[str]) -> Optional[str]:
+    """Devuelve el mensaje de error si el voto no es válido, o None si lo es"""
+    # Validar que el curso existe
+    cursor = conn.execute('SELECT codigo FROM cursos WHERE codigo = ?', (curso_codigo,))
+    if not cursor.fetchone():
+        return 'Curso no encontrado'
+    
+    # Validar modalidad
+    if modalidad not in ['virtual', 'presencial', 'hibrido']:
+        return 'Modalidad inválida'
+    
+    # Validar sede si no es virtual
+    if modalidad != 'virtual' and sede not in ['PC', 'LH', None]:
+        return 'sede inválido'
+    
+    return None
 
 def enviar_feedback(curso_codigo: str, modalidad: str, sede: Optional[str], padron: str) -> Dict:
     """
@@ -13,46 +117,81 @@ def enviar_feedback(curso_codigo: str, modalidad: str, sede: Optional[str], padr
     
     modalidad: 'virtual', 'presencial', 'hibrido'
     sede: 'PC', 'LH' o None si es virtual
+    
+    El voto y el recálculo del consenso van en una única conexión y transacción.
     """
     try:
         conn = get_db()
-        cursor = conn.cursor()
         
-        # Validar que el curso existe
-        cursor.execute('SELECT codigo FROM cursos WHERE codigo = ?', (curso_codigo,))
-        if not cursor.fetchone():
-            return {'success': False, 'error': 'Curso no encontrado'}
-        
-        # Validar modalidad
-        if modalidad not in ['virtual', 'presencial', 'hibrido']:
-            return {'success': False, 'error': 'Modalidad inválida'}
+        error = validar_feedback(conn, curso_codigo, modalidad, sede)
+        if error:
+            conn.close()
+            return {'success': False, 'error': error}
         
-        # Validar sede si no es virtual
-        if modalidad != 'virtual' and sede not in ['PC', 'LH', None]:
-            return {'success': False, 'error': 'sede inválido'}
+        # Guardar feedback; repetir el mismo voto no cambia nada
+        if not registrar_voto(conn, curso_codigo, modalidad, sede, padron):
+            conn.close()
+            return {'success': True, 'message': 'Feedback enviado correctamente'}
+        version_votos = versiones.incrementar(conn, 'votos')
         
-        # Guardar feedback
-        # Si el usuario ya voto por primera vez, se inserta
-        # Si el usuario voto antes, se actualiza su voto (no se suma un voto nuevo)
-        cursor.execute('''
-            INSERT INTO feedback_modalidad (curso_codigo, modalidad, sede, usuario_padron)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(curso_codigo, usuario_padron)
-            DO UPDATE SET modalidad=excluded.modalidad, sede=excluded.sede
-        ''', (curso_codigo, modalidad, sede, padron))
+        # Recalcular consenso
+        _, version_catalogo = aplicar_consenso(conn, curso_codigo)
         
         conn.commit()
         conn.close()
-        
-        # Recalcular consenso
-        recalcular_consenso(curso_codigo)
+        versiones.publicar('votos', version_votos)
+        if version_catalogo is not None:
+            catalogo.actualizar_cursos([curso_codigo], version_catalogo)
+            versiones.publicar('catalogo', version_catalogo)
         
         return {'success': True, 'message': 'Feedback enviado correctamente'}
     
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def recalcular_consenso(curso_codigo: str, umbral: int = 3) -> bool:
+def aplicar_consenso(conn, curso_codigo: str, umbral: int = UMBRAL_CONSENSO):
+    """
+    Recalcula el consenso de un curso dentro de la transacción de 'conn'.
+    Lee sólo el conteo más votado de feedback_conteos, sin recorrer los votos.
+    
+    Retorna (se confirmó una modalidad, nueva versión del catálogo o None si no cambió nada)
+    """
+    cursor = conn.cursor()
+    
+    # Obtener el voto más popular
+    cursor.execute('''
+        SELECT modalidad, sede, votos
+        FROM feedback_conteos
+        WHERE curso_codigo = ?
+        ORDER BY votos DESC, modalidad, sede
+        LIMIT 1
+    ''', (curso_codigo,))
+    
+    voto_top = cursor.fetchone()
+    
+    if not voto_top:
+        return False, None
+    
+    # Si el voto top supera el umbral, actualizar en cursos
+    if voto_top['votos'] >= umbral:
+        modalidad = voto_top['modalidad']
+        sede = voto_top['sede'] or None
+        votos = voto_top['votos']
+        
+        cursor.execute('''
+            UPDATE cursos
+            SET modalidad = ?, sede = ?, votos_modalidad = ?
+            WHERE codigo = ?
+            AND (modalidad IS NOT ? OR sede IS NOT ? OR votos_modalidad IS NOT ?)
+        ''', (modalidad, sede, votos, curso_codigo, modalidad, sede, votos))
+        
+        # Sólo un cambio real del consenso invalida los ETags del catálogo
+        version = versiones.incrementar(conn, 'catalogo') if cursor.rowcount else None
+        return True, version
+    
+    return False, None
+
+def recalcular_consenso(curso_codigo: str, umbral: int = UMBRAL_CONSENSO) -> bool:
     """
     Recalcula el consenso de un curso.
     Si hay al menos 'umbral' votos para una modalidad, se confirma en la tabla cursos.
@@ -61,48 +200,88 @@ def recalcular_consenso(curso_codigo: str, umbral: int = 3) -> bool:
     """
     try:
         conn = get_db()
+        actualizado, version = aplicar_consenso(conn, curso_codigo, umbral)
+        conn.commit()
+        conn.close()
+        if version is not None:
+            catalogo.actualizar_cursos([curso_codigo], version)
+            versiones.publicar('catalogo', version)
+        return actualizado
+    
+    except Exception as e:
+        print(f"Error al recalcular consenso: {e}")
+        return False
+
+def recalcular_todos_los_consensos(umbral: int = UMBRAL_CONSENSO) -> Dict:
+    """
+    Recalcula el consenso de todos los cursos de una vez, por ejemplo después
+    de una importación o de cambiar el umbral.
+    
+    La modalidad ganadora de cada curso sale de feedback_conteos con
+    ROW_NUMBER() y se aplica con un único UPDATE ... FROM. Los cursos que
+    estaban confirmados por votos y ya no llegan al umbral vuelven a
+    'sin_confirmar'. Todo va en una única transacción.
+    """
+    inicio = time.perf_counter()
+    conn = get_db()
+    try:
         cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
         
-        # Obtener todos los feedbacks para este curso
         cursor.execute('''
-            SELECT modalidad, sede, COUNT(*) as votos
-            FROM feedback_modalidad
-            WHERE curso_codigo = ?
-            GROUP BY modalidad, sede
-            ORDER BY votos DESC
-        ''', (curso_codigo,))
-        
-        resultados = cursor.fetchall()
-        
-        if not resultados:
-            conn.close()
-            return False
-        
-        # Obtener el voto más popular
-        voto_top = resultados[0]
+            UPDATE cursos
+            SET modalidad = g.modalidad, sede = g.sede, votos_modalidad = g.votos
+            FROM (
+                SELECT curso_codigo, modalidad, NULLIF(sede, '') AS sede, votos
+                FROM (
+                    SELECT curso_codigo, modalidad, sede, votos,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY curso_codigo
+                               ORDER BY votos DESC, modalidad, sede
+                           ) AS puesto
+                    FROM feedback_conteos
+                )
+                WHERE puesto = 1 AND votos >= ?
+            ) AS g
+            WHERE cursos.codigo = g.curso_codigo
+            AND (cursos.modalidad IS NOT g.modalidad
+                 OR cursos.sede IS NOT g.sede
+                 OR cursos.votos_modalidad IS NOT g.votos)
+        ''', (umbral,))
+        confirmados = cursor.rowcount
         
-        # Si el voto top supera el umbral, actualizar en cursos
-        if voto_top['votos'] >= umbral:
-            modalidad = voto_top['modalidad']
-            sede = voto_top['sede']
-            votos = voto_top['votos']
-            
-            cursor.execute('''
-                UPDATE cursos
-                SET modalidad = ?, sede = ?, votos_modalidad = ?
-                WHERE codigo = ?
-            ''', (modalidad, sede, votos, curso_codigo))
-            
-            conn.commit()
-            conn.close()
-            return True
+        cursor.execute('''
+            UPDATE cursos
+            SET modalidad = 'sin_confirmar', votos_modalidad = 0
+            WHERE modalidad != 'sin_confirmar'
+            AND codigo NOT IN (
+                SELECT curso_codigo FROM feedback_conteos
+                GROUP BY curso_codigo
+                HAVING MAX(votos) >= ?
+            )
+        ''', (umbral,))
+        desconfirmados = cursor.rowcount
         
+        version = None
+        if confirmados or desconfirmados:
+            version = versiones.incrementar(conn, 'catalogo')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
-        return False
     
-    except Exception as e:
-        print(f"Error al recalcular consenso: {e}")
-        return False
+    if version is not None:
+        catalogo.recargar()
+        versiones.publicar('catalogo', version)
+    
+    return {
+        'umbral': umbral,
+        'cursos_confirmados': confirmados,
+        'cursos_desconfirmados': desconfirmados,
+        'segundos': round(time.perf_counter() - inicio, 4)
+    }
 
 def obtener_modalidad_curso(curso_codigo: str) -> Optional[Dict]:
     """Obtiene la modalidad confirmada de un curso"""
@@ -139,11 +318,10 @@ def obtener_feedbacks_pendientes(curso_codigo: str) -> Dict:
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT modalidad, sede, COUNT(*) as votos
-            FROM feedback_modalidad
+            SELECT modalidad, sede, votos
+            FROM feedback_conteos
             WHERE curso_codigo = ?
-            GROUP BY modalidad, sede
-            ORDER BY votos DESC
+            ORDER BY votos DESC, modalidad, sede
         ''', (curso_codigo,))
         
         resultados = cursor.fetchall()
@@ -157,10 +335,10 @@ def obtener_feedbacks_pendientes(curso_codigo: str) -> Dict:
         votaciones = [
             {
                 'modalidad': row['modalidad'],
-                'sede': row['sede'],
+                'sede': row['sede'] or None,
                 'votos': row['votos'],
                 'porcentaje': round((row['votos'] / total_votos) * 100, 1) if total_votos > 0 else 0,
-                'falta_para_confirmar': max(0, 3 - row['votos'])
+                'falta_para_confirmar': max(0, UMBRAL_CONSENSO - row['votos'])
             }
             for row in resultados
         ]
@@ -171,41 +349,94 @@ def obtener_feedbacks_pendientes(curso_codigo: str) -> Dict:
         print(f"Error al obtener feedbacks pendientes: {e}")
         return {'votaciones': [], 'total_votos': 0}
 
+def listar_cursos_con_modalidades(
+    modalidad: Optional[str] = None,
+    sede: Optional[str] = None,
+    materia: Optional[str] = None,
+    despues: Optional[List[str]] = None,
+    limite: Optional[int] = None
+) -> List[Dict]:
+    """
+    Cursos con su modalidad en orden (materia, número de curso, código),
+    filtrados por modalidad, sede y/o código de materia.
+    
+    Con 'despues' (clave de orden del último curso visto) y 'limite' devuelve
+    una página por keyset. El resultado se cachea con la versión del catálogo
+    en la clave: cualquier importación o cambio de consenso lo invalida.
+    """
+    clave = (
+        os.path.abspath(db.DATABASE), versiones.actual('catalogo'), modalidad, sede, materia,
+        tuple(despues) if despues else None, limite
+    )
+    return _cache_modalidades.obtener_o_calcular(
+        clave, lambda: _consultar_cursos_con_modalidades(modalidad, sede, materia, despues, limite)
+    )
+
+def _consultar_cursos_con_modalidades(modalidad, sede, materia, despues, limite) -> List[Dict]:
+    filtro = 'c.retirado = 0'
+    params = []
+    
+    if modalidad:
+        filtro += ' AND c.modalidad = ?'
+        params.append(modalidad)
+    
+    if sede:
+        filtro += ' AND c.sede = ?'
+        params.append(sede)
+    
+    if materia:
+        filtro += ' AND c.materia_codigo = ?'
+        params.append(materia)
+    
+    if despues:
+        nombre, numero, codigo = despues
+        filtro += '''
+            AND m.nombre >= ?
+            AND (m.nombre > ? OR c.numero_curso > ? OR (c.numero_curso = ? AND c.codigo > ?))
+        '''
+        params += [nombre, nombre, numero, numero, codigo]
+    
+    query = f'''
+        SELECT 
+            c.codigo,
+            m.nombre as materia_nombre,
+            c.numero_curso,
+            c.catedra,
+            c.modalidad,
+            c.sede,
+            c.votos_modalidad
+        FROM cursos c
+        JOIN materias m ON c.materia_codigo = m.codigo
+        WHERE {filtro}
+        ORDER BY m.nombre, c.numero_curso, c.codigo
+    '''
+    if limite is not None:
+        query += ' LIMIT ?'
+        params.append(limite)
+    
+    conn = get_db()
+    try:
+        resultados = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    
+    return [
+        {
+            'codigo': row['codigo'],
+            'materia_nombre': row['materia_nombre'],
+            'numero_curso': row['numero_curso'],
+            'catedra': row['catedra'],
+            'modalidad': row['modalidad'],
+            'sede': row['sede'],
+            'votos_totales': row['votos_modalidad']
+        }
+        for row in resultados
+    ]
+
 def obtener_todos_cursos_con_modalidades() -> List[Dict]:
     """Obtiene todos los cursos con sus modalidades"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                c.codigo,
-                m.nombre as materia_nombre,
-                c.numero_curso,
-                c.catedra,
-                c.modalidad,
-                c.sede,
-                c.votos_modalidad
-            FROM cursos c
-            JOIN materias m ON c.materia_codigo = m.codigo
-            ORDER BY m.nombre, c.numero_curso
-        ''')
-        
-        resultados = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'codigo': row['codigo'],
-                'materia_nombre': row['materia_nombre'],
-                'numero_curso': row['numero_curso'],
-                'catedra': row['catedra'],
-                'modalidad': row['modalidad'],
-                'sede': row['sede'],
-                'votos_totales': row['votos_modalidad']
-            }
-            for row in resultados
-        ]
+        return listar_cursos_con_modalidades()
     
     except Exception as e:
         print(f"Error al obtener cursos con modalidades: {e}")
@@ -219,41 +450,11 @@ def filtrar_cursos_por_modalidad(modalidad: str, sede: Optional[str] = None) ->
     sede: 'PC', 'LH' (solo si modalidad es presencial/hibrido)
     """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        if sede:
-            cursor.execute('''
-                SELECT c.codigo, m.nombre as materia_nombre, c.numero_curso, c.catedra, c.modalidad, c.sede
-                FROM cursos c
-                JOIN materias m ON c.materia_codigo = m.codigo
-                WHERE c.modalidad = ? AND c.sede = ?
-                ORDER BY m.nombre
-            ''', (modalidad, sede))
-        else:
-            cursor.execute('''
-                SELECT c.codigo, m.nombre as materia_nombre, c.numero_curso, c.catedra, c.modalidad, c.sede
-                FROM cursos c
-                JOIN materias m ON c.materia_codigo = m.codigo
-                WHERE c.modalidad = ?
-                ORDER BY m.nombre
-            ''', (modalidad,))
-        
-        resultados = cursor.fetchall()
-        conn.close()
-        
         return [
-            {
-                'codigo': row['codigo'],
-                'materia_nombre': row['materia_nombre'],
-                'numero_curso': row['numero_curso'],
-                'catedra': row['catedra'],
-                'modalidad': row['modalidad'],
-                'sede': row['sede']
-            }
-            for row in resultados
+            {campo: valor for campo, valor in curso.items() if campo != 'votos_totales'}
+            for curso in listar_cursos_con_modalidades(modalidad, sede)
         ]
     
     except Exception as e:
         print(f"Error al filtrar cursos: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -1,10 +1,14 @@
 from flask import Blueprint, jsonify, request
 from feedback import (
-    enviar_feedback,
     obtener_modalidad_curso,
     obtener_feedbacks_pendientes,
-    obtener_todos_cursos_con_modalidades
+    listar_cursos_con_modalidades,
+    recalcular_todos_los_consensos,
+    UMBRAL_CONSENSO
 )
+import cola_feedback
+import versiones
+from paginacion import codificar_cursor, leer_pagina
 
 feedback_bp = Blueprint('feedback', __name__)
 
@@ -20,6 +24,9 @@ def enviar_feedback_endpoint():
         "sede": "PC",
         "padron": "12345"
     }
+    
+    El voto se valida y se encola: responde 202 sin esperar a que se escriba.
+    El escritor de cola_feedback lo guarda en menos de FEEDBACK_LATENCIA_MAXIMA.
     """
     try:
         data = request.get_json()
@@ -31,20 +38,21 @@ def enviar_feedback_endpoint():
                 'error': 'Faltan campos requeridos'
             }), 400
         
-        resultado = enviar_feedback(
+        resultado = cola_feedback.encolar(
             curso_codigo=data['curso_codigo'],
             modalidad=data['modalidad'],
             sede=data.get('sede'),
             padron=data['padron']
         )
         
-        status_code = 200 if resultado['success'] else 400
+        status_code = 202 if resultado['success'] else 400
         return jsonify(resultado), status_code
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @feedback_bp.route('/curso/<curso_codigo>/modalidad', methods=['GET'])
+@versiones.con_etag('catalogo')
 def obtener_modalidad_endpoint(curso_codigo):
     """Obtiene la modalidad confirmada de un curso"""
     try:
@@ -65,6 +73,7 @@ def obtener_modalidad_endpoint(curso_codigo):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @feedback_bp.route('/curso/<curso_codigo>/feedbacks', methods=['GET'])
+@versiones.con_etag('votos')
 def obtener_feedbacks_endpoint(curso_codigo):
     """Obtiene estadísticas de feedbacks pendientes para un curso"""
     try:
@@ -79,16 +88,89 @@ def obtener_feedbacks_endpoint(curso_codigo):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @feedback_bp.route('/todos-cursos', methods=['GET'])
+@versiones.con_etag('catalogo')
 def obtener_todos_cursos_endpoint():
-    """Obtiene todos los cursos con sus modalidades"""
+    """
+    Obtiene todos los cursos con sus modalidades
+    
+    Query params opcionales:
+        modalidad=presencial           virtual | presencial | hibrido | sin_confirmar
+        sede=PC                        sede del curso
+        materia=61.03                  código de la materia
+        limite=100&cursor=...          paginado por keyset; la respuesta trae
+                                       'siguiente' para pedir la próxima página
+    """
     try:
-        cursos = obtener_todos_cursos_con_modalidades()
+        modalidad = request.args.get('modalidad')
+        if modalidad and modalidad not in ['virtual', 'presencial', 'hibrido', 'sin_confirmar']:
+            return jsonify({
+                'success': False,
+                'error': 'Modalidad inválida'
+            }), 400
+        
+        try:
+            limite, despues = leer_pagina(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        filtros = {
+            'modalidad': modalidad,
+            'sede': request.args.get('sede'),
+            'materia': request.args.get('materia')
+        }
+        
+        if limite is None:
+            cursos = listar_cursos_con_modalidades(**filtros)
+            return jsonify({
+                'success': True,
+                'cursos': cursos,
+                'total': len(cursos)
+            }), 200
+        
+        # Se pide uno de más para saber si hay otra página
+        cursos = listar_cursos_con_modalidades(**filtros, despues=despues, limite=limite + 1)
+        
+        siguiente = None
+        if len(cursos) > limite:
+            cursos = cursos[:limite]
+            siguiente = codificar_cursor(cursos[-1])
         
         return jsonify({
             'success': True,
             'cursos': cursos,
-            'total': len(cursos)
+            'total': len(cursos),
+            'siguiente': siguiente
         }), 200
     
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@feedback_bp.route('/recalcular-consensos', methods=['POST'])
+def recalcular_consensos_endpoint():
+    """
+    Recalcula el consenso de modalidad de todos los cursos en una sola pasada
+    
+    Opcional:
+    {
+        "umbral": 3
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        umbral = data.get('umbral', UMBRAL_CONSENSO)
+        if not isinstance(umbral, int) or isinstance(umbral, bool) or umbral < 1:
+            return jsonify({
+                'success': False,
+                'error': 'El umbral debe ser un entero positivo'
+            }), 400
+        
+        stats = recalcular_todos_los_consensos(umbral)
+        
+        return jsonify({
+            'success': True,
+            'stats': stats
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
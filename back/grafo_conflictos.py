@@ -0,0 +1,134 @@
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from horarios import mascara_intervalo, intervalos_se_solapan, blob_a_mascara
+from db import get_db
+
+
+def actualizar_conflictos(conn: sqlite3.Connection, periodo: str, codigos_tocados: Optional[Iterable[str]] = None) -> int:
+    """
+    Recalcula el grafo de conflictos (qué cursos se solapan con cuáles) de un periodo
+    y lo guarda en conflictos_cursos, dentro de la transacción de 'conn'.
+
+    Si se pasan codigos_tocados sólo se recalculan las aristas de esos cursos
+    contra el resto del periodo; si no, se reconstruye el periodo entero.
+    Los cursos de una misma materia nunca van juntos en un plan, así que
+    entre ellos no se guardan aristas.
+
+    Retorna la cantidad de aristas escritas (cada conflicto se guarda en
+    ambos sentidos para poder consultar por cualquiera de los dos cursos).
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.codigo, c.materia_codigo, c.mascara, cl.dia, cl.inicio_min, cl.fin_min
+        FROM cursos c
+        JOIN clases cl ON cl.curso_codigo = c.codigo
+        WHERE c.periodo = ? AND c.retirado = 0
+    ''', (periodo,))
+
+    materia_de = {}
+    intervalos = defaultdict(list)
+    mascaras = {}
+    for codigo, materia, mascara, dia, inicio, fin in cursor.fetchall():
+        materia_de[codigo] = materia
+        intervalos[codigo].append((dia, inicio, fin))
+        if mascara is not None:
+            mascaras[codigo] = blob_a_mascara(mascara)
+
+    # Por si algún curso todavía no tiene la máscara guardada
+    for codigo in materia_de:
+        if codigo not in mascaras:
+            mascaras[codigo] = 0
+            for dia, inicio, fin in intervalos[codigo]:
+                mascaras[codigo] |= mascara_intervalo(dia, inicio, fin)
+
+    # Si el periodo nunca tuvo grafo, una actualización parcial lo dejaría incompleto
+    cursor.execute('SELECT 1 FROM conflictos_periodos WHERE periodo = ?', (periodo,))
+    if cursor.fetchone() is None:
+        codigos_tocados = None
+
+    todos = list(materia_de)
+    if codigos_tocados is None:
+        tocados = todos
+        cursor.execute('DELETE FROM conflictos_cursos WHERE periodo = ?', (periodo,))
+    else:
+        tocados = [codigo for codigo in set(codigos_tocados) if codigo in materia_de]
+        cursor.executemany(
+            'DELETE FROM conflictos_cursos WHERE curso_a = ? OR curso_b = ?',
+            [(codigo, codigo) for codigo in set(codigos_tocados)]
+        )
+
+    aristas = set()
+    for a in tocados:
+        for b in todos:
+            if a == b or materia_de[a] == materia_de[b]:
+                continue
+            if mascaras[a] & mascaras[b] and intervalos_se_solapan(intervalos[a], intervalos[b]):
+                aristas.add((a, b, periodo))
+                aristas.add((b, a, periodo))
+
+    cursor.executemany('''
+        INSERT OR IGNORE INTO conflictos_cursos (curso_a, curso_b, periodo)
+        VALUES (?, ?, ?)
+    ''', aristas)
+    cursor.execute('''
+        INSERT OR REPLACE INTO conflictos_periodos (periodo, actualizado_en)
+        VALUES (?, CURRENT_TIMESTAMP)
+    ''', (periodo,))
+    return len(aristas)
+
+
+def cargar_conflictos(codigos: List[str]) -> Optional[Dict[str, Set[str]]]:
+    """
+    Devuelve la adyacencia de conflictos restringida a 'codigos'
+    ({codigo: {codigos con los que se solapa}}), o None si alguno de
+    los periodos involucrados todavía no tiene el grafo calculado o si
+    se pide un curso retirado (que ya no tiene aristas en el grafo).
+    """
+    codigos = list(dict.fromkeys(codigos))
+    if not codigos:
+        return {}
+
+    conn = get_db()
+    cursor = conn.cursor()
+    marcadores = ','.join('?' * len(codigos))
+
+    cursor.execute(f'''
+        SELECT COUNT(*) as faltantes
+        FROM (SELECT DISTINCT periodo FROM cursos WHERE codigo IN ({marcadores})) p
+        WHERE p.periodo NOT IN (SELECT periodo FROM conflictos_periodos)
+    ''', codigos)
+    faltantes = cursor.fetchone()['faltantes']
+    cursor.execute(f'''
+        SELECT COUNT(*) as retirados FROM cursos
+        WHERE codigo IN ({marcadores}) AND retirado = 1
+    ''', codigos)
+    if faltantes > 0 or cursor.fetchone()['retirados'] > 0:
+        conn.close()
+        return None
+
+    cursor.execute(f'''
+        SELECT curso_a, curso_b
+        FROM conflictos_cursos
+        WHERE curso_a IN ({marcadores}) AND curso_b IN ({marcadores})
+    ''', codigos + codigos)
+
+    adyacencia = {codigo: set() for codigo in codigos}
+    for fila in cursor.fetchall():
+        adyacencia[fila['curso_a']].add(fila['curso_b'])
+    conn.close()
+    return adyacencia
+
+
+def construir_faltantes(conn: sqlite3.Connection) -> List[str]:
+    """Construye el grafo de los periodos que todavía no lo tienen (p. ej. una BD vieja)"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT DISTINCT periodo FROM cursos
+        WHERE periodo NOT IN (SELECT periodo FROM conflictos_periodos)
+    ''')
+    periodos = [fila[0] for fila in cursor.fetchall()]
+    for periodo in periodos:
+        actualizar_conflictos(conn, periodo)
+    return periodos
@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, List, Tuple
+
+# Granularidad de las máscaras semanales. Los horarios del SIU vienen en
+# múltiplos de 30 minutos, así que 15 minutos alcanza y sobra.
+SLOT_MINUTOS = 15
+SLOTS_POR_DIA = (24 * 60) // SLOT_MINUTOS
+DIAS_SEMANA = 7
+
+MASCARA_DIA = (1 << SLOTS_POR_DIA) - 1
+
+
+def hora_a_minutos(hora: str) -> int:
+    """Convierte 'HH:MM' en minutos desde medianoche"""
+    h, m = map(int, hora.split(':'))
+    return h * 60 + m
+
+
+def minutos_clase(clase: Dict) -> Tuple[int, int]:
+    """
+    Devuelve (inicio, fin) de una clase en minutos desde medianoche.
+    Usa las columnas enteras inicio_min/fin_min si vienen de la BD y
+    sólo parsea los strings cuando no están.
+    """
+    if clase.get('inicio_min') is not None and clase.get('fin_min') is not None:
+        return clase['inicio_min'], clase['fin_min']
+    return hora_a_minutos(clase['hora_inicio']), hora_a_minutos(clase['hora_fin'])
+
+
+def mascara_intervalo(dia: int, inicio: int, fin: int) -> int:
+    """
+    Compila un intervalo [inicio, fin) de un día en una máscara semanal.
+    Si los minutos no caen justo en un slot se redondea hacia afuera,
+    así la máscara nunca subestima la ocupación.
+    """
+    slot_inicio = inicio // SLOT_MINUTOS
+    slot_fin = -(-fin // SLOT_MINUTOS)
+    if slot_fin <= slot_inicio:
+        return 0
+    bits = ((1 << (slot_fin - slot_inicio)) - 1) << slot_inicio
+    return bits << (dia * SLOTS_POR_DIA)
+
+
+def mascara_clases(clases: Iterable[Dict]) -> int:
+    """Máscara semanal con todos los slots ocupados por una lista de clases"""
+    mascara = 0
+    for clase in clases:
+        inicio, fin = minutos_clase(clase)
+        mascara |= mascara_intervalo(clase['dia'], inicio, fin)
+    return mascara
+
+
+def mascara_a_blob(mascara: int) -> bytes:
+    """Serializa una máscara semanal para guardarla en la columna cursos.mascara"""
+    return mascara.to_bytes((SLOTS_POR_DIA * DIAS_SEMANA + 7) // 8, 'little')
+
+
+def blob_a_mascara(blob: bytes) -> int:
+    return int.from_bytes(blob, 'little')
+
+
+def mascara_de_dia(mascara: int, dia: int) -> int:
+    """Extrae la porción de un día de una máscara semanal"""
+    return (mascara >> (dia * SLOTS_POR_DIA)) & MASCARA_DIA
+
+
+def dias_ocupados(mascara: int) -> List[int]:
+    """Días de la semana que tienen al menos un slot ocupado"""
+    return [dia for dia in range(DIAS_SEMANA) if mascara_de_dia(mascara, dia)]
+
+
+def contar_slots(mascara: int) -> int:
+    """Cantidad de slots ocupados en una máscara"""
+    return bin(mascara).count('1')
+
+
+def tramos_del_dia(mascara_dia: int) -> List[Tuple[int, int]]:
+    """
+    Devuelve los tramos continuos ocupados de la máscara de un día,
+    como lista de (inicio, fin) en minutos y ordenados.
+    """
+    tramos = []
+    slot = 0
+    while mascara_dia:
+        # saltar los slots libres
+        libres = (mascara_dia & -mascara_dia).bit_length() - 1
+        mascara_dia >>= libres
+        slot += libres
+        # medir el tramo ocupado
+        ocupados = (~mascara_dia & (mascara_dia + 1)).bit_length() - 1
+        tramos.append((slot * SLOT_MINUTOS, (slot + ocupados) * SLOT_MINUTOS))
+        mascara_dia >>= ocupados
+        slot += ocupados
+    return tramos
+
+
+def intervalos_se_solapan(intervalos1: Iterable[Tuple[int, int, int]], intervalos2: Iterable[Tuple[int, int, int]]) -> bool:
+    """Verifica en minutos exactos si dos listas de (dia, inicio, fin) tienen alguna intersección"""
+    intervalos2 = list(intervalos2)
+    for dia1, inicio1, fin1 in intervalos1:
+        for dia2, inicio2, fin2 in intervalos2:
+            if dia1 == dia2 and not (fin1 <= inicio2 or fin2 <= inicio1):
+                return True
+    return False
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import metricas
+import siu_importador
+import siu_parser_pool
+from db import get_db
+
+# Las importaciones se escriben de a una: SQLite admite un único escritor
+# y así una importación grande no compite con otra por el lock de la BD.
+TRABAJADORES = int(os.environ.get('SIU_IMPORT_WORKERS', '1'))
+# Las importaciones en segundo plano no tienen el límite de un pedido HTTP
+TIMEOUT_PARSEO = float(os.environ.get('SIU_IMPORT_TIMEOUT', '300'))
+MAX_TRABAJOS_GUARDADOS = 100
+
+_executor = ThreadPoolExecutor(max_workers=TRABAJADORES, thread_name_prefix='importacion')
+_trabajos: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _actualizar(trabajo_id: str, **campos) -> None:
+    with _lock:
+        _trabajos[trabajo_id].update(campos)
+
+
+def _ejecutar(trabajo_id: str, texto: str) -> None:
+    inicio = time.monotonic()
+    _actualizar(trabajo_id, fase='parseando', iniciado_en=time.time())
+    try:
+        parsed_data = siu_parser_pool.obtener_pool().parsear(texto, timeout=TIMEOUT_PARSEO)
+        if not parsed_data:
+            raise ValueError('No se pudieron extraer materias del texto proporcionado')
+
+        def progreso(fase: str, filas_escritas: int):
+            _actualizar(trabajo_id, fase=fase, filas_escritas=filas_escritas)
+
+        _actualizar(trabajo_id, fase='guardando')
+        conn = get_db()
+        try:
+            stats = siu_importador.persistir_catalogo(conn, parsed_data, progreso=progreso)
+        finally:
+            conn.close()
+
+        _actualizar(
+            trabajo_id,
+            fase='terminado',
+            filas_escritas=stats['filas_escritas'],
+            stats=stats,
+            segundos=round(time.monotonic() - inicio, 3)
+        )
+    except Exception as e:
+        error = str(e)
+        if isinstance(e, siu_parser_pool.ErrorParser) and e.detalles:
+            error = f'{error}: {e.detalles}'
+        _actualizar(trabajo_id, fase='error', error=error, segundos=round(time.monotonic() - inicio, 3))
+
+
+def encolar(texto: str) -> str:
+    """Encola una importación del texto del SIU y devuelve el id del trabajo"""
+    trabajo_id = uuid.uuid4().hex
+    with _lock:
+        _trabajos[trabajo_id] = {
+            'id': trabajo_id,
+            'fase': 'en_cola',
+            'filas_escritas': 0,
+            'creado_en': time.time(),
+            'iniciado_en': None,
+            'segundos': None,
+            'stats': None,
+            'error': None
+        }
+        # Descartar los trabajos terminados más viejos
+        while len(_trabajos) > MAX_TRABAJOS_GUARDADOS:
+            viejo_id, viejo = next(iter(_trabajos.items()))
+            if viejo['fase'] not in ('terminado', 'error'):
+                break
+            del _trabajos[viejo_id]
+    _executor.submit(_ejecutar, trabajo_id, texto)
+    return trabajo_id
+
+
+def obtener(trabajo_id: str) -> Optional[Dict[str, Any]]:
+    """Estado de un trabajo: fase, filas escritas y segundos transcurridos"""
+    with _lock:
+        trabajo = _trabajos.get(trabajo_id)
+        if trabajo is None:
+            return None
+        trabajo = dict(trabajo)
+
+    if trabajo['segundos'] is None and trabajo['iniciado_en'] is not None:
+        trabajo['segundos'] = round(time.time() - trabajo['iniciado_en'], 3)
+    return trabajo
+
+
+def estadisticas() -> Dict[str, Any]:
+    with _lock:
+        fases = {}
+        for trabajo in _trabajos.values():
+            fases[trabajo['fase']] = fases.get(trabajo['fase'], 0) + 1
+    return {'trabajadores': TRABAJADORES, 'trabajos': fases}
+
+
+metricas.registrar('importaciones', estadisticas)
@@ -1,32 +1,147 @@
-import requests
-import json
-
-def importar_desde_archivo(archivo_path):
-    """
-    Lee un archivo de texto con el contenido del SIU y lo envía al backend
-    """
-    with open(archivo_path, 'r', encoding='utf-8') as f:
-        texto_siu = f.read()
-    
-    response = requests.post(
-        'http://localhost:5000/api/siu/parse-siu',
-        json={
-            'texto': texto_siu,
-            'padron': '100000'  # Opcional
-        }
-    )
-    
-    if response.ok:
-        data = response.json()
-        print(f"✅ Importación exitosa!")
-        print(f"📊 Estadísticas:")
-        print(f"   - Periodos: {data['stats']['periodos']}")
-        print(f"   - Materias: {data['stats']['total_materias']}")
-        print(f"   - Cursos: {data['stats']['total_cursos']}")
-        print(f"   - Guardados en BD: {data['stats']['saved_to_db']}")
+"""
+Importa uno o varios textos copiados del SIU directo a la BD, sin pasar por el servidor.
+
+Uso:
+    python importar_siu.py                          # importa siu_data.txt
+    python importar_siu.py 2025-1c.txt 2025-2c.txt  # varios archivos, parseados en paralelo
+    python importar_siu.py --dry-run siu_data.txt   # muestra la diferencia sin guardar nada
+    python importar_siu.py --db otra.db siu_data.txt
+
+Usa el mismo pool de parsers y la misma lógica de persistencia que
+/api/siu/parse-siu. Un servidor ya levantado ve los cambios a los pocos
+segundos, porque la versión del catálogo queda guardada en la BD.
+"""
+import argparse
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import app
+import db
+import siu_importador
+from siu_parser_pool import ErrorParser, PoolParserSIU
+
+
+def parsear_archivos(archivos, workers):
+    """Parsea los archivos en paralelo y devuelve sus resultados en el orden recibido"""
+    pool = PoolParserSIU(tamanio=min(workers, len(archivos)))
+    resultados = {}
+    try:
+        def parsear(archivo):
+            with open(archivo, 'r', encoding='utf-8') as f:
+                texto = f.read()
+            inicio = time.perf_counter()
+            return pool.parsear(texto), len(texto.encode('utf-8')), time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=pool.tamanio) as executor:
+            futuros = {executor.submit(parsear, archivo): archivo for archivo in archivos}
+            for i, futuro in enumerate(as_completed(futuros), start=1):
+                archivo = futuros[futuro]
+                parseado, tamanio, segundos = futuro.result()
+                resultados[archivo] = parseado
+                cursos = sum(len(p['cursos']) for p in parseado)
+                print(f"[{i}/{len(archivos)}] {archivo}: {cursos} cursos, "
+                      f"{tamanio / 1024:.0f} KB en {segundos:.2f} s")
+    finally:
+        pool.cerrar()
+
+    return [resultados[archivo] for archivo in archivos]
+
+
+def copiar_en_memoria(ruta):
+    """Copia la BD (abierta sólo para lectura) a una BD en memoria; vacía si no existe"""
+    copia = sqlite3.connect(':memory:')
+    copia.row_factory = sqlite3.Row
+    if os.path.exists(ruta):
+        original = sqlite3.connect(pathlib.Path(ruta).resolve().as_uri() + '?mode=ro', uri=True)
+        try:
+            original.backup(copia)
+        finally:
+            original.close()
+    return copia
+
+
+def imprimir_cambios(cambios):
+    for tipo, codigos in cambios.items():
+        if codigos:
+            print(f"   {tipo}: {', '.join(sorted(codigos))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importa textos del SIU directo a la BD')
+    parser.add_argument('archivos', nargs='*', default=['siu_data.txt'],
+                        help='archivos con el texto copiado del SIU (por defecto siu_data.txt)')
+    parser.add_argument('--db', default=db.DATABASE, help='ruta de la BD SQLite (o SCHEDULER_DB)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='calcula la diferencia contra la BD sin guardar ni migrar nada')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='cantidad de parsers en paralelo')
+    args = parser.parse_args(argv)
+
+    faltantes = [archivo for archivo in args.archivos if not os.path.isfile(archivo)]
+    if faltantes:
+        print(f"❌ No existe: {', '.join(faltantes)}")
+        return 1
+
+    inicio = time.perf_counter()
+
+    if args.dry_run:
+        # La simulación trabaja sobre una copia en memoria: el archivo no se
+        # migra ni pasa a modo WAL
+        conn = copiar_en_memoria(args.db)
+        app.crear_esquema(conn)
+        conn.commit()
     else:
-        print(f"❌ Error: {response.json()}")
+        # Crear o migrar el esquema de la BD destino
+        db.DATABASE = args.db
+        app.init_db()
+        conn = db.get_db()
+
+    try:
+        print(f"🔎 Parseando {len(args.archivos)} archivo(s)...")
+        try:
+            parseados = parsear_archivos(args.archivos, max(1, args.workers))
+        except (ErrorParser, TimeoutError) as e:
+            print(f"❌ Error al parsear: {e}")
+            if getattr(e, 'detalles', ''):
+                print(e.detalles)
+            return 1
+        segundos_parseo = time.perf_counter() - inicio
+
+        # Todos los archivos van en una única transacción
+        parsed_data = [periodo for parseado in parseados for periodo in parseado]
+        if not parsed_data:
+            print("❌ No se pudieron extraer materias de los archivos")
+            return 1
+
+        print("💾 Simulando importación..." if args.dry_run else "💾 Guardando en la BD...")
+        stats = siu_importador.persistir_catalogo(conn, parsed_data, confirmar=not args.dry_run)
+    finally:
+        conn.close()
+
+    total = time.perf_counter() - inicio
+    print("🧪 Simulación terminada, no se guardó nada" if args.dry_run else "✅ Importación exitosa!")
+    print("📊 Estadísticas:")
+    print(f"   - Periodos: {stats['periodos']}")
+    print(f"   - Materias: {stats['total_materias']}")
+    print(f"   - Cursos: {stats['total_cursos']}")
+    print(f"   - Nuevos: {stats['cursos_nuevos']}")
+    print(f"   - Actualizados: {stats['cursos_actualizados']}")
+    print(f"   - Sin cambios: {stats['cursos_sin_cambios']}")
+    print(f"   - Reactivados: {stats['cursos_reactivados']}")
+    print(f"   - Retirados: {stats['cursos_retirados']}")
+    if args.dry_run:
+        imprimir_cambios(stats['cambios'])
+    print("⏱️  Rendimiento:")
+    print(f"   - Parseo: {segundos_parseo:.2f} s")
+    print(f"   - Escritura: {stats['segundos']:.2f} s ({stats['filas_escritas']} filas, "
+          f"{stats['filas_por_segundo']} filas/s)")
+    print(f"   - Total: {total:.2f} s ({stats['total_cursos'] / total:.0f} cursos/s)")
+    return 0
+
 
 if __name__ == '__main__':
-    # Guarda el texto del SIU en un archivo llamado "siu_data.txt"
-    importar_desde_archivo('siu_data.txt')
\ No newline at end of file
+    sys.exit(main())
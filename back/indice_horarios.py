@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import db
+import metricas
+import versiones
+from db import get_db
+
+
+class IndiceHorarios:
+    """
+    Índice en memoria de todas las clases de un periodo, con arreglos
+    ordenados por hora de inicio para cada día.
+
+    Una clase [s, e) choca con un intervalo ocupado [a, b) si s < b y e > a.
+    Como ninguna clase dura más que la duración máxima del día (dmax),
+    alcanza con mirar las clases con s en (a - dmax, b): dos búsquedas
+    binarias y un recorrido sólo sobre los candidatos.
+
+    Los cursos sin clases (filas con dia NULL) se indexan sin intervalos:
+    no chocan con nada, así que son compatibles con cualquier plan.
+    """
+
+    def __init__(self, periodo: str, filas: Iterable[sqlite3.Row], version: int = 0, ruta: str = ''):
+        self.periodo = periodo
+        self.version = version
+        self.ruta = ruta
+        self.cursos: Dict[str, Dict[str, Any]] = {}
+        por_dia = defaultdict(list)
+
+        for fila in filas:
+            codigo = fila['curso_codigo']
+            if codigo not in self.cursos:
+                self.cursos[codigo] = {
+                    'codigo': codigo,
+                    'numero_curso': fila['numero_curso'],
+                    'catedra': fila['catedra'],
+                    'materia': {
+                        'codigo': fila['materia_codigo'],
+                        'nombre': fila['materia_nombre']
+                    },
+                    'intervalos': []
+                }
+            if fila['dia'] is None:
+                continue
+            inicio = fila['inicio_min']
+            fin = fila['fin_min']
+            self.cursos[codigo]['intervalos'].append((fila['dia'], inicio, fin))
+            por_dia[fila['dia']].append((inicio, fin, codigo))
+
+        self._inicios: Dict[int, List[int]] = {}
+        self._fines: Dict[int, List[int]] = {}
+        self._codigos: Dict[int, List[str]] = {}
+        self._duracion_maxima: Dict[int, int] = {}
+        for dia, clases in por_dia.items():
+            clases.sort()
+            self._inicios[dia] = [c[0] for c in clases]
+            self._fines[dia] = [c[1] for c in clases]
+            self._codigos[dia] = [c[2] for c in clases]
+            self._duracion_maxima[dia] = max(fin - inicio for inicio, fin, _ in clases)
+
+    def intervalos_de(self, codigo: str) -> Optional[List[Tuple[int, int, int]]]:
+        curso = self.cursos.get(codigo)
+        return curso['intervalos'] if curso else None
+
+    def cursos_en_conflicto(self, ocupados: Iterable[Tuple[int, int, int]]) -> Set[str]:
+        """Códigos de los cursos con alguna clase que choca con los intervalos (dia, inicio, fin)"""
+        conflicto = set()
+        for dia, a, b in ocupados:
+            inicios = self._inicios.get(dia)
+            if not inicios:
+                continue
+            fines = self._fines[dia]
+            codigos = self._codigos[dia]
+            desde = bisect_right(inicios, a - self._duracion_maxima[dia])
+            hasta = bisect_left(inicios, b)
+            for i in range(desde, hasta):
+                if fines[i] > a:
+                    conflicto.add(codigos[i])
+        return conflicto
+
+    def compatibles(self, ocupados: List[Tuple[int, int, int]], excluir_materias: Set[str] = frozenset()) -> List[Dict[str, Any]]:
+        """Cursos del periodo que entran completos en los huecos que dejan los intervalos ocupados"""
+        conflicto = self.cursos_en_conflicto(ocupados)
+        return [
+            curso for codigo, curso in self.cursos.items()
+            if codigo not in conflicto and curso['materia']['codigo'] not in excluir_materias
+        ]
+
+
+_indices: Dict[str, IndiceHorarios] = {}
+_lock = threading.Lock()
+_construcciones = 0
+
+
+def obtener_indice(periodo: str) -> IndiceHorarios:
+    """
+    Devuelve el índice del periodo, construyéndolo la primera vez o cuando
+    cambió la versión de los horarios (p. ej. por una importación desde otro
+    proceso). Los cambios de consenso o de periodo activo no lo tocan.
+    """
+    global _construcciones
+    ruta = os.path.abspath(db.DATABASE)
+    version = versiones.actual('horarios')
+    indice = _indices.get(periodo)
+    if indice is not None and indice.ruta == ruta and indice.version == version:
+        return indice
+
+    with _lock:
+        indice = _indices.get(periodo)
+        if indice is None or indice.ruta != ruta or indice.version != version:
+            conn = get_db()
+            try:
+                filas = conn.execute('''
+                    SELECT
+                        c.codigo as curso_codigo, cl.dia, cl.inicio_min, cl.fin_min,
+                        c.numero_curso, c.catedra,
+                        m.codigo as materia_codigo, m.nombre as materia_nombre
+                    FROM cursos c
+                    JOIN materias m ON c.materia_codigo = m.codigo
+                    LEFT JOIN clases cl ON cl.curso_codigo = c.codigo
+                    WHERE c.periodo = ? AND c.retirado = 0
+                    ORDER BY m.nombre, c.numero_curso
+                ''', (periodo,)).fetchall()
+            finally:
+                conn.close()
+            indice = IndiceHorarios(periodo, filas, version, ruta)
+            _indices[periodo] = indice
+            _construcciones += 1
+    return indice
+
+
+def publicar(periodos: Optional[Iterable[str]], version: int) -> None:
+    """
+    Después de un commit que subió la versión de los horarios a 'version'
+    cambiando sólo esos periodos (None: todos): descarta sus índices y pasa los
+    demás a la versión nueva, así no se reconstruyen. Si algún índice no estaba
+    en la versión inmediatamente anterior, algo más cambió en el medio y se descarta.
+    """
+    periodos = None if periodos is None else set(periodos)
+    ruta = os.path.abspath(db.DATABASE)
+    with _lock:
+        for periodo, indice in list(_indices.items()):
+            if periodos is None or periodo in periodos or indice.ruta != ruta or indice.version != version - 1:
+                del _indices[periodo]
+            else:
+                indice.version = version
+    versiones.publicar('horarios', version)
+
+
+def estadisticas() -> Dict[str, Any]:
+    return {
+        'periodos_indexados': sorted(_indices),
+        'cursos_indexados': sum(len(i.cursos) for i in _indices.values()),
+        'construcciones': _construcciones
+    }
+
+
+metricas.registrar('indice_horarios', estadisticas)
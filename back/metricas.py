@@ -0,0 +1,15 @@
+from typing import Any, Callable, Dict
+
+# Cada componente registra una función que devuelve sus métricas actuales.
+# El endpoint /api/metrics las junta en un único JSON.
+_fuentes: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def registrar(nombre: str, fuente: Callable[[], Dict[str, Any]]) -> None:
+    """Registra (o reemplaza) una fuente de métricas"""
+    _fuentes[nombre] = fuente
+
+
+def recolectar() -> Dict[str, Any]:
+    """Devuelve las métricas de todas las fuentes registradas"""
+    return {nombre: fuente() for nombre, fuente in _fuentes.items()}
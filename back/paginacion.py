@@ -0,0 +1,45 @@
+import base64
+import json
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Tope de 'limite' en los listados paginados por keyset
+LIMITE_MAXIMO_PAGINA = 500
+
+
+def codificar_cursor(curso: Dict[str, Any]) -> str:
+    """Cursor opaco con la clave de orden (materia, número, código) del último curso de una página"""
+    clave = json.dumps([curso['materia_nombre'], curso['numero_curso'], curso['codigo']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(clave.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(texto: str) -> List[str]:
+    """Inversa de codificar_cursor; lanza ValueError si el cursor no es válido"""
+    try:
+        clave = json.loads(base64.urlsafe_b64decode(texto.encode('ascii')))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(clave, list) or len(clave) != 3 or not all(isinstance(v, str) for v in clave):
+        raise ValueError('Cursor inválido')
+    return clave
+
+
+def leer_pagina(args: Mapping[str, str]) -> Tuple[Optional[int], Optional[List[str]]]:
+    """
+    Lee 'limite' y 'cursor' de los query params de un listado. Devuelve
+    (limite, despues); los dos son None si no se pidió paginar. Con cursor y
+    sin limite se usa LIMITE_MAXIMO_PAGINA. Lanza ValueError con el mensaje
+    para el cliente si alguno de los dos no es válido.
+    """
+    limite = None
+    if args.get('limite') is not None:
+        try:
+            limite = int(args['limite'])
+        except ValueError:
+            raise ValueError(f'limite debe ser un entero entre 1 y {LIMITE_MAXIMO_PAGINA}')
+
+    despues = decodificar_cursor(args['cursor']) if args.get('cursor') else None
+    if despues is not None and limite is None:
+        limite = LIMITE_MAXIMO_PAGINA
+    if limite is not None and not 1 <= limite <= LIMITE_MAXIMO_PAGINA:
+        raise ValueError(f'limite debe estar entre 1 y {LIMITE_MAXIMO_PAGINA}')
+    return limite, despues
@@ -0,0 +1,216 @@
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import catalogo
+import db
+import indice_horarios
+import versiones
+from cache import LRUCache
+from db import get_db
+
+CLAVE_PERIODO_ACTIVO = 'periodo_activo'
+
+# Tablas que se llevan al archivo, con el filtro que elige las filas de un periodo
+TABLAS_ARCHIVABLES = (
+    ('materias', 'codigo IN (SELECT materia_codigo FROM main.cursos WHERE periodo = ?)'),
+    ('cursos', 'periodo = ?'),
+    ('clases', 'curso_codigo IN (SELECT codigo FROM main.cursos WHERE periodo = ?)'),
+    ('curso_docentes', 'curso_codigo IN (SELECT codigo FROM main.cursos WHERE periodo = ?)'),
+    ('feedback_modalidad', 'curso_codigo IN (SELECT codigo FROM main.cursos WHERE periodo = ?)'),
+    ('feedback_conteos', 'curso_codigo IN (SELECT codigo FROM main.cursos WHERE periodo = ?)'),
+    ('conflictos_cursos', 'periodo = ?'),
+)
+
+# El periodo activo se relee sólo cuando cambia la versión del catálogo
+_cache_periodo = LRUCache(capacidad=8)
+
+
+def ruta_archivo() -> str:
+    """BD donde se archivan los periodos viejos; por defecto junto a la principal"""
+    return os.environ.get('SCHEDULER_ARCHIVO') or os.path.join(
+        os.path.dirname(os.path.abspath(db.DATABASE)), 'scheduler_archivo.db'
+    )
+
+
+def crear_tabla(cursor) -> None:
+    """
+    Crea la tabla de configuración (la llama init_db). Si todavía no hay un
+    periodo activo, se toma el del último curso importado.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS configuracion (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO configuracion (clave, valor)
+        SELECT ?, periodo FROM cursos WHERE retirado = 0
+        ORDER BY rowid DESC LIMIT 1
+    ''', (CLAVE_PERIODO_ACTIVO,))
+
+
+def proponer(conn: sqlite3.Connection, periodo: str) -> None:
+    """Deja 'periodo' como activo si no hay ninguno configurado (p. ej. la primera importación)"""
+    conn.execute(
+        'INSERT OR IGNORE INTO configuracion (clave, valor) VALUES (?, ?)',
+        (CLAVE_PERIODO_ACTIVO, periodo)
+    )
+
+
+def _leer_periodo_activo() -> Optional[str]:
+    conn = get_db()
+    try:
+        fila = conn.execute(
+            'SELECT valor FROM configuracion WHERE clave = ?', (CLAVE_PERIODO_ACTIVO,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        fila = None
+    finally:
+        conn.close()
+    return fila['valor'] if fila else None
+
+
+def periodo_activo() -> Optional[str]:
+    """Periodo que se usa por defecto al armar planes, o None si no hay ninguno"""
+    clave = (os.path.abspath(db.DATABASE), versiones.actual('catalogo'))
+    return _cache_periodo.obtener_o_calcular(clave, _leer_periodo_activo)
+
+
+def cambiar_periodo_activo(periodo: str) -> None:
+    """Cambia el periodo activo; lanza ValueError si no tiene cursos"""
+    conn = get_db()
+    try:
+        fila = conn.execute(
+            'SELECT 1 FROM cursos WHERE periodo = ? AND retirado = 0 LIMIT 1', (periodo,)
+        ).fetchone()
+        if not fila:
+            raise ValueError(f'No hay cursos del periodo {periodo}')
+
+        conn.execute(
+            'INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)',
+            (CLAVE_PERIODO_ACTIVO, periodo)
+        )
+        # Las lecturas que dependen del periodo activo tienen que revalidarse
+        version = versiones.incrementar(conn, 'catalogo')
+        conn.commit()
+    finally:
+        conn.close()
+    # Ningún curso cambió: la foto del catálogo sólo pasa a la versión nueva
+    catalogo.actualizar_cursos([], version)
+    versiones.publicar('catalogo', version)
+
+
+def listar_periodos() -> Dict[str, Any]:
+    """Periodos de la BD principal con su cantidad de cursos, y los ya archivados"""
+    conn = get_db()
+    try:
+        filas = conn.execute('''
+            SELECT periodo, COUNT(*) as cursos
+            FROM cursos
+            WHERE retirado = 0
+            GROUP BY periodo
+            ORDER BY periodo
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    archivados = []
+    if os.path.exists(ruta_archivo()):
+        archivo = sqlite3.connect(f'file:{ruta_archivo()}?mode=ro', uri=True)
+        try:
+            archivados = [fila[0] for fila in archivo.execute(
+                'SELECT DISTINCT periodo FROM cursos ORDER BY periodo'
+            )]
+        except sqlite3.OperationalError:
+            archivados = []
+        finally:
+            archivo.close()
+
+    return {
+        'activo': periodo_activo(),
+        'periodos': [dict(fila) for fila in filas],
+        'archivados': archivados
+    }
+
+
+def _copiar_al_archivo(cursor, tabla: str, filtro: str, periodo: str) -> int:
+    columnas = [fila[1] for fila in cursor.execute(f'PRAGMA main.table_info({tabla})')]
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS archivo.{tabla} AS SELECT * FROM main.{tabla} WHERE 0')
+
+    # La BD principal pudo ganar columnas (migraciones) desde que se creó el archivo
+    existentes = {fila[1] for fila in cursor.execute(f'PRAGMA archivo.table_info({tabla})')}
+    for columna in columnas:
+        if columna not in existentes:
+            cursor.execute(f'ALTER TABLE archivo.{tabla} ADD COLUMN {columna}')
+
+    # Si el periodo ya se había archivado, la copia nueva reemplaza a la vieja
+    lista = ', '.join(columnas)
+    cursor.execute(f'DELETE FROM archivo.{tabla} WHERE {filtro}', (periodo,))
+    cursor.execute(f'''
+        INSERT INTO archivo.{tabla} ({lista})
+        SELECT {lista} FROM main.{tabla} WHERE {filtro}
+    ''', (periodo,))
+    return cursor.rowcount
+
+
+def archivar_periodo(periodo: str) -> Dict[str, Any]:
+    """
+    Mueve un periodo viejo a la BD de archivo (adjuntada con ATTACH) y lo
+    borra de la principal, así las consultas de todos los días sólo
+    recorren los cursos vigentes. Las materias se copian pero no se borran
+    porque pueden tener cursos en otros periodos.
+
+    Primero se copia y después se borra, en una única transacción. En WAL el
+    commit no es atómico entre las dos BDs, pero archivar de nuevo el mismo
+    periodo reemplaza lo que haya quedado en el archivo.
+
+    Lanza ValueError si el periodo es el activo o no tiene cursos.
+    """
+    if periodo == periodo_activo():
+        raise ValueError('No se puede archivar el periodo activo')
+
+    conn = get_db()
+    cursor = conn.cursor()
+    # ATTACH no se puede hacer dentro de una transacción
+    cursor.execute('ATTACH DATABASE ? AS archivo', (ruta_archivo(),))
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT COUNT(*) FROM main.cursos WHERE periodo = ?', (periodo,))
+        if cursor.fetchone()[0] == 0:
+            raise ValueError(f'No hay cursos del periodo {periodo}')
+
+        copiadas = {
+            tabla: _copiar_al_archivo(cursor, tabla, filtro, periodo)
+            for tabla, filtro in TABLAS_ARCHIVABLES
+        }
+
+        cursor.execute('''
+            DELETE FROM main.busqueda_fts
+            WHERE rowid IN (SELECT rowid FROM main.cursos WHERE periodo = ?)
+        ''', (periodo,))
+        for tabla, filtro in reversed(TABLAS_ARCHIVABLES):
+            if tabla != 'materias':
+                cursor.execute(f'DELETE FROM main.{tabla} WHERE {filtro}', (periodo,))
+        cursor.execute('DELETE FROM main.conflictos_periodos WHERE periodo = ?', (periodo,))
+
+        version = versiones.incrementar(conn, 'catalogo')
+        version_horarios = versiones.incrementar(conn, 'horarios')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute('DETACH DATABASE archivo')
+        conn.close()
+
+    indice_horarios.publicar([periodo], version_horarios)
+    catalogo.recargar()
+    versiones.publicar('catalogo', version)
+
+    return {
+        'periodo': periodo,
+        'archivo': ruta_archivo(),
+        'filas_archivadas': copiadas
+    }
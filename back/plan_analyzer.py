@@ -1,6 +1,76 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, FrozenSet
 from collections import defaultdict
 
+from cache import LRUCache
+from horarios import minutos_clase, mascara_intervalo, mascara_de_dia, tramos_del_dia
+import metricas
+
+HORAS_NOMBRE = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+SEDES_NOMBRES = {
+    'PC': 'Paseo Colón',
+    'LH': 'Las Heras',
+    'Sede desconocida': 'Sede desconocida'
+}
+
+# Resultados del análisis de un día, compartidos entre planes y usuarios
+_cache_dias = LRUCache(capacidad=4096)
+metricas.registrar('analisis_dias', _cache_dias.estadisticas)
+
+def _analizar_dia(dia: int, mascara_dia: int, cantidad_clases: int, cantidad_materias: int, sedes: FrozenSet[str]) -> Dict[str, Any]:
+    """
+    Analiza un único día de un plan a partir de su máscara compilada.
+    El resultado depende sólo de los argumentos, por eso se puede cachear.
+    """
+    tramos = tramos_del_dia(mascara_dia)
+    
+    # Clases espaciadas en un mismo día
+    # (Asumimos que un hueco grande es >= 2 horas)
+    huecos = []
+    for (_, fin_actual), (inicio_siguiente, _) in zip(tramos, tramos[1:]):
+        hueco_minutos = inicio_siguiente - fin_actual
+        if hueco_minutos >= 120:
+            horas_hueco = hueco_minutos // 60
+            huecos.append({
+                'tipo': 'hueco_grande',
+                'texto': f'{HORAS_NOMBRE[dia]}: {horas_hueco}h libre entre clases',
+                'icono': '⏰',
+                'color': 'yellow'
+            })
+    
+    # Sedes diferentes en un mismo día
+    # (las sedes desconocidas se ignoran)
+    cambio_sede = []
+    sedes_conocidas = {s for s in sedes if s != 'Sede desconocida'}
+    if cantidad_clases >= 2 and len(sedes_conocidas) > 1:
+        sedes_str = ' y '.join(SEDES_NOMBRES.get(s, s) for s in sorted(sedes))
+        cambio_sede.append({
+            'tipo': 'cambio_sede',
+            'texto': f'{HORAS_NOMBRE[dia]}: Cambio de sede ({sedes_str})',
+            'icono': '🚌',
+            'color': 'red'
+        })
+    
+    # días muy cargados
+    # algunas materias se cargan divididas en 2 (teorica y practica)
+    # asi que 4 materias en un dia puede llegar a significar 2 materias con teorica y práctica.
+    dia_cargado = []
+    if cantidad_clases > 4:
+        dia_cargado.append({
+            'tipo': 'dia_cargado',
+            'texto': f'{HORAS_NOMBRE[dia]}: {cantidad_materias} materias en un día',
+            'icono': '😰',
+            'color': 'orange'
+        })
+    
+    return {
+        'huecos': huecos,
+        'cambio_sede': cambio_sede,
+        'dia_cargado': dia_cargado,
+        'temprano': bool(tramos) and tramos[0][0] < 9 * 60,
+        'clases': cantidad_clases
+    }
+
 def analizar_plan(cursos: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analiza un plan y devuelve sus características (ventajas/desventajas)
@@ -25,19 +95,28 @@ def analizar_plan(cursos: List[Dict[str, Any]]) -> Dict[str, Any]:
     ventajas = []
     desventajas = []
     
-    # Organizar clases por día
-    clases_por_dia = defaultdict(list)
+    # Organizar clases por día y compilar la máscara de cada día
+    dias = defaultdict(lambda: {'mascara': 0, 'clases': 0, 'materias': set(), 'sedes': set()})
     for curso in cursos:
         for clase in curso['clases']:
-            clases_por_dia[clase['dia']].append({
-                'curso': curso,
-                'clase': clase
-            })
+            inicio, fin = minutos_clase(clase)
+            dia = dias[clase['dia']]
+            dia['mascara'] |= mascara_de_dia(mascara_intervalo(clase['dia'], inicio, fin), clase['dia'])
+            dia['clases'] += 1
+            dia['materias'].add(curso['materia']['codigo'])
+            dia['sedes'].add(curso.get('sede', 'Sede desconocida'))
+    
+    # Cada día se analiza por separado y se cachea: la misma configuración
+    # de un día se repite muchísimo entre planes y entre usuarios.
+    analisis_dias = []
+    for numero_dia in sorted(dias):
+        dia = dias[numero_dia]
+        clave = (numero_dia, dia['mascara'], dia['clases'], len(dia['materias']), frozenset(dia['sedes']))
+        analisis_dias.append(_cache_dias.obtener_o_calcular(clave, lambda: _analizar_dia(*clave)))
     
     # Días libres
-    dias_con_clases = set(clases_por_dia.keys())
     dias_totales = 6  # No se toma el domingo
-    dias_libres = dias_totales - len(dias_con_clases)
+    dias_libres = dias_totales - len(analisis_dias)
     
     if dias_libres >= 2:
         ventajas.append({
@@ -54,96 +133,25 @@ def analizar_plan(cursos: List[Dict[str, Any]]) -> Dict[str, Any]:
             'color': 'green'
         })
     
-    # Clases espaciadas en un mismo día
-    # (Asumimos que un hueco grande es >= 2 horas)
-    HORAS_NOMBRE = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
-    
-    for dia, clases_dia in clases_por_dia.items():
-        if len(clases_dia) < 2:
-            continue
-            
-        clases_ordenadas = sorted(clases_dia, key=lambda x: x['clase']['hora_inicio'])
-        
-        for i in range(len(clases_ordenadas) - 1):
-            fin_actual = clases_ordenadas[i]['clase']['hora_fin']
-            inicio_siguiente = clases_ordenadas[i + 1]['clase']['hora_inicio']
-            
-            fin_h, fin_m = map(int, fin_actual.split(':'))
-            inicio_h, inicio_m = map(int, inicio_siguiente.split(':'))
-            
-            hueco_minutos = (inicio_h * 60 + inicio_m) - (fin_h * 60 + fin_m)
-            
-            if hueco_minutos >= 120:
-                horas_hueco = hueco_minutos // 60
-                desventajas.append({
-                    'tipo': 'hueco_grande',
-                    'texto': f'{HORAS_NOMBRE[dia]}: {horas_hueco}h libre entre clases',
-                    'icono': '⏰',
-                    'color': 'yellow'
-                })
-    
-    # Sedes diferentes en un mismo día
-    # (si no se tiene info de sede, se ignora)
-    for dia, clases_dia in clases_por_dia.items():
-        if len(clases_dia) < 2:
-            continue
-        
-        sedes = set()
-        for item in clases_dia:
-            sede = item['curso'].get('sede', 'Sede desconocida')
-            sedes.add(sede)
-
-        # las sedes desconocidas se ignoran
-        sedes_conocidas = {s for s in sedes if s != 'Sede desconocida'}
-
-        if len(sedes_conocidas) > 1:
-
-            sedes_nombres = {
-                'PC': 'Paseo Colón',
-                'LH': 'Las Heras',
-                'Sede desconocida': 'Sede desconocida'
-            }
-            sedes_str = ' y '.join(sedes_nombres.get(s, s) for s in sedes)
-
-            desventajas.append({
-                'tipo': 'cambio_sede',
-                'texto': f'{HORAS_NOMBRE[dia]}: Cambio de sede ({sedes_str})',
-                'icono': '🚌',
-                'color': 'red'
-            })
-    
-    # días muy cargados
-    # algunas materias se cargan divididas en 2 (teorica y practica)
-    # asi que 4 materias en un dia puede llegar a significar 2 materias con teorica y práctica.
-    for dia, clases_dia in clases_por_dia.items():
-        if len(clases_dia) > 4:
-            total_materias = len(set(item['curso']['materia']['codigo'] for item in clases_dia))
-            desventajas.append({
-                'tipo': 'dia_cargado',
-                'texto': f'{HORAS_NOMBRE[dia]}: {total_materias} materias en un día',
-                'icono': '😰',
-                'color': 'orange'
-            })
+    # Desventajas por día, en el mismo orden de siempre:
+    # huecos, cambios de sede y días cargados
+    for tipo in ('huecos', 'cambio_sede', 'dia_cargado'):
+        for analisis_dia in analisis_dias:
+            desventajas.extend(analisis_dia[tipo])
     
     # Clases muy temprano (antes de las 9)
-    clases_tempranas = []
-    for dia, clases_dia in clases_por_dia.items():
-        for item in clases_dia:
-            hora_inicio = int(item['clase']['hora_inicio'].split(':')[0])
-            if hora_inicio < 9:
-                clases_tempranas.append(HORAS_NOMBRE[dia])
-                break
+    dias_tempranos = sum(1 for analisis_dia in analisis_dias if analisis_dia['temprano'])
     
-    if len(clases_tempranas) >= 3:
+    if dias_tempranos >= 3:
         desventajas.append({
             'tipo': 'clases_tempranas',
-            'texto': f'{len(clases_tempranas)} días con clases antes de las 9',
+            'texto': f'{dias_tempranos} días con clases antes de las 9',
             'icono': '🌅',
             'color': 'yellow'
         })
     
     # Distribución equilibrada
-    cantidad_por_dia = [len(clases) for clases in clases_por_dia.values()]
+    cantidad_por_dia = [analisis_dia['clases'] for analisis_dia in analisis_dias]
     if cantidad_por_dia:
         max_clases = max(cantidad_por_dia)
         min_clases = min(cantidad_por_dia)
@@ -0,0 +1,44 @@
+"""
+Recalcula el consenso de modalidad de todos los cursos, sin pasar por el servidor.
+
+Uso:
+    python recalcular_consensos.py               # con el umbral por defecto
+    python recalcular_consensos.py --umbral 5
+    python recalcular_consensos.py --db otra.db
+
+Usa la misma consulta que POST /api/feedback/recalcular-consensos.
+"""
+import argparse
+import sys
+
+import app
+import db
+import feedback
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recalcula el consenso de modalidad de todos los cursos')
+    parser.add_argument('--umbral', type=int, default=feedback.UMBRAL_CONSENSO,
+                        help=f'votos necesarios para confirmar una modalidad (por defecto {feedback.UMBRAL_CONSENSO})')
+    parser.add_argument('--db', default=db.DATABASE, help='ruta de la BD SQLite (o SCHEDULER_DB)')
+    args = parser.parse_args(argv)
+
+    if args.umbral < 1:
+        print("❌ El umbral debe ser un entero positivo")
+        return 1
+
+    # Crear o migrar el esquema (incluye reconstruir los conteos de votos)
+    db.DATABASE = args.db
+    app.init_db()
+
+    stats = feedback.recalcular_todos_los_consensos(args.umbral)
+
+    print(f"✅ Consensos recalculados con umbral {stats['umbral']}")
+    print(f"   - Confirmados o actualizados: {stats['cursos_confirmados']}")
+    print(f"   - Vueltos a sin confirmar: {stats['cursos_desconfirmados']}")
+    print(f"   - Tiempo: {stats['segundos']:.3f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,25 +1,27 @@
-from typing import List, Dict, Any
+import math
+import re
+from typing import List, Dict, Any, Optional, Tuple
 from itertools import combinations
-import sqlite3
 
-def get_db():
-    conn = sqlite3.connect('scheduler.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+import catalogo
+import grafo_conflictos
+import periodos
+from db import get_db
+from horarios import (
+    DIAS_SEMANA, SLOT_MINUTOS, hora_a_minutos, minutos_clase,
+    mascara_intervalo, mascara_clases, contar_slots, blob_a_mascara
+)
+
+# Días que se consideran para contar días libres (no se toma el domingo)
+DIAS_HABILES = 6
 
 def clase_en_horarios_excluidos(clase: Dict, excluidos: List[Dict]) -> bool:
     for ex in excluidos:
         if clase['dia'] != ex['dia']:
             continue
 
-        def to_min(h):
-            h, m = map(int, h.split(':'))
-            return h * 60 + m
-        
-        inicio_c = to_min(clase['hora_inicio'])
-        fin_c = to_min(clase['hora_fin'])
-        inicio_e = to_min(ex['hora_inicio'])
-        fin_e = to_min(ex['hora_fin'])
+        inicio_c, fin_c = minutos_clase(clase)
+        inicio_e, fin_e = minutos_clase(ex)
 
         if not (fin_c <= inicio_e or fin_e <= inicio_c):
             return True
@@ -52,79 +54,48 @@ def curso_cumple_preferencias(curso: Dict, prefs: Dict[str, str]) -> bool:
     return sede_ok and mod_ok
 
 
-def obtener_datos_curso(curso_codigo: str) -> Dict[str, Any]:
-    """Obtiene todos los datos de un curso desde la BD"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Obtener info del curso y materia
-    cursor.execute('''
-        SELECT 
-            c.codigo, c.numero_curso, c.catedra, c.periodo, c.sede, c.modalidad, c.votos_modalidad,
-            m.codigo as materia_codigo, m.nombre as materia_nombre
-        FROM cursos c
-        JOIN materias m ON c.materia_codigo = m.codigo
-        WHERE c.codigo = ?
-    ''', (curso_codigo,))
-    
-    curso = cursor.fetchone()
-    if not curso:
+def obtener_datos_curso(curso_codigo: str, incluir_retirados: bool = False) -> Dict[str, Any]:
+    """
+    Obtiene todos los datos de un curso desde la foto vigente del catálogo.
+    El resultado se comparte con los demás pedidos: no hay que modificarlo.
+
+    Los cursos retirados (que ya no aparecen en el SIU) no se pueden usar
+    para armar planes, así que devuelven None salvo con incluir_retirados.
+    """
+    curso = catalogo.actual().curso(curso_codigo)
+    if curso is None:
         print(f"No se encontro el curso con codigo {curso_codigo}")
-        conn.close()
         return None
-    
-    # Obtener clases
-    cursor.execute('''
-        SELECT dia, hora_inicio, hora_fin
-        FROM clases
-        WHERE curso_codigo = ?
-        ORDER BY dia, hora_inicio
-    ''', (curso_codigo,))
-    clases = [dict(row) for row in cursor.fetchall()]
-    
-    # Obtener docentes
-    cursor.execute('''
-        SELECT docente_nombre
-        FROM curso_docentes
-        WHERE curso_codigo = ?
-    ''', (curso_codigo,))
-    docentes = [row['docente_nombre'] for row in cursor.fetchall()]
-    
-    conn.close()
-    
-    return {
-        'codigo': curso['codigo'],
-        'numero_curso': curso['numero_curso'],
-        'catedra': curso['catedra'],
-        'periodo': curso['periodo'],
-        'sede': curso['sede'],
-        'modalidad': curso['modalidad'],
-        'materia': {
-            'codigo': curso['materia_codigo'],
-            'nombre': curso['materia_nombre']
-        },
-        'clases': clases,
-        'docentes': docentes
-    }
+    if curso['retirado'] and not incluir_retirados:
+        print(f"El curso {curso_codigo} fue retirado")
+        return None
+    return curso
+
+def curso_publico(curso: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Curso como sale en las respuestas de la API: sin los minutos precalculados
+    de las clases ni la marca de retirado, que son internos de la foto del catálogo
+    """
+    publico = {campo: valor for campo, valor in curso.items() if campo != 'retirado'}
+    publico['clases'] = [
+        {'dia': clase['dia'], 'hora_inicio': clase['hora_inicio'], 'hora_fin': clase['hora_fin']}
+        for clase in curso['clases']
+    ]
+    return publico
 
 def clases_se_solapan(clase1: Dict, clase2: Dict) -> bool:
     """
     Verifica si dos clases se solapan en horario.
     Cada clase tiene: dia (0-6), hora_inicio (HH:MM), hora_fin (HH:MM)
+    y, si viene de la BD, inicio_min/fin_min ya en minutos
     """
     # Si son días diferentes, no se solapan
     if clase1['dia'] != clase2['dia']:
         return False
     
-    # Convertir horarios a minutos desde medianoche para comparar
-    def hora_a_minutos(hora_str: str) -> int:
-        h, m = map(int, hora_str.split(':'))
-        return h * 60 + m
-    
-    inicio1 = hora_a_minutos(clase1['hora_inicio'])
-    fin1 = hora_a_minutos(clase1['hora_fin'])
-    inicio2 = hora_a_minutos(clase2['hora_inicio'])
-    fin2 = hora_a_minutos(clase2['hora_fin'])
+    # Minutos desde medianoche para comparar
+    inicio1, fin1 = minutos_clase(clase1)
+    inicio2, fin2 = minutos_clase(clase2)
     
     # Se solapan si hay intersección en los rangos
     return not (fin1 <= inicio2 or fin2 <= inicio1)
@@ -152,17 +123,147 @@ def agrupar_cursos_por_materia(cursos: List[Dict]) -> Dict[str, List[Dict]]:
         materias[materia_codigo].append(curso)
     return materias
 
-def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_parciales: bool = False, horarios_excluidos: List[Dict] = None, preferencias: Dict[str, str] = None) -> List[List[Dict]]:
+def validar_hora(hora: Any, campo: str) -> int:
+    """Minutos desde medianoche de un horario "HH:MM" pedido por el usuario; lanza ValueError si no lo es"""
+    if not isinstance(hora, str) or not re.fullmatch(r'\d{1,2}:\d{2}', hora):
+        raise ValueError(f'{campo} debe ser un horario "HH:MM"')
+    minutos = hora_a_minutos(hora)
+    if int(hora.split(':')[1]) > 59 or minutos > 24 * 60:
+        raise ValueError(f'{campo} fuera de rango: {hora}')
+    return minutos
+
+def normalizar_restricciones(restricciones: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Valida las restricciones duras pedidas por el usuario y las lleva a
+    las unidades que usa la búsqueda (minutos). Lanza ValueError si alguna
+    no tiene sentido.
+
+    Restricciones soportadas (todas opcionales):
+        - max_dias: máximo de días con clases
+        - min_dias_libres: mínimo de días sin clases (de lunes a sábado)
+        - max_horas_dia: máximo de horas de clase en un mismo día
+        - hora_fin_maxima: "HH:MM", ninguna clase puede terminar después
+    """
+    restricciones = restricciones or {}
+    normalizadas = {}
+
+    max_dias = DIAS_HABILES
+    if restricciones.get('max_dias') is not None:
+        max_dias = int(restricciones['max_dias'])
+        if max_dias < 1:
+            raise ValueError('max_dias debe ser al menos 1')
+    if restricciones.get('min_dias_libres') is not None:
+        min_dias_libres = int(restricciones['min_dias_libres'])
+        if not 0 <= min_dias_libres < DIAS_HABILES:
+            raise ValueError(f'min_dias_libres debe estar entre 0 y {DIAS_HABILES - 1}')
+        max_dias = min(max_dias, DIAS_HABILES - min_dias_libres)
+    if max_dias < DIAS_HABILES:
+        normalizadas['max_dias'] = max_dias
+
+    if restricciones.get('max_horas_dia') is not None:
+        max_horas_dia = float(restricciones['max_horas_dia'])
+        # Infinity y NaN llegan desde el JSON y no se pueden pasar a minutos
+        if not math.isfinite(max_horas_dia) or not 0 < max_horas_dia <= 24:
+            raise ValueError('max_horas_dia debe ser mayor a 0 y a lo sumo 24')
+        normalizadas['max_minutos_dia'] = int(max_horas_dia * 60)
+
+    if restricciones.get('hora_fin_maxima'):
+        normalizadas['fin_maximo'] = validar_hora(restricciones['hora_fin_maxima'], 'hora_fin_maxima')
+
+    return normalizadas
+
+def compilar_ventanas(horarios_penalizados: Optional[List[Dict]]) -> List[Tuple[int, float]]:
+    """
+    Compila las ventanas blandas del usuario en pares (máscara, peso).
+    A diferencia de horarios_excluidos no eliminan cursos: cada hora de
+    clase dentro de una ventana resta 'peso' puntos al plan (peso 1 por defecto).
+    Lanza ValueError si alguna ventana no tiene un día y horarios válidos.
+    """
+    ventanas = []
+    for ventana in horarios_penalizados or []:
+        peso = float(ventana.get('peso', 1))
+        if peso < 0:
+            raise ValueError('El peso de un horario penalizado no puede ser negativo')
+        dia = ventana['dia']
+        if isinstance(dia, bool) or not isinstance(dia, int) or not 0 <= dia < DIAS_SEMANA:
+            raise ValueError(f'dia debe ser un entero entre 0 y {DIAS_SEMANA - 1}')
+        inicio = validar_hora(ventana['hora_inicio'], 'hora_inicio')
+        fin = validar_hora(ventana['hora_fin'], 'hora_fin')
+        if fin <= inicio:
+            raise ValueError('hora_fin debe ser posterior a hora_inicio')
+        ventanas.append((mascara_intervalo(dia, inicio, fin), peso))
+    return ventanas
+
+def penalizacion_mascara(mascara: int, ventanas: List[Tuple[int, float]]) -> float:
+    """Penalización (peso x horas superpuestas) de una máscara contra las ventanas blandas"""
+    return sum(
+        peso * contar_slots(mascara & mascara_ventana) * SLOT_MINUTOS / 60
+        for mascara_ventana, peso in ventanas
+    )
+
+def penalizacion_plan(plan: List[Dict], ventanas: List[Tuple[int, float]]) -> float:
+    """Penalización total de un plan; los cursos de un plan no se solapan, así que se suma por curso"""
+    if not ventanas:
+        return 0.0
+    return sum(penalizacion_mascara(mascara_clases(curso['clases']), ventanas) for curso in plan)
+
+def obtener_mascaras(codigos: List[str]) -> Dict[str, int]:
+    """Máscaras semanales precompiladas al importar (columna cursos.mascara)"""
+    if not codigos:
+        return {}
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT codigo, mascara
+        FROM cursos
+        WHERE codigo IN ({','.join('?' * len(codigos))}) AND mascara IS NOT NULL
+    ''', list(codigos))
+    mascaras = {row['codigo']: blob_a_mascara(row['mascara']) for row in cursor.fetchall()}
+    conn.close()
+    return mascaras
+
+def compilar_curso(curso: Dict, ventanas: List[Tuple[int, float]] = None, mascara: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Precalcula lo que la búsqueda necesita de un curso: máscara, días, minutos por día y penalización.
+    Si se pasa la máscara precompilada de la BD no se vuelve a calcular.
+    """
+    minutos_por_dia = [0] * DIAS_SEMANA
+    fin_maximo = 0
+    for clase in curso['clases']:
+        inicio, fin = minutos_clase(clase)
+        minutos_por_dia[clase['dia']] += fin - inicio
+        fin_maximo = max(fin_maximo, fin)
+
+    if mascara is None:
+        mascara = mascara_clases(curso['clases'])
+    return {
+        'curso': curso,
+        'mascara': mascara,
+        'penalizacion': penalizacion_mascara(mascara, ventanas) if ventanas else 0.0,
+        'dias': sum(1 << dia for dia, minutos in enumerate(minutos_por_dia) if minutos),
+        'minutos_por_dia': minutos_por_dia,
+        'fin_maximo': fin_maximo
+    }
+
+def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_parciales: bool = False, horarios_excluidos: List[Dict] = None, preferencias: Dict[str, str] = None, restricciones: Dict[str, Any] = None, horarios_penalizados: List[Dict] = None, periodo: Optional[str] = None) -> List[List[Dict]]:
     """
     Genera todas las combinaciones posibles de cursos que cumplan:
     1. No se solapen horariamente
     2. A lo sumo un curso por materia
     3. Si permitir_parciales=False, solo devuelve planes con todas las materias
+    4. Las restricciones duras del usuario (ver normalizar_restricciones)
     
     Args:
         codigos_cursos: Lista de códigos de cursos seleccionados por el usuario
         max_planes: Límite máximo de planes a generar (para evitar explosión combinatoria)
         permitir_parciales: Si es False, solo devuelve planes que incluyen todas las materias
+        restricciones: Restricciones duras que se aplican mientras se arma cada plan
+        horarios_penalizados: Ventanas blandas; no descartan cursos pero se prueban
+            primero los cursos menos penalizados para que los mejores compromisos
+            entren antes de llegar a max_planes
+        periodo: Periodo del plan; si los cursos elegidos mezclan periodos y no
+            se indica, se usan sólo los del periodo activo. Lanza ValueError si
+            ningún curso elegido es de ese periodo
         
     Returns:
         Lista de planes válidos (cada plan es una lista de cursos)
@@ -174,6 +275,9 @@ def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_p
     if preferencias is None:
         preferencias = {"sede": "ANY", "modalidad": "ANY"}
 
+    restricciones = normalizar_restricciones(restricciones)
+    ventanas = compilar_ventanas(horarios_penalizados)
+
     # 1. Obtener datos completos de todos los cursos
     cursos_datos = []
     for codigo in codigos_cursos:
@@ -181,6 +285,24 @@ def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_p
         if datos:
             cursos_datos.append(datos)
     
+    # Un plan es de un único periodo
+    periodos_elegidos = sorted({str(curso.get('periodo')) for curso in cursos_datos})
+    if periodo is None and len(periodos_elegidos) > 1:
+        periodo = periodos.periodo_activo()
+        if periodo is None:
+            raise ValueError(
+                f'Los cursos elegidos son de varios periodos ({", ".join(periodos_elegidos)}) '
+                'y no hay un periodo activo: indicá cuál usar en "periodo"'
+            )
+    if periodo is not None:
+        cursos_datos = [curso for curso in cursos_datos if curso.get('periodo') == periodo]
+        if not cursos_datos and periodos_elegidos:
+            # Filtrar no debe dejar la lista vacía en silencio: parecería un choque de horarios
+            raise ValueError(
+                f'Ningún curso elegido es del periodo {periodo}; '
+                f'son de {", ".join(periodos_elegidos)}: indicá cuál usar en "periodo"'
+            )
+    
     if not cursos_datos:
         return []
     
@@ -208,51 +330,101 @@ def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_p
                 cursos_filtrados.append(curso)
 
         cursos_datos = cursos_filtrados
-    
-    # 3. Generar todos los subconjuntos posibles de cursos
+
+    max_dias = restricciones.get('max_dias', DIAS_SEMANA)
+    max_minutos_dia = restricciones.get('max_minutos_dia')
+    fin_maximo = restricciones.get('fin_maximo')
+
+    # Descartar de entrada los cursos que por sí solos ya violan una restricción
+    mascaras = obtener_mascaras([curso['codigo'] for curso in cursos_datos])
+    compilados = []
+    for curso in cursos_datos:
+        compilado = compilar_curso(curso, ventanas, mascaras.get(curso['codigo']))
+        if fin_maximo is not None and compilado['fin_maximo'] > fin_maximo:
+            continue
+        if bin(compilado['dias']).count('1') > max_dias:
+            continue
+        if max_minutos_dia is not None and max(compilado['minutos_por_dia']) > max_minutos_dia:
+            continue
+        compilados.append(compilado)
+
+    # Agrupar por materia respetando el orden en que llegaron
+    por_materia = agrupar_cursos_por_materia([c['curso'] for c in compilados])
+    compilados_por_codigo = {c['curso']['codigo']: c for c in compilados}
+    opciones = [[compilados_por_codigo[c['codigo']] for c in cursos] for cursos in por_materia.values()]
+    if ventanas:
+        for opciones_materia in opciones:
+            opciones_materia.sort(key=lambda c: c['penalizacion'])
+
+    # Conflictos precalculados al importar; si el grafo del periodo no está
+    # disponible se verifica con las máscaras y los minutos exactos
+    adyacencia = grafo_conflictos.cargar_conflictos([c['curso']['codigo'] for c in compilados])
+    if adyacencia is not None:
+        bit_de = {c['curso']['codigo']: 1 << i for i, c in enumerate(compilados)}
+        for compilado in compilados:
+            compilado['bit'] = bit_de[compilado['curso']['codigo']]
+            compilado['conflictos'] = sum(bit_de[codigo] for codigo in adyacencia[compilado['curso']['codigo']])
+
+    # 3. Búsqueda con backtracking: en cada nivel se elige un curso de una
+    # materia (o ninguno si se permiten parciales). Las ramas que violan
+    # una restricción se cortan ahí mismo en vez de generarse y descartarse.
     planes_validos = []
-    
-    # Iterar sobre todos los tamaños posibles de combinaciones
-    for tamanio in range(1, len(cursos_datos) + 1):
-        # Si ya encontramos suficientes planes, parar
+    elegidos = []
+    minutos_por_dia = [0] * DIAS_SEMANA
+
+    def se_solapa(opcion: Dict, mascara: int, bits: int) -> bool:
+        if adyacencia is not None:
+            return bool(opcion['conflictos'] & bits)
+        # La máscara descarta rápido; si coincide se confirma con los minutos exactos.
+        return bool(opcion['mascara'] & mascara) and any(
+            cursos_se_solapan(opcion['curso'], elegido['curso']) for elegido in elegidos
+        )
+
+    def buscar(nivel: int, mascara: int, dias: int, bits: int):
         if len(planes_validos) >= max_planes:
-            break
-            
-        # Generar todas las combinaciones de ese tamaño
-        for combinacion in combinations(cursos_datos, tamanio):
-            # Si ya encontramos suficientes planes, parar
-            if len(planes_validos) >= max_planes:
-                break
-            
-            # Verificar regla 2: a lo sumo un curso por materia
-            materias_en_plan = {}
-            valido_materias = True
-            for curso in combinacion:
-                materia_codigo = curso['materia']['codigo']
-                if materia_codigo in materias_en_plan:
-                    valido_materias = False
-                    break
-                materias_en_plan[materia_codigo] = curso
-            
-            if not valido_materias:
+            return
+
+        if nivel == len(opciones):
+            if elegidos and (permitir_parciales or len(elegidos) == total_materias):
+                planes_validos.append([c['curso'] for c in elegidos])
+            return
+
+        # Sin parciales, si ya no alcanzan las materias restantes no hay plan posible
+        if not permitir_parciales and len(elegidos) + len(opciones) - nivel < total_materias:
+            return
+
+        for opcion in opciones[nivel]:
+            # Verificar regla 1: no se solapan horariamente
+            if se_solapa(opcion, mascara, bits):
                 continue
-            
-            # Si no se permiten planes parciales, verificar que incluya todas las materias
-            if not permitir_parciales and len(materias_en_plan) != total_materias:
+
+            nuevos_dias = dias | opcion['dias']
+            if bin(nuevos_dias).count('1') > max_dias:
                 continue
-            
-            # Verificar regla 1: no se solapan horariamente
-            sin_solapamientos = True
-            for i in range(len(combinacion)):
-                for j in range(i + 1, len(combinacion)):
-                    if cursos_se_solapan(combinacion[i], combinacion[j]):
-                        sin_solapamientos = False
-                        break
-                if not sin_solapamientos:
-                    break
-            
-            if sin_solapamientos:
-                planes_validos.append(list(combinacion))
+
+            if max_minutos_dia is not None and any(
+                minutos_por_dia[dia] + minutos > max_minutos_dia
+                for dia, minutos in enumerate(opcion['minutos_por_dia']) if minutos
+            ):
+                continue
+
+            elegidos.append(opcion)
+            for dia, minutos in enumerate(opcion['minutos_por_dia']):
+                minutos_por_dia[dia] += minutos
+
+            buscar(nivel + 1, mascara | opcion['mascara'], nuevos_dias, bits | opcion.get('bit', 0))
+
+            elegidos.pop()
+            for dia, minutos in enumerate(opcion['minutos_por_dia']):
+                minutos_por_dia[dia] -= minutos
+
+            if len(planes_validos) >= max_planes:
+                return
+
+        if permitir_parciales:
+            buscar(nivel + 1, mascara, dias, bits)
+
+    buscar(0, 0, 0, 0)
     
     # 4. Ordenar planes por cantidad de materias (de mayor a menor)
     # Los planes con más materias son más valiosos
@@ -260,6 +432,165 @@ def generar_planes(codigos_cursos: List[str], max_planes: int = 1000, permitir_p
     
     return planes_validos
 
+def obtener_codigos_de_materia(materia_codigo: str, periodo: str) -> List[str]:
+    """Códigos de todos los cursos de una materia en un periodo"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT codigo
+        FROM cursos
+        WHERE materia_codigo = ? AND periodo = ? AND retirado = 0
+        ORDER BY codigo
+    ''', (materia_codigo, periodo))
+    codigos = [row['codigo'] for row in cursor.fetchall()]
+    conn.close()
+    return codigos
+
+def reparar_plan(codigos_plan: List[str], no_disponibles: List[str], max_cambios: int = 2, max_resultados: int = 10, permitir_quitar: bool = True, preferencias: Dict[str, str] = None, max_evaluaciones: int = 20000) -> List[Dict[str, Any]]:
+    """
+    Busca los planes válidos más parecidos a un plan existente cuando algunos
+    de sus cursos dejaron de estar disponibles (o cambiaron de horario).
+
+    En lugar de volver a enumerar todo, hace una búsqueda local acotada a
+    partir del plan original: primero prueba cambiando sólo las materias
+    obligadas (las que tienen cursos no disponibles) y después va sumando
+    de a una materia más a cambiar, hasta max_cambios.
+
+    Args:
+        codigos_plan: Cursos del plan original (uno por materia)
+        no_disponibles: Cursos que ya no se pueden usar
+        max_cambios: Máximo de materias que se pueden cambiar o quitar; lanza
+            ValueError si es menor que la cantidad de cursos no disponibles
+        max_resultados: Cuántos planes devolver
+        permitir_quitar: Si se puede resolver un conflicto quitando la materia
+        max_evaluaciones: Tope de combinaciones a probar
+
+    Returns:
+        Lista de dicts con {cursos, cambios, total_cambios}, ordenada
+        por cantidad de cambios (y a igualdad, menos materias quitadas).
+    """
+    if preferencias is None:
+        preferencias = {"sede": "ANY", "modalidad": "ANY"}
+
+    no_disponibles = set(no_disponibles)
+    originales = {}
+    for codigo in codigos_plan:
+        datos = obtener_datos_curso(codigo, incluir_retirados=True)
+        if datos:
+            originales[datos['materia']['codigo']] = datos
+            # Un curso retirado del plan se reemplaza como cualquier otro no disponible
+            if datos.get('retirado'):
+                no_disponibles.add(codigo)
+
+    materias = list(originales)
+
+    # Alternativas por materia: los otros cursos de la misma materia y periodo
+    alternativas = {}
+    for materia in materias:
+        original = originales[materia]
+        opciones = []
+        for codigo in obtener_codigos_de_materia(materia, original['periodo']):
+            if codigo == original['codigo'] or codigo in no_disponibles:
+                continue
+            datos = obtener_datos_curso(codigo)
+            if datos and curso_cumple_preferencias(datos, preferencias):
+                opciones.append(compilar_curso(datos))
+        alternativas[materia] = opciones
+
+    compilados = {materia: compilar_curso(originales[materia]) for materia in materias}
+    obligadas = {materia for materia in materias if originales[materia]['codigo'] in no_disponibles}
+    if len(obligadas) > max_cambios:
+        # Ningún nivel de búsqueda alcanzaría: no es lo mismo que no encontrar reemplazos
+        raise ValueError(
+            f'max_cambios ({max_cambios}) tiene que ser al menos la cantidad '
+            f'de cursos no disponibles del plan ({len(obligadas)})'
+        )
+    # Los códigos que ya no existen en la BD también obligan a quitar esa materia
+    faltantes = [codigo for codigo in codigos_plan if codigo not in {c['codigo'] for c in originales.values()}]
+
+    resultados = []
+    vistos = set()
+    evaluaciones = 0
+
+    def compatible(opcion, elegidos, mascara):
+        return not (opcion['mascara'] & mascara and any(
+            cursos_se_solapan(opcion['curso'], elegido['curso']) for elegido in elegidos
+        ))
+
+    # Quitar una materia es el último recurso: en cada nivel primero se
+    # prueba sólo reemplazando cursos y recién después quitando.
+    niveles = [
+        (total_cambios, usar_quitar)
+        for total_cambios in range(len(obligadas), max_cambios + 1)
+        for usar_quitar in ((False, True) if permitir_quitar else (False,))
+    ]
+
+    for total_cambios, usar_quitar in niveles:
+        opcionales = [materia for materia in materias if materia not in obligadas]
+        for extra in combinations(opcionales, total_cambios - len(obligadas)):
+            a_cambiar = obligadas | set(extra)
+
+            # Los cursos que se mantienen tienen que ser compatibles entre sí
+            mantenidos = []
+            mascara = 0
+            valido = True
+            for materia in materias:
+                if materia in a_cambiar:
+                    continue
+                if not compatible(compilados[materia], mantenidos, mascara):
+                    valido = False
+                    break
+                mantenidos.append(compilados[materia])
+                mascara |= compilados[materia]['mascara']
+            if not valido:
+                continue
+
+            # Asignar una alternativa a cada materia a cambiar (backtracking)
+            orden = [materia for materia in materias if materia in a_cambiar]
+            elegidos = list(mantenidos)
+            cambios = []
+
+            def asignar(nivel, mascara):
+                nonlocal evaluaciones
+                if len(resultados) >= max_resultados or evaluaciones >= max_evaluaciones:
+                    return
+                if nivel == len(orden):
+                    plan = [e['curso'] for e in elegidos]
+                    clave = frozenset(c['codigo'] for c in plan)
+                    if plan and clave not in vistos:
+                        vistos.add(clave)
+                        resultados.append({
+                            'cursos': plan,
+                            'cambios': list(cambios),
+                            'total_cambios': len(cambios) + len(faltantes)
+                        })
+                    return
+                materia = orden[nivel]
+                for opcion in alternativas[materia] + ([None] if usar_quitar else []):
+                    evaluaciones += 1
+                    if opcion is None:
+                        cambios.append({'materia': materia, 'antes': originales[materia]['codigo'], 'despues': None})
+                        asignar(nivel + 1, mascara)
+                        cambios.pop()
+                        continue
+                    if not compatible(opcion, elegidos, mascara):
+                        continue
+                    elegidos.append(opcion)
+                    cambios.append({'materia': materia, 'antes': originales[materia]['codigo'], 'despues': opcion['curso']['codigo']})
+                    asignar(nivel + 1, mascara | opcion['mascara'])
+                    elegidos.pop()
+                    cambios.pop()
+
+            asignar(0, mascara)
+
+        # Se devuelven sólo los planes con menos cambios posibles,
+        # salvo que todavía no alcancen para llenar el pedido.
+        if len(resultados) >= max_resultados or evaluaciones >= max_evaluaciones:
+            break
+
+    resultados.sort(key=lambda r: (r['total_cambios'], sum(1 for c in r['cambios'] if c['despues'] is None)))
+    return resultados[:max_resultados]
+
 def generar_estadisticas(planes: List[List[Dict]], codigos_originales: List[str]) -> Dict:
     """Genera estadísticas sobre los planes generados"""
     if not planes:
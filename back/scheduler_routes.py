@@ -1,9 +1,37 @@
 from flask import Blueprint, jsonify, request
-from scheduler import generar_planes, generar_estadisticas, obtener_datos_curso, curso_cumple_preferencias
+import heapq
+from scheduler import generar_planes, generar_estadisticas, obtener_datos_curso, curso_cumple_preferencias, normalizar_restricciones, compilar_ventanas, penalizacion_plan, reparar_plan, curso_publico
 from plan_analyzer import analizar_plan
+from horarios import minutos_clase
+import indice_horarios
+import versiones
 
 scheduler_bp = Blueprint('scheduler', __name__)
 
+# Cantidad de planes que se devuelven ya analizados por defecto
+ANALIZAR_PRIMEROS = 20
+
+def entero_no_negativo(valor, campo):
+    """Entero >= 0 de un campo del JSON; lanza ValueError con el mensaje para el cliente"""
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'"{campo}" debe ser un entero no negativo')
+    if numero < 0:
+        raise ValueError(f'"{campo}" debe ser un entero no negativo')
+    return numero
+
+def planes_publicos(planes):
+    """Planes como salen en la respuesta; cada curso se convierte una sola vez aunque esté en muchos planes"""
+    publicos = {}
+    resultado = []
+    for plan in planes:
+        for curso in plan:
+            if curso['codigo'] not in publicos:
+                publicos[curso['codigo']] = curso_publico(curso)
+        resultado.append([publicos[curso['codigo']] for curso in plan])
+    return resultado
+
 @scheduler_bp.route('/generar-planes', methods=['POST'])
 def generar_planes_endpoint():
     """
@@ -17,10 +45,22 @@ def generar_planes_endpoint():
         }
         "permitir_parciales": false  // Opcional, por defecto False
         "max_planes"
+        "max_resultados": 50,  // Opcional, cuántos planes devolver (por defecto todos)
+        "analizar_primeros": 20,  // Opcional, cuántos planes se devuelven ya analizados
         "preferencias": {
             "sede": "ANY", // ANY | PC | LH
             "modalidad": "ANY", // ANY | presencial | virtual
-        }
+        },
+        "restricciones": {  // Opcional, se aplican mientras se arma cada plan
+            "max_dias": 4,
+            "min_dias_libres": 2,
+            "max_horas_dia": 6,
+            "hora_fin_maxima": "19:00"
+        },
+        "horarios_penalizados": [  // Opcional, ventanas blandas: restan 'peso' por hora superpuesta
+            {"dia": 2, "hora_inicio": "18:00", "hora_fin": "20:00", "peso": 2}
+        ],
+        "periodo": "2025 - 2do Cuatrimestre"  // Opcional; si los cursos mezclan periodos, el activo
     }
     """
     try:
@@ -35,12 +75,33 @@ def generar_planes_endpoint():
         codigos = data['cursos']
         prioridades = data.get('prioridades', {})
         max_planes = data.get('max_planes', 1000)
+        try:
+            max_resultados = data.get('max_resultados')
+            if max_resultados is not None:
+                max_resultados = entero_no_negativo(max_resultados, 'max_resultados')
+            analizar_primeros = entero_no_negativo(data.get('analizar_primeros', ANALIZAR_PRIMEROS), 'analizar_primeros')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         permitir_parciales = data.get('permitir_parciales', False)
         preferencias = data.get('preferencias', {
             'sede': 'ANY',
             'modalidad': 'ANY'
         })
         horarios_excluidos = data.get('horarios_excluidos', [])
+        restricciones = data.get('restricciones', {})
+        horarios_penalizados = data.get('horarios_penalizados', [])
+
+        try:
+            normalizar_restricciones(restricciones)
+            ventanas = compilar_ventanas(horarios_penalizados)
+        except (TypeError, ValueError, KeyError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Restricciones inválidas: {e}'
+            }), 400
 
         # codigos_filtrados = []
         # for codigo in codigos_originales:
@@ -55,7 +116,13 @@ def generar_planes_endpoint():
         #     }), 400
 
         # Generar planes
-        planes = generar_planes(codigos, max_planes=max_planes, permitir_parciales=permitir_parciales, horarios_excluidos=horarios_excluidos, preferencias=preferencias)
+        try:
+            planes = generar_planes(codigos, max_planes=max_planes, permitir_parciales=permitir_parciales, horarios_excluidos=horarios_excluidos, preferencias=preferencias, restricciones=restricciones, horarios_penalizados=horarios_penalizados, periodo=data.get('periodo'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
         if len(planes) == 0:
             return jsonify({
@@ -66,37 +133,44 @@ def generar_planes_endpoint():
             }), 200
         
         # Calcular prioridad acumulada para cada plan
-        planes_con_prioridad = []
-        for plan in planes:
-            prioridad_total = sum(
-                prioridades.get(curso['codigo'], 3) for curso in plan  # Default: 3
-            )
-
-            analisis = analizar_plan(plan)
-
-            planes_con_prioridad.append({
-                'cursos': plan,
-                'prioridad_total': prioridad_total,
-                'analisis': analisis
-            })
+        prioridades_planes = [
+            sum(prioridades.get(curso['codigo'], 3) for curso in plan)  # Default: 3
+            for plan in planes
+        ]
         
-        # Ordenar por prioridad descendente (5 = máxima prioridad)
-        planes_con_prioridad.sort(key=lambda p: p['prioridad_total'], reverse=True)
+        # Las ventanas blandas restan puntos: el objetivo es prioridad - penalización
+        penalizaciones_planes = [penalizacion_plan(plan, ventanas) for plan in planes]
+        puntajes_planes = [p - pen for p, pen in zip(prioridades_planes, penalizaciones_planes)]
+        
+        # Seleccionar los mejores planes (5 = máxima prioridad) con un heap acotado.
+        # nlargest es estable: a igual puntaje se respeta el orden de generación.
+        cantidad = len(planes) if max_resultados is None else max_resultados
+        indices_ordenados = heapq.nlargest(cantidad, range(len(planes)), key=puntajes_planes.__getitem__)
         
         # Extraer cursos manteniendo compatibilidad
-        planes_ordenados = [p['cursos'] for p in planes_con_prioridad]
-        prioridades_totales = [p['prioridad_total'] for p in planes_con_prioridad]
-        analisis_planes = [p['analisis'] for p in planes_con_prioridad]
+        planes_ordenados = [planes[i] for i in indices_ordenados]
+        prioridades_totales = [prioridades_planes[i] for i in indices_ordenados]
+        penalizaciones = [round(penalizaciones_planes[i], 2) for i in indices_ordenados]
+        
+        # Sólo se analizan los primeros planes devueltos, el resto queda en None
+        # y se pide después a /analizar-planes si el usuario lo necesita.
+        analisis_planes = [
+            analizar_plan(plan) if i < analizar_primeros else None
+            for i, plan in enumerate(planes_ordenados)
+        ]
 
-        stats = generar_estadisticas(planes_ordenados, codigos)
+        stats = generar_estadisticas(planes, codigos)
         stats['prioridades_totales'] = prioridades_totales[:10]  # Primeros 10
         
         respuesta = {
             'success': True,
             'estadisticas': stats,
-            'planes': planes_ordenados,
+            'planes': planes_publicos(planes_ordenados),
             'analisis': analisis_planes,
-            'total': len(planes_ordenados)
+            'penalizaciones': penalizaciones,
+            'analisis_pendientes': sum(1 for a in analisis_planes if a is None),
+            'total': len(planes_ordenados),
+            'total_generados': len(planes)
         }
         
         if stats.get("advertencia_nunca_usados"):
@@ -113,11 +187,204 @@ def generar_planes_endpoint():
             'error': str(e)
         }), 500
 
+@scheduler_bp.route('/analizar-planes', methods=['POST'])
+def analizar_planes_endpoint():
+    """
+    Analiza bajo demanda planes que se devolvieron sin análisis.
+    Espera JSON con formato:
+    {
+        "planes": [["CB100-1", "61.03-1"], ["CB100-2", "61.03-1"]]
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('planes'), list):
+            return jsonify({
+                'success': False,
+                'error': 'Se requiere un campo "planes" con listas de códigos de cursos'
+            }), 400
+        
+        cursos_por_codigo = {}
+        analisis_planes = []
+        for codigos_plan in data['planes']:
+            plan = []
+            for codigo in codigos_plan:
+                if codigo not in cursos_por_codigo:
+                    cursos_por_codigo[codigo] = obtener_datos_curso(codigo)
+                if cursos_por_codigo[codigo]:
+                    plan.append(cursos_por_codigo[codigo])
+            analisis_planes.append(analizar_plan(plan))
+        
+        return jsonify({
+            'success': True,
+            'analisis': analisis_planes
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@scheduler_bp.route('/reparar-plan', methods=['POST'])
+def reparar_plan_endpoint():
+    """
+    Repara un plan existente cuando alguno de sus cursos ya no está disponible,
+    devolviendo los planes válidos con menos cambios respecto del original.
+    Espera JSON con formato:
+    {
+        "plan": ["CB100-1", "61.03-1", "75.01-1"],
+        "no_disponibles": ["61.03-1"],
+        "max_cambios": 2,  // Opcional, por defecto 2
+        "max_resultados": 10,  // Opcional, por defecto 10
+        "permitir_quitar": true,  // Opcional, si se puede quitar una materia
+        "preferencias": {"sede": "ANY", "modalidad": "ANY"}  // Opcional
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('plan'), list) or len(data['plan']) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'Se requiere un campo "plan" con la lista de códigos del plan original'
+            }), 400
+        
+        try:
+            reparaciones = reparar_plan(
+                data['plan'],
+                data.get('no_disponibles', []),
+                max_cambios=int(data.get('max_cambios', 2)),
+                max_resultados=int(data.get('max_resultados', 10)),
+                permitir_quitar=data.get('permitir_quitar', True),
+                preferencias=data.get('preferencias')
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if len(reparaciones) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'No se encontraron planes válidos con los cambios permitidos',
+                'planes': [],
+                'total': 0
+            }), 200
+        
+        return jsonify({
+            'success': True,
+            'planes': planes_publicos(r['cursos'] for r in reparaciones),
+            'cambios': [r['cambios'] for r in reparaciones],
+            'total_cambios': [r['total_cambios'] for r in reparaciones],
+            'analisis': [analizar_plan(r['cursos']) for r in reparaciones],
+            'total': len(reparaciones)
+        }), 200
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@scheduler_bp.route('/compatibles', methods=['POST'])
+def compatibles_endpoint():
+    """
+    Devuelve todos los cursos del catálogo que entran en los huecos de un plan.
+    Espera JSON con formato:
+    {
+        "plan": ["CB100-1", "61.03-1"],
+        "periodo": "2025 - 2do Cuatrimestre",  // Opcional, por defecto el del plan
+        "agrupar": "cursos",  // cursos | materias
+        "incluir_materias_del_plan": false  // Opcional
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        plan = data.get('plan', [])
+        periodo = data.get('periodo')
+        agrupar = data.get('agrupar', 'cursos')
+        
+        if agrupar not in ('cursos', 'materias'):
+            return jsonify({
+                'success': False,
+                'error': 'El campo "agrupar" debe ser "cursos" o "materias"'
+            }), 400
+        
+        # Intervalos ocupados por el plan: se toman del índice y, si algún
+        # curso no está en él (otro periodo), de la BD
+        cursos_plan = {codigo: None for codigo in plan}
+        if not periodo:
+            for codigo in plan:
+                datos = obtener_datos_curso(codigo)
+                if datos:
+                    cursos_plan[codigo] = datos
+                    periodo = datos['periodo']
+                    break
+        if not periodo:
+            return jsonify({
+                'success': False,
+                'error': 'Se requiere un "periodo" o un plan con cursos existentes'
+            }), 400
+        
+        indice = indice_horarios.obtener_indice(periodo)
+        ocupados = []
+        materias_plan = set()
+        for codigo in plan:
+            intervalos = indice.intervalos_de(codigo)
+            if intervalos is not None:
+                ocupados.extend(intervalos)
+                materias_plan.add(indice.cursos[codigo]['materia']['codigo'])
+                continue
+            datos = cursos_plan[codigo] or obtener_datos_curso(codigo)
+            if datos:
+                ocupados.extend((clase['dia'], *minutos_clase(clase)) for clase in datos['clases'])
+                materias_plan.add(datos['materia']['codigo'])
+        
+        excluir = set() if data.get('incluir_materias_del_plan', False) else materias_plan
+        compatibles = [
+            {k: v for k, v in curso.items() if k != 'intervalos'}
+            for curso in indice.compatibles(ocupados, excluir)
+        ]
+        
+        if agrupar == 'materias':
+            materias = {}
+            for curso in compatibles:
+                materia = materias.setdefault(curso['materia']['codigo'], {
+                    'codigo': curso['materia']['codigo'],
+                    'nombre': curso['materia']['nombre'],
+                    'cursos': []
+                })
+                materia['cursos'].append(curso['codigo'])
+            resultado = list(materias.values())
+        else:
+            resultado = compatibles
+        
+        return jsonify({
+            'success': True,
+            'periodo': periodo,
+            agrupar: resultado,
+            'total': len(resultado)
+        }), 200
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @scheduler_bp.route('/curso/<codigo>', methods=['GET'])
+@versiones.con_etag('catalogo')
 def get_curso_detalle(codigo):
-    """Obtiene detalles de un curso específico"""
+    """Obtiene detalles de un curso específico (también si fue retirado)"""
     try:
-        curso = obtener_datos_curso(codigo)
+        curso = obtener_datos_curso(codigo, incluir_retirados=True)
         if not curso:
             return jsonify({
                 'success': False,
@@ -126,7 +393,7 @@ def get_curso_detalle(codigo):
         
         return jsonify({
             'success': True,
-            'curso': curso
+            'curso': curso_publico(curso)
         }), 200
         
     except Exception as e:
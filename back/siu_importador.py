@@ -0,0 +1,316 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import busqueda
+import catalogo
+import grafo_conflictos
+import indice_horarios
+import periodos
+import versiones
+from horarios import hora_a_minutos, mascara_intervalo, mascara_a_blob
+
+
+def parsear_docentes(docentes_str):
+    """
+    Parsear string de docentes y devolver lista limpia
+    Ej: "Juan Perez, Maria Lopez" -> ["Juan Perez", "Maria Lopez"]
+    """
+    if not docentes_str:
+        return []
+
+    # Separar por comas y limpiar espacios
+    docentes = [d.strip() for d in docentes_str.split(',')]
+
+    # Filtrar strings vacíos
+    docentes = [d for d in docentes if d]
+
+    return docentes
+
+
+def huella_curso(fila_curso: tuple, docentes: List[str], clases: List[tuple]) -> str:
+    """
+    Huella del contenido de un curso tal como viene del SIU (datos, docentes y clases).
+    Si la huella no cambió entre dos importaciones, el curso no se vuelve a escribir.
+    """
+    materia_codigo, numero_curso, catedra, periodo, sede = fila_curso[1:6]
+    contenido = json.dumps(
+        [materia_codigo, numero_curso, catedra, periodo, sede,
+         sorted(docentes), sorted((c[1], c[2], c[3]) for c in clases)],
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def preparar_cursos(parsed_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convierte la salida del parser en las filas de cada curso, listas para executemany.
+    Los cursos de cada periodo se indexan por código, así que armar las filas
+    es lineal en el tamaño del texto importado.
+    """
+    materias = {}
+    cursos: Dict[str, Dict[str, Any]] = {}
+    materias_por_periodo: Dict[str, set] = {}
+
+    for periodo_data in parsed_data:
+        periodo = periodo_data['periodo']
+        cursos_por_codigo = {c['codigo']: c for c in periodo_data['cursos']}
+        materias_del_periodo = materias_por_periodo.setdefault(periodo, set())
+
+        for materia in periodo_data['materias']:
+            materias[materia['codigo']] = materia['nombre']
+            materias_del_periodo.add(materia['codigo'])
+
+            for curso_codigo in materia['cursos']:
+                curso = cursos_por_codigo.get(curso_codigo)
+                if not curso:
+                    continue
+
+                mascara = 0
+                clases = []
+                for clase in curso['clases']:
+                    inicio_min = hora_a_minutos(clase['inicio'])
+                    fin_min = hora_a_minutos(clase['fin'])
+                    mascara |= mascara_intervalo(clase['dia'], inicio_min, fin_min)
+                    clases.append((
+                        curso_codigo,
+                        clase['dia'],
+                        clase['inicio'],
+                        clase['fin'],
+                        inicio_min,
+                        fin_min
+                    ))
+
+                docentes = parsear_docentes(curso['docentes'])
+                fila = (
+                    curso_codigo,
+                    materia['codigo'],
+                    curso.get('numero', curso_codigo.split('-')[-1]),
+                    curso.get('catedra'),
+                    periodo,
+                    curso.get('sede', 'Sede desconocida'),
+                    mascara_a_blob(mascara)
+                )
+                cursos[curso_codigo] = {
+                    'fila': fila,
+                    'docentes': docentes,
+                    'clases': clases,
+                    'huella': huella_curso(fila, docentes, clases)
+                }
+
+    return {
+        'materias': materias,
+        'cursos': cursos,
+        'materias_por_periodo': materias_por_periodo
+    }
+
+
+def _en_lotes(valores: List[str], tamanio: int = 500):
+    for i in range(0, len(valores), tamanio):
+        yield valores[i:i + tamanio]
+
+
+def persistir_catalogo(
+    conn: sqlite3.Connection,
+    parsed_data: List[Dict[str, Any]],
+    confirmar: bool = True,
+    progreso: Optional[Callable[[str, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Guarda la salida del parser del SIU en la BD normalizada, escribiendo sólo la diferencia.
+
+    Cada curso lleva una huella de su contenido: los que no cambiaron no se tocan,
+    los que cambiaron se actualizan en el lugar (conservando modalidad y votos),
+    y los que dejaron de aparecer en una materia importada se marcan como retirados.
+
+    Todo se escribe con executemany dentro de una única transacción explícita,
+    junto con la actualización del grafo de conflictos y del índice de búsqueda: o entra la importación
+    completa o no entra nada. Después del commit se invalidan sólo los índices
+    de horarios de los periodos que cambiaron.
+
+    Con confirmar=False la transacción se revierte al final (modo simulación)
+    y las estadísticas incluyen los códigos de cada tipo de cambio.
+
+    Si se pasa 'progreso', se llama con (fase, filas_escritas) a medida que
+    avanza: 'guardando' después de cada tabla y 'reindexando' al recalcular
+    el grafo de conflictos y los índices.
+
+    Retorna las estadísticas de la importación, incluyendo filas por segundo.
+    """
+    inicio = time.perf_counter()
+    datos = preparar_cursos(parsed_data)
+    cursos = datos['cursos']
+    codigos = list(cursos)
+
+    filas_escritas = 0
+
+    def avanzar(fase: str, filas: int = 0):
+        nonlocal filas_escritas
+        filas_escritas += filas
+        if progreso:
+            progreso(fase, filas_escritas)
+
+    cursor = conn.cursor()
+    # IMMEDIATE: si otro escritor confirma entre la lectura y el primer INSERT
+    # de un BEGIN diferido, SQLite falla sin esperar al busy_timeout
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # Estado actual de los cursos importados
+        existentes = {}
+        for lote in _en_lotes(codigos):
+            cursor.execute(f'''
+                SELECT codigo, huella, retirado, periodo FROM cursos
+                WHERE codigo IN ({','.join('?' * len(lote))})
+            ''', lote)
+            existentes.update({fila[0]: fila[1:] for fila in cursor.fetchall()})
+
+        nuevos = [c for c in codigos if c not in existentes]
+        cambiados = [c for c in codigos if c in existentes and existentes[c][0] != cursos[c]['huella']]
+        reactivados = [
+            c for c in codigos
+            if c in existentes and existentes[c][0] == cursos[c]['huella'] and existentes[c][1]
+        ]
+        escritos = nuevos + cambiados
+
+        # Cursos cuyas aristas del grafo hay que recalcular, por periodo
+        tocados_por_periodo: Dict[str, List[str]] = {}
+        for c in escritos + reactivados:
+            tocados_por_periodo.setdefault(cursos[c]['fila'][4], []).append(c)
+            # Un curso que cambió de periodo deja de estar en el anterior
+            if c in existentes and existentes[c][2] != cursos[c]['fila'][4]:
+                tocados_por_periodo.setdefault(existentes[c][2], []).append(c)
+
+        # Cursos que ya no aparecen en las materias importadas de cada periodo
+        retirados = []
+        for periodo, materias_del_periodo in datos['materias_por_periodo'].items():
+            for lote in _en_lotes(sorted(materias_del_periodo)):
+                cursor.execute(f'''
+                    SELECT codigo FROM cursos
+                    WHERE periodo = ? AND retirado = 0
+                    AND materia_codigo IN ({','.join('?' * len(lote))})
+                ''', [periodo] + lote)
+                for (codigo,) in cursor.fetchall():
+                    if codigo not in cursos:
+                        retirados.append(codigo)
+                        tocados_por_periodo.setdefault(periodo, []).append(codigo)
+
+        # Materias nuevas o renombradas
+        cursor.execute('SELECT codigo, nombre FROM materias')
+        nombres_actuales = dict(cursor.fetchall())
+        materias = [
+            (codigo, nombre) for codigo, nombre in datos['materias'].items()
+            if nombres_actuales.get(codigo) != nombre
+        ]
+        cursor.executemany('''
+            INSERT INTO materias (codigo, nombre) VALUES (?, ?)
+            ON CONFLICT(codigo) DO UPDATE SET nombre = excluded.nombre
+        ''', materias)
+        avanzar('guardando', len(materias))
+
+        cursor.executemany('''
+            INSERT INTO cursos
+            (codigo, materia_codigo, numero_curso, catedra, periodo, sede, mascara, huella, modalidad, votos_modalidad)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'sin_confirmar', 0)
+        ''', [cursos[c]['fila'] + (cursos[c]['huella'],) for c in nuevos])
+        avanzar('guardando', len(nuevos))
+
+        # Los cursos cambiados conservan la modalidad y los votos ya juntados
+        cursor.executemany('''
+            UPDATE cursos SET
+                materia_codigo = ?, numero_curso = ?, catedra = ?, periodo = ?, sede = ?,
+                mascara = ?, huella = ?, retirado = 0
+            WHERE codigo = ?
+        ''', [cursos[c]['fila'][1:] + (cursos[c]['huella'], c) for c in cambiados])
+        avanzar('guardando', len(cambiados))
+
+        cursor.executemany('UPDATE cursos SET retirado = 0 WHERE codigo = ?', [(c,) for c in reactivados])
+        cursor.executemany('UPDATE cursos SET retirado = 1 WHERE codigo = ?', [(c,) for c in retirados])
+        avanzar('guardando', len(reactivados) + len(retirados))
+
+        # Reemplazar docentes y clases sólo de los cursos escritos
+        cursor.executemany('DELETE FROM curso_docentes WHERE curso_codigo = ?', [(c,) for c in cambiados])
+        cursor.executemany('DELETE FROM clases WHERE curso_codigo = ?', [(c,) for c in cambiados])
+
+        docentes = sorted({d for c in escritos for d in cursos[c]['docentes']})
+        curso_docentes = [(c, d) for c in escritos for d in cursos[c]['docentes']]
+        clases = [clase for c in escritos for clase in cursos[c]['clases']]
+        cursor.executemany('INSERT OR IGNORE INTO docentes (nombre) VALUES (?)', [(d,) for d in docentes])
+        avanzar('guardando', len(docentes))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO curso_docentes (curso_codigo, docente_nombre)
+            VALUES (?, ?)
+        ''', curso_docentes)
+        avanzar('guardando', len(curso_docentes))
+        cursor.executemany('''
+            INSERT INTO clases
+            (curso_codigo, dia, hora_inicio, hora_fin, inicio_min, fin_min)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', clases)
+        avanzar('guardando', len(clases))
+
+        # Actualizar el grafo de conflictos sólo para los cursos que cambiaron
+        avanzar('reindexando')
+        aristas = 0
+        for periodo, tocados in tocados_por_periodo.items():
+            aristas += grafo_conflictos.actualizar_conflictos(conn, periodo, tocados)
+        
+        # Reindexar para la búsqueda los cursos tocados y los de materias renombradas
+        busqueda.actualizar(conn, escritos + reactivados + retirados, [codigo for codigo, _ in materias])
+
+        # La primera importación deja su periodo como activo
+        periodos.proponer(conn, parsed_data[-1]['periodo'])
+        
+        # Una importación que cambió algo invalida los ETags del catálogo y los
+        # índices de horarios (que también guardan los nombres de las materias)
+        version = version_horarios = None
+        if materias or tocados_por_periodo:
+            version = versiones.incrementar(conn, 'catalogo')
+            version_horarios = versiones.incrementar(conn, 'horarios')
+
+        if confirmar:
+            conn.commit()
+        else:
+            conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if confirmar:
+        if version_horarios is not None:
+            # Sólo quedaron viejos los índices de los periodos que cambiaron,
+            # salvo que se haya renombrado una materia, que puede estar en cualquiera
+            renombradas = any(codigo in nombres_actuales for codigo, _ in materias)
+            indice_horarios.publicar(None if renombradas else tocados_por_periodo, version_horarios)
+        if version is not None:
+            # La foto nueva del catálogo se instala antes de publicar la versión
+            catalogo.recargar()
+            versiones.publicar('catalogo', version)
+
+    segundos = time.perf_counter() - inicio
+
+    stats = {
+        'periodos': len(parsed_data),
+        'total_materias': sum(len(p['materias']) for p in parsed_data),
+        'total_cursos': sum(len(p['cursos']) for p in parsed_data),
+        'saved_to_db': len(escritos),
+        'cursos_nuevos': len(nuevos),
+        'cursos_actualizados': len(cambiados),
+        'cursos_sin_cambios': len(codigos) - len(escritos) - len(reactivados),
+        'cursos_reactivados': len(reactivados),
+        'cursos_retirados': len(retirados),
+        'filas_escritas': filas_escritas,
+        'aristas_conflicto': aristas,
+        'segundos': round(segundos, 4),
+        'filas_por_segundo': round(filas_escritas / segundos) if segundos > 0 else filas_escritas
+    }
+    if not confirmar:
+        stats['cambios'] = {
+            'nuevos': nuevos,
+            'actualizados': cambiados,
+            'reactivados': reactivados,
+            'retirados': retirados
+        }
+    return stats
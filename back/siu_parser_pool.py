@@ -0,0 +1,235 @@
+import atexit
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import metricas
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(BACKEND_DIR, 'siuparser_worker.mjs')
+
+TAMANIO_POOL = int(os.environ.get('SIU_PARSER_WORKERS', '2'))
+TIMEOUT_TRABAJO = float(os.environ.get('SIU_PARSER_TIMEOUT', '30'))
+INTERVALO_SALUD = float(os.environ.get('SIU_PARSER_HEALTHCHECK', '60'))
+
+
+class ErrorParser(Exception):
+    """El parser devolvió un error o el worker se cayó en medio de un trabajo"""
+
+    def __init__(self, mensaje: str, detalles: str = ''):
+        super().__init__(mensaje)
+        self.detalles = detalles
+
+
+class TrabajadorParser:
+    """
+    Un proceso de Node de larga vida que corre siuparser_worker.mjs.
+    Se comunica con mensajes JSON compactos, uno por línea, por stdin/stdout.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._respuestas: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._stderr = deque(maxlen=50)
+        self.proceso = subprocess.Popen(
+            ['node', WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+            cwd=BACKEND_DIR
+        )
+        threading.Thread(target=self._leer_stdout, daemon=True).start()
+        threading.Thread(target=self._leer_stderr, daemon=True).start()
+
+    def _leer_stdout(self):
+        for linea in self.proceso.stdout:
+            try:
+                self._respuestas.put(json.loads(linea))
+            except json.JSONDecodeError:
+                self._stderr.append(f'Salida inválida del worker: {linea[:200]}')
+        # EOF: el proceso terminó
+        self._respuestas.put(None)
+
+    def _leer_stderr(self):
+        for linea in self.proceso.stderr:
+            self._stderr.append(linea.rstrip())
+
+    def vivo(self) -> bool:
+        return self.proceso.poll() is None
+
+    def detalles(self) -> str:
+        return '\n'.join(self._stderr)
+
+    def enviar(self, mensaje: Dict[str, Any], timeout: float) -> Any:
+        """Envía un mensaje y espera su respuesta; lanza TimeoutError o ErrorParser"""
+        mensaje = dict(mensaje, id=next(self._ids))
+        try:
+            self.proceso.stdin.write(json.dumps(mensaje, ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.proceso.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ErrorParser('El worker del parser no está disponible', str(e))
+
+        limite = time.monotonic() + timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise TimeoutError('El parser tardó demasiado')
+            try:
+                respuesta = self._respuestas.get(timeout=restante)
+            except queue.Empty:
+                raise TimeoutError('El parser tardó demasiado')
+
+            if respuesta is None:
+                raise ErrorParser('El worker del parser terminó inesperadamente', self.detalles())
+            # Respuestas de un trabajo anterior que venció se descartan
+            if respuesta.get('id') != mensaje['id']:
+                continue
+            if not respuesta.get('ok'):
+                raise ErrorParser('Error al procesar el texto del SIU', respuesta.get('error', ''))
+            return respuesta.get('resultado')
+
+    def terminar(self):
+        if self.vivo():
+            self.proceso.kill()
+        try:
+            self.proceso.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class PoolParserSIU:
+    """
+    Pool de workers de Node para parsear texto del SIU sin pagar el arranque
+    de Node en cada importación. Cada trabajo toma un worker libre, así que
+    importaciones concurrentes corren en paralelo (hasta 'tamanio').
+
+    Los workers caídos se reinician al tomarlos; un trabajo que supera el
+    timeout mata a su worker y se reemplaza por uno nuevo.
+    """
+
+    def __init__(self, tamanio: int = TAMANIO_POOL, timeout: float = TIMEOUT_TRABAJO):
+        self.tamanio = tamanio
+        self.timeout = timeout
+        self._libres: "queue.Queue[TrabajadorParser]" = queue.Queue()
+        self._todos: List[TrabajadorParser] = []
+        self._lock = threading.Lock()
+        self.trabajos = 0
+        self.errores = 0
+        self.timeouts = 0
+        self.reinicios = 0
+        self._segundos_totales = 0.0
+
+        for _ in range(tamanio):
+            trabajador = TrabajadorParser()
+            self._todos.append(trabajador)
+            self._libres.put(trabajador)
+
+    def _reemplazar(self, trabajador: TrabajadorParser) -> TrabajadorParser:
+        trabajador.terminar()
+        nuevo = TrabajadorParser()
+        with self._lock:
+            self._todos[self._todos.index(trabajador)] = nuevo
+            self.reinicios += 1
+        return nuevo
+
+    def parsear(self, texto: str, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Parsea el texto del SIU con un worker libre y devuelve la lista de periodos"""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        try:
+            trabajador = self._libres.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('No hay workers del parser libres')
+
+        try:
+            if not trabajador.vivo():
+                trabajador = self._reemplazar(trabajador)
+            restante = max(0.0, timeout - (time.monotonic() - inicio))
+            resultado = trabajador.enviar({'tipo': 'parsear', 'texto': texto}, restante)
+            with self._lock:
+                self.trabajos += 1
+                self._segundos_totales += time.monotonic() - inicio
+            return resultado
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            trabajador = self._reemplazar(trabajador)
+            raise
+        except ErrorParser:
+            with self._lock:
+                self.errores += 1
+            if not trabajador.vivo():
+                trabajador = self._reemplazar(trabajador)
+            raise
+        finally:
+            self._libres.put(trabajador)
+
+    def verificar_salud(self, timeout: float = 5) -> Dict[str, Any]:
+        """Hace ping a los workers libres y reinicia los que no responden"""
+        revisados = 0
+        reiniciados = 0
+        for _ in range(self._libres.qsize()):
+            try:
+                trabajador = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if not trabajador.vivo():
+                    raise ErrorParser('Worker caído')
+                trabajador.enviar({'tipo': 'ping'}, timeout)
+            except (TimeoutError, ErrorParser):
+                trabajador = self._reemplazar(trabajador)
+                reiniciados += 1
+            finally:
+                revisados += 1
+                self._libres.put(trabajador)
+        return {'revisados': revisados, 'reiniciados': reiniciados}
+
+    def cerrar(self):
+        for trabajador in self._todos:
+            trabajador.terminar()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.tamanio,
+                'workers_vivos': sum(1 for t in self._todos if t.vivo()),
+                'workers_libres': self._libres.qsize(),
+                'trabajos': self.trabajos,
+                'errores': self.errores,
+                'timeouts': self.timeouts,
+                'reinicios': self.reinicios,
+                'segundos_promedio': round(self._segundos_totales / self.trabajos, 4) if self.trabajos else 0.0
+            }
+
+
+_pool: Optional[PoolParserSIU] = None
+_pool_lock = threading.Lock()
+
+
+def _chequeo_periodico(pool: PoolParserSIU):
+    while True:
+        time.sleep(INTERVALO_SALUD)
+        pool.verificar_salud()
+
+
+def obtener_pool() -> PoolParserSIU:
+    """Devuelve el pool compartido, creándolo la primera vez que se usa"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolParserSIU()
+                atexit.register(_pool.cerrar)
+                threading.Thread(target=_chequeo_periodico, args=(_pool,), daemon=True).start()
+                metricas.registrar('parser_siu', _pool.estadisticas)
+    return _pool
@@ -1,38 +1,48 @@
-from flask import Blueprint, request, jsonify
-import subprocess
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import json
-import os
-import sqlite3
+import subprocess
+
+import busqueda
+import catalogo
+import importaciones
+import periodos
+import siu_importador
+import siu_parser_pool
+import versiones
+from db import get_db
+from paginacion import codificar_cursor, leer_pagina
 
 siu_bp = Blueprint('siu', __name__)
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect('scheduler.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def parsear_docentes(docentes_str):
-    """
-    Parsear string de docentes y devolver lista limpia
-    Ej: "Juan Perez, Maria Lopez" -> ["Juan Perez", "Maria Lopez"]
-    """
-    if not docentes_str:
-        return []
-    
-    # Separar por comas y limpiar espacios
-    docentes = [d.strip() for d in docentes_str.split(',')]
-    
-    # Filtrar strings vacíos
-    docentes = [d for d in docentes if d]
-    
-    return docentes
+# Campos que se pueden pedir con ?campos= en /cursos
+CAMPOS_CURSO = ('codigo', 'numero_curso', 'catedra', 'periodo', 'modalidad', 'sede', 'materia', 'docentes', 'clases')
 
+def ficha_curso(curso, campos=CAMPOS_CURSO):
+    """Curso de la foto del catálogo como lo devuelve la API, sólo con los campos pedidos"""
+    completo = {
+        'codigo': curso['codigo'],
+        'numero_curso': curso['numero_curso'],
+        'catedra': curso['catedra'],
+        'periodo': curso['periodo'],
+        'modalidad': curso['modalidad'],
+        'sede': curso['sede'],
+        'materia': curso['materia'],
+        'docentes': curso['docentes'],
+        # Los minutos son internos del armado de planes
+        'clases': [
+            {'dia': clase['dia'], 'hora_inicio': clase['hora_inicio'], 'hora_fin': clase['hora_fin']}
+            for clase in curso['clases']
+        ]
+    }
+    return {campo: completo[campo] for campo in campos}
 
 @siu_bp.route('/parse-siu', methods=['POST'])
 def parse_siu():
     """
     Endpoint que recibe el texto copiado del SIU, lo parsea y GUARDA en la BD normalizada.
+    
+    Con "async": true la importación se encola y se responde 202 con el id del
+    trabajo; el avance se consulta en GET /api/siu/importaciones/<id>.
     """
     try:
         data = request.get_json()
@@ -52,140 +62,45 @@ def parse_siu():
                 'error': 'El texto está vacío'
             }), 400
         
-        # Ejecutar el parser de JavaScript
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        result = subprocess.run(
-            ['node', os.path.join(backend_dir, 'run_siuparser.mjs')],
-            input=raw_text,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            timeout=30
-        )
+        if data.get('async'):
+            trabajo_id = importaciones.encolar(raw_text)
+            return jsonify({
+                'success': True,
+                'trabajo': trabajo_id,
+                'estado_url': f'/api/siu/importaciones/{trabajo_id}'
+            }), 202
         
-        if result.returncode != 0:
+        # Parsear con el pool de workers de Node (no se arranca un proceso por pedido)
+        try:
+            parsed_data = siu_parser_pool.obtener_pool().parsear(raw_text)
+        except siu_parser_pool.ErrorParser as e:
             print("Error en el parser:")
-            print(result.stderr)
+            print(e.detalles)
             return jsonify({
                 'success': False,
-                'error': 'Error al procesar el texto del SIU',
-                'details': result.stderr
+                'error': str(e),
+                'details': e.detalles
             }), 500
         
-        # Parsear el JSON
-        try:
-            parsed_data = json.loads(result.stdout)
-            
-            if not parsed_data or len(parsed_data) == 0:
-                return jsonify({
-                    'success': False,
-                    'error': 'No se pudieron extraer materias del texto proporcionado'
-                }), 400
-            
-            conn = get_db()
-            cursor = conn.cursor()
-            saved_count = 0
-            
-            for periodo_data in parsed_data:
-                periodo = periodo_data['periodo']
-                
-                for materia in periodo_data['materias']:
-                    # 1. Insertar materia
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO materias (codigo, nombre)
-                        VALUES (?, ?)
-                    ''', (materia['codigo'], materia['nombre']))
-                    
-                    # 2. Insertar cada curso de la materia
-                    for curso_codigo in materia['cursos']:
-                        # Buscar el curso completo en la lista de cursos
-                        curso = next(
-                            (c for c in periodo_data['cursos'] if c['codigo'] == curso_codigo),
-                            None
-                        )
-                        
-                        if curso:
-                            # Extraer información del curso
-                            numero_curso = curso.get('numero', curso_codigo.split('-')[-1])
-                            catedra = curso.get('catedra')
-                            
-                            # 3. Insertar curso
-                            cursor.execute('''
-                                INSERT OR REPLACE INTO cursos 
-                                (codigo, materia_codigo, numero_curso, catedra, periodo, sede, modalidad, votos_modalidad)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (curso_codigo, 
-                                materia['codigo'], 
-                                numero_curso, 
-                                catedra, 
-                                periodo,
-                                curso.get('sede', 'Sede desconocida'),
-                                'sin_confirmar',
-                                0
-                            ))
-                            
-                            # Limpiar docentes y clases anteriores
-                            cursor.execute('DELETE FROM curso_docentes WHERE curso_codigo = ?', (curso_codigo,))
-                            cursor.execute('DELETE FROM clases WHERE curso_codigo = ?', (curso_codigo,))
-                            
-                            # 4. Parsear y guardar docentes
-                            docentes_lista = parsear_docentes(curso['docentes'])
-                            for nombre_docente in docentes_lista:
-                                if not nombre_docente.strip():
-                                    continue
-                                
-                                # Insertar docente
-                                cursor.execute('''
-                                    INSERT OR IGNORE INTO docentes (nombre)
-                                    VALUES (?)
-                                ''', (nombre_docente,))
-                                
-                                # Asociar docente con curso
-                                cursor.execute('''
-                                    INSERT OR IGNORE INTO curso_docentes (curso_codigo, docente_nombre)
-                                    VALUES (?, ?)
-                                ''', (curso_codigo, nombre_docente))
-                            
-                            # 5. Guardar clases
-                            for clase in curso['clases']:
-                                cursor.execute('''
-                                    INSERT INTO clases 
-                                    (curso_codigo, dia, hora_inicio, hora_fin)
-                                    VALUES (?, ?, ?, ?)
-                                ''', (
-                                    curso_codigo,
-                                    clase['dia'],
-                                    clase['inicio'],
-                                    clase['fin']
-                                ))
-                            
-                            saved_count += 1
-            
-            conn.commit()
-            conn.close()
-            
-            # Calcular estadísticas
-            stats = {
-                'periodos': len(parsed_data),
-                'total_materias': sum(len(p['materias']) for p in parsed_data),
-                'total_cursos': sum(len(p['cursos']) for p in parsed_data),
-                'saved_to_db': saved_count
-            }
-            
-            return jsonify({
-                'success': True,
-                'data': parsed_data,
-                'stats': stats
-            }), 200
-            
-        except json.JSONDecodeError as e:
-            print(f"Error al decodificar JSON: {e}")
+        if not parsed_data or len(parsed_data) == 0:
             return jsonify({
                 'success': False,
-                'error': 'Error al procesar la respuesta del parser'
-            }), 500
+                'error': 'No se pudieron extraer materias del texto proporcionado'
+            }), 400
+        
+        conn = get_db()
+        try:
+            stats = siu_importador.persistir_catalogo(conn, parsed_data)
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'success': True,
+            'data': parsed_data,
+            'stats': stats
+        }), 200
     
-    except subprocess.TimeoutExpired:
+    except TimeoutError:
         return jsonify({
             'success': False,
             'error': 'El procesamiento tardó demasiado tiempo'
@@ -202,23 +117,33 @@ def parse_siu():
         }), 500
 
 
+@siu_bp.route('/importaciones/<trabajo_id>', methods=['GET'])
+def get_importacion(trabajo_id):
+    """
+    Estado de una importación en segundo plano.
+    fase: en_cola | parseando | guardando | reindexando | terminado | error
+    """
+    trabajo = importaciones.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({
+            'success': False,
+            'error': 'Importación no encontrada'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'importacion': trabajo
+    }), 200
+
+
 @siu_bp.route('/materias', methods=['GET'])
+@versiones.con_etag('catalogo')
 def get_materias():
     """
     Obtener lista de todas las materias
     """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT codigo, nombre, creditos
-            FROM materias
-            ORDER BY nombre
-        ''')
-        
-        materias = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        materias = catalogo.actual().materias_ordenadas
         
         return jsonify({
             'success': True,
@@ -234,6 +159,7 @@ def get_materias():
 
 
 @siu_bp.route('/materias/<codigo>/cursos', methods=['GET'])
+@versiones.con_etag('catalogo')
 def get_cursos_de_materia(codigo):
     """
     Ejemplo: GET /api/siu/materias/61.03/cursos
@@ -241,40 +167,21 @@ def get_cursos_de_materia(codigo):
     try:
         periodo = request.args.get('periodo')  # Filtro opcional
         
-        conn = get_db()
-        cursor = conn.cursor()
+        foto = catalogo.actual()
         
         # Verificar que la materia existe
-        cursor.execute('SELECT * FROM materias WHERE codigo = ?', (codigo,))
-        materia = cursor.fetchone()
+        materia = foto.materias.get(codigo)
         
         if not materia:
-            conn.close()
             return jsonify({
                 'success': False,
                 'error': f'Materia {codigo} no encontrada'
             }), 404
         
-        # Query base para cursos
-        query = '''
-            SELECT codigo, numero_curso, catedra, periodo, sede, modalidad, votos_modalidad
-            FROM cursos
-            WHERE materia_codigo = ?
-        '''
-        params = [codigo]
-        
-        if periodo:
-            query += ' AND periodo = ?'
-            params.append(periodo)
-        
-        query += ' ORDER BY CAST(numero_curso AS INTEGER)'
-        
-        cursor.execute(query, params)
-        cursos = cursor.fetchall()
-        
+        # La materia ya va una sola vez en la respuesta
+        campos = tuple(campo for campo in CAMPOS_CURSO if campo != 'materia')
         result = []
-        for curso in cursos:
-            codigo_curso = curso['codigo']
+        for curso in foto.cursos_de_materia(codigo, periodo or None):
             numero = curso['numero_curso']
             catedra = curso['catedra']
             
@@ -284,36 +191,7 @@ def get_cursos_de_materia(codigo):
             else:
                 nombre_curso = f"Curso {numero}"
             
-            # Obtener docentes
-            cursor.execute('''
-                SELECT docente_nombre as nombre
-                FROM curso_docentes
-                WHERE curso_codigo = ?
-            ''', (codigo_curso,))
-            docentes = [row['nombre'] for row in cursor.fetchall()]
-            
-            # Obtener clases
-            cursor.execute('''
-                SELECT dia, hora_inicio, hora_fin
-                FROM clases
-                WHERE curso_codigo = ?
-                ORDER BY dia, hora_inicio
-            ''', (codigo_curso,))
-            clases = [dict(row) for row in cursor.fetchall()]
-            
-            result.append({
-                'codigo': curso['codigo'],
-                'nombre': nombre_curso,
-                'numero_curso': curso['numero_curso'],
-                'catedra': curso['catedra'],
-                'periodo': curso['periodo'],
-                'modalidad': curso['modalidad'],
-                'sede': curso['sede'],
-                'docentes': docentes,
-                'clases': clases
-            })
-        
-        conn.close()
+            result.append({'nombre': nombre_curso, **ficha_curso(curso, campos)})
         
         return jsonify({
             'success': True,
@@ -336,84 +214,72 @@ def get_cursos_de_materia(codigo):
 
 
 @siu_bp.route('/cursos', methods=['GET'])
+@versiones.con_etag('catalogo')
 def get_cursos():
     """
     Obtener todos los cursos con información completa
     Puede filtrar por periodo o materia usando query params
+    
+    Query params opcionales:
+        campos=codigo,materia,clases   sólo esos campos de cada curso
+        limite=100&cursor=...          paginado por keyset; la respuesta trae
+                                       'siguiente' para pedir la próxima página
+        exportar=1                     listado completo en streaming, por lotes
     """
     try:
         periodo = request.args.get('periodo')
         materia_codigo = request.args.get('materia')
         
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Query base
-        query = '''
-            SELECT 
-                c.codigo, c.numero_curso, c.catedra, c.periodo, c.sede, c.modalidad, c.votos_modalidad,
-                m.codigo as materia_codigo, m.nombre as materia_nombre
-            FROM cursos c
-            JOIN materias m ON c.materia_codigo = m.codigo
-            WHERE 1=1
-        '''
-        params = []
+        campos = CAMPOS_CURSO
+        if request.args.get('campos'):
+            campos = tuple(dict.fromkeys(c.strip() for c in request.args['campos'].split(',') if c.strip()))
+            invalidos = [c for c in campos if c not in CAMPOS_CURSO]
+            if invalidos or not campos:
+                return jsonify({
+                    'success': False,
+                    'error': f"Campos inválidos: {', '.join(invalidos)}. Válidos: {', '.join(CAMPOS_CURSO)}"
+                }), 400
         
-        if periodo:
-            query += ' AND c.periodo = ?'
-            params.append(periodo)
+        try:
+            limite, despues = leer_pagina(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        if materia_codigo:
-            query += ' AND m.codigo = ?'
-            params.append(materia_codigo)
+        # Todo el pedido lee de la misma foto, aunque en el medio se importe
+        foto = catalogo.actual()
         
-        query += ' ORDER BY m.nombre, c.numero_curso'
+        if request.args.get('exportar'):
+            return Response(
+                stream_with_context(exportar_cursos(foto, periodo, materia_codigo, campos)),
+                mimetype='application/json'
+            )
         
-        cursor.execute(query, params)
-        cursos = cursor.fetchall()
+        if limite is None:
+            result = [ficha_curso(curso, campos) for curso in foto.listar(periodo or None, materia_codigo or None)]
+            return jsonify({
+                'success': True,
+                'cursos': result,
+                'total': len(result)
+            }), 200
         
-        result = []
-        for curso in cursos:
-            codigo_curso = curso['codigo']
-            
-            # Obtener docentes
-            cursor.execute('''
-                SELECT docente_nombre as nombre
-                FROM curso_docentes
-                WHERE curso_codigo = ?
-            ''', (codigo_curso,))
-            docentes = [row['nombre'] for row in cursor.fetchall()]
-            
-            # Obtener clases
-            cursor.execute('''
-                SELECT dia, hora_inicio, hora_fin
-                FROM clases
-                WHERE curso_codigo = ?
-                ORDER BY dia, hora_inicio
-            ''', (codigo_curso,))
-            clases = [dict(row) for row in cursor.fetchall()]
-            
-            result.append({
-                'codigo': curso['codigo'],
-                'numero_curso': curso['numero_curso'],
-                'catedra': curso['catedra'],
-                'periodo': curso['periodo'],
-                'modalidad': curso['modalidad'],
-                'sede': curso['sede'],
-                'materia': {
-                    'codigo': curso['materia_codigo'],
-                    'nombre': curso['materia_nombre']
-                },
-                'docentes': docentes,
-                'clases': clases
+        # Se pide uno de más para saber si hay otra página
+        cursos = list(foto.listar(periodo or None, materia_codigo or None, despues, limite + 1))
+        
+        siguiente = None
+        if len(cursos) > limite:
+            cursos = cursos[:limite]
+            ultimo = cursos[-1]
+            siguiente = codificar_cursor({
+                'materia_nombre': ultimo['materia']['nombre'],
+                'numero_curso': ultimo['numero_curso'],
+                'codigo': ultimo['codigo']
             })
         
-        conn.close()
-        
         return jsonify({
             'success': True,
-            'cursos': result,
-            'total': len(result)
+            'cursos': [ficha_curso(curso, campos) for curso in cursos],
+            'total': len(cursos),
+            'siguiente': siguiente
         }), 200
         
     except Exception as e:
@@ -425,68 +291,39 @@ def get_cursos():
         }), 500
 
 
+def exportar_cursos(foto, periodo, materia_codigo, campos):
+    """
+    Genera el JSON del listado completo curso por curso desde una foto del
+    catálogo, sin armar la lista entera en memoria.
+    """
+    total = 0
+    yield '{"success": true, "cursos": ['
+    for curso in foto.listar(periodo or None, materia_codigo or None):
+        yield (',' if total else '') + json.dumps(ficha_curso(curso, campos), ensure_ascii=False)
+        total += 1
+    yield f'], "total": {total}}}'
+
+
 @siu_bp.route('/cursos/<codigo>', methods=['GET'])
+@versiones.con_etag('catalogo')
 def get_curso(codigo):
     """
     Obtener un curso específico por su código completo (ej: "61.03-1")
     """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Obtener curso y materia
-        cursor.execute('''
-            SELECT 
-                c.codigo, c.numero_curso, c.catedra, c.periodo, c.sede, c.modalidad, c.votos_modalidad,
-                m.codigo as materia_codigo, m.nombre as materia_nombre
-            FROM cursos c
-            JOIN materias m ON c.materia_codigo = m.codigo
-            WHERE c.codigo = ?
-        ''', (codigo,))
-        
-        curso = cursor.fetchone()
+        foto = catalogo.actual()
+        curso = foto.curso(codigo)
         if not curso:
-            conn.close()
             return jsonify({
                 'success': False,
                 'error': 'Curso no encontrado'
             }), 404
         
-        # Obtener docentes
-        cursor.execute('''
-            SELECT docente_nombre as nombre
-            FROM curso_docentes
-            WHERE curso_codigo = ?
-        ''', (codigo,))
-        docentes = [row['nombre'] for row in cursor.fetchall()]
-        
-        # Obtener clases
-        cursor.execute('''
-                SELECT dia, hora_inicio, hora_fin
-                FROM clases
-                WHERE curso_codigo = ?
-                ORDER BY dia, hora_inicio
-            ''', (codigo,))
-        clases = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
         return jsonify({
             'success': True,
             'curso': {
-                'codigo': curso['codigo'],
-                'numero_curso': curso['numero_curso'],
-                'catedra': curso['catedra'],
-                'periodo': curso['periodo'],
-                'modalidad': curso['modalidad'],
-                'sede': curso['sede'],
-                'votos_modalidad': curso['votos_modalidad'],
-                'materia': {
-                    'codigo': curso['materia_codigo'],
-                    'nombre': curso['materia_nombre']
-                },
-                'docentes': docentes,
-                'clases': clases
+                **ficha_curso(curso),
+                'votos_modalidad': foto.votos[codigo]
             }
         }), 200
         
@@ -497,10 +334,140 @@ def get_curso(codigo):
         }), 500
 
 
+@siu_bp.route('/buscar', methods=['GET'])
+@versiones.con_etag('catalogo')
+def buscar():
+    """
+    Búsqueda por nombre o código de materia, cátedra o docente, pensada para
+    autocompletar: sin acentos ni mayúsculas, y cada palabra como prefijo.
+    
+    Ejemplo: GET /api/siu/buscar?q=anal mat&limite=10&offset=0
+    """
+    try:
+        texto = request.args.get('q', '').strip()
+        limite = request.args.get('limite', 10, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        
+        if not 1 <= limite <= busqueda.LIMITE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'limite debe estar entre 1 y {busqueda.LIMITE_MAXIMO}'
+            }), 400
+        if offset < 0:
+            return jsonify({
+                'success': False,
+                'error': 'offset no puede ser negativo'
+            }), 400
+        
+        try:
+            resultados = busqueda.buscar(texto, limite, offset)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'resultados': resultados,
+            'total': len(resultados)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@siu_bp.route('/periodos', methods=['GET'])
+def get_periodos():
+    """Periodos con cursos, el periodo activo y los periodos archivados"""
+    try:
+        return jsonify({
+            'success': True,
+            **periodos.listar_periodos()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@siu_bp.route('/periodos/activo', methods=['PUT'])
+def put_periodo_activo():
+    """
+    Cambia el periodo que se usa por defecto al armar planes
+    
+    Esperado:
+    {
+        "periodo": "2025 - 2do Cuatrimestre"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('periodo'):
+            return jsonify({
+                'success': False,
+                'error': 'Falta el periodo'
+            }), 400
+        
+        try:
+            periodos.cambiar_periodo_activo(data['periodo'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'activo': data['periodo']
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@siu_bp.route('/periodos/archivar', methods=['POST'])
+def archivar_periodo():
+    """
+    Mueve un periodo viejo a la BD de archivo (scheduler_archivo.db)
+    
+    Esperado:
+    {
+        "periodo": "2025 - 1er Cuatrimestre"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('periodo'):
+            return jsonify({
+                'success': False,
+                'error': 'Falta el periodo'
+            }), 400
+        
+        try:
+            stats = periodos.archivar_periodo(data['periodo'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'stats': stats
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @siu_bp.route('/test-parser', methods=['GET'])
 def test_parser():
     """
     Endpoint de prueba para verificar que Node.js está disponible
+    y que los workers del pool del parser responden
     """
     try:
         result = subprocess.run(
@@ -510,10 +477,16 @@ def test_parser():
             timeout=5
         )
         
+        pool = siu_parser_pool.obtener_pool()
+        salud = pool.verificar_salud()
+        estado_pool = pool.estadisticas()
+        
         return jsonify({
             'success': True,
             'node_version': result.stdout.strip(),
-            'parser_ready': True
+            'parser_ready': estado_pool['workers_vivos'] > 0,
+            'pool': estado_pool,
+            'salud': salud
         }), 200
     
     except Exception as e:
@@ -0,0 +1,42 @@
+import { createInterface } from "node:readline";
+import { parseSIU } from "./siuparser.mjs";
+
+// Worker de larga vida para el pool de parsers del backend.
+// Protocolo: una línea de JSON compacto por mensaje, en ambos sentidos.
+//   entrada: {"id": 1, "tipo": "parsear", "texto": "..."}  |  {"id": 2, "tipo": "ping"}
+//   salida:  {"id": 1, "ok": true, "resultado": [...]}     |  {"id": 1, "ok": false, "error": "..."}
+
+// Los logs de depuración del parser sólo se muestran si se piden explícitamente
+if (!process.env.SIU_PARSER_DEBUG) {
+  console.error = () => {};
+}
+
+const responder = (mensaje) => {
+  process.stdout.write(JSON.stringify(mensaje) + "\n");
+};
+
+const lineas = createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+lineas.on("line", (linea) => {
+  if (!linea.trim()) return;
+
+  let pedido;
+  try {
+    pedido = JSON.parse(linea);
+  } catch (err) {
+    responder({ id: null, ok: false, error: `Mensaje inválido: ${err.message}` });
+    return;
+  }
+
+  try {
+    if (pedido.tipo === "ping") {
+      responder({ id: pedido.id, ok: true, resultado: "pong" });
+    } else {
+      responder({ id: pedido.id, ok: true, resultado: parseSIU(pedido.texto ?? "") });
+    }
+  } catch (err) {
+    responder({ id: pedido.id, ok: false, error: err.stack || String(err) });
+  }
+});
+
+lineas.on("close", () => process.exit(0));
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import app
+import versiones
+
+
+@pytest.fixture
+def bd(tmp_path, monkeypatch):
+    """
+    BD nueva con el esquema completo en tmp_path, que pasa a ser el directorio
+    actual (así la app la usa como scheduler.db). Devuelve una conexión propia
+    para sembrar datos y consultarlos desde el test.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('SCHEDULER_ARCHIVO', raising=False)
+    app.init_db()
+    versiones.olvidar()
+    conn = sqlite3.connect('scheduler.db')
+    yield conn
+    conn.close()
+    versiones.olvidar()
+
+
+@pytest.fixture
+def cliente(bd):
+    return app.app.test_client()
+
+
+@pytest.fixture
+def curso(bd):
+    """Un curso sin votos (TB025-1) para los tests de feedback"""
+    bd.execute("INSERT INTO materias (codigo, nombre) VALUES ('TB025', 'Paradigmas')")
+    bd.execute('''
+        INSERT INTO cursos (codigo, materia_codigo, numero_curso, periodo, sede)
+        VALUES ('TB025-1', 'TB025', '1', '2025-2C', 'PC')
+    ''')
+    bd.commit()
+    return 'TB025-1'
@@ -0,0 +1,86 @@
+import copy
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from siu_importador import persistir_catalogo
+
+PERIODO = '2025 - 2do Cuatrimestre'
+
+
+def curso(codigo, catedra, docentes):
+    return {
+        'codigo': codigo,
+        'numero': codigo.split('-')[1],
+        'catedra': catedra,
+        'sede': 'PC',
+        'docentes': docentes,
+        'clases': [{'dia': 0, 'inicio': '09:00', 'fin': '12:00'}]
+    }
+
+
+PARSEADO = [{
+    'periodo': PERIODO,
+    'materias': [
+        {'codigo': 'CB001', 'nombre': 'ANÁLISIS MATEMÁTICO II', 'cursos': ['CB001-1', 'CB001-2']},
+        {'codigo': 'TB025', 'nombre': 'PARADIGMAS DE PROGRAMACIÓN', 'cursos': ['TB025-1']}
+    ],
+    'cursos': [
+        curso('CB001-1', 'Sola', 'SOLA MARCOS, PIÑERA EDUARDO'),
+        curso('CB001-2', 'Lopez', 'LOPEZ CLAUDIA'),
+        curso('TB025-1', 'Essaya', 'ESSAYA DIEGO, LÓPEZ MARTÍN')
+    ]
+}]
+
+
+@pytest.fixture
+def cliente(cliente, bd):
+    persistir_catalogo(bd, PARSEADO)
+    return cliente, bd
+
+
+def buscar(cliente, q, **params):
+    respuesta = cliente.get('/api/siu/buscar', query_string={'q': q, **params})
+    return respuesta.status_code, respuesta.get_json()
+
+
+def test_prefijos_sin_acentos(cliente):
+    cliente, _ = cliente
+    _, datos = buscar(cliente, 'analisis mate')
+    assert [r['materia']['codigo'] for r in datos['resultados']] == ['CB001']
+
+    _, datos = buscar(cliente, 'pine')
+    assert [c['codigo'] for c in datos['resultados'][0]['cursos']] == ['CB001-1']
+
+
+def test_ranking_y_paginado(cliente):
+    cliente, _ = cliente
+    # 'lopez' aparece como cátedra de CB001-2 y sólo como docente de TB025-1
+    _, datos = buscar(cliente, 'lopez')
+    assert [r['materia']['codigo'] for r in datos['resultados']] == ['CB001', 'TB025']
+
+    _, datos = buscar(cliente, 'lopez', limite=1, offset=1)
+    assert [r['materia']['codigo'] for r in datos['resultados']] == ['TB025']
+
+    assert buscar(cliente, '"*')[0] == 400
+    assert buscar(cliente, 'lopez', limite=0)[0] == 400
+
+
+def test_la_importacion_mantiene_el_indice(cliente):
+    cliente, conn = cliente
+    parseado = copy.deepcopy(PARSEADO)
+    parseado[0]['materias'][1]['nombre'] = 'PARADIGMAS DE LA PROGRAMACIÓN'
+    parseado[0]['materias'][0]['cursos'] = ['CB001-1']
+    parseado[0]['cursos'][0]['docentes'] = 'SOLA MARCOS, ACERO ANA'
+    persistir_catalogo(conn, parseado)
+
+    assert [c['codigo'] for c in buscar(cliente, 'acero')[1]['resultados'][0]['cursos']] == ['CB001-1']
+    assert buscar(cliente, 'pinera')[1]['resultados'] == []
+    # El curso retirado deja de aparecer
+    assert buscar(cliente, 'claudia')[1]['resultados'] == []
+    assert buscar(cliente, 'paradigmas la')[1]['total'] == 1
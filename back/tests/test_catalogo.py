@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import catalogo
+import feedback
+import versiones
+from siu_importador import persistir_catalogo
+
+
+def parseado(cantidad_cursos, catedra=None):
+    cursos = [
+        {
+            'codigo': f'A-{i}', 'numero': str(i), 'catedra': catedra, 'sede': 'PC',
+            'docentes': f'Docente {i}',
+            'clases': [{'dia': i % 5, 'inicio': '09:00', 'fin': '12:00'}]
+        }
+        for i in range(1, cantidad_cursos + 1)
+    ]
+    return [{
+        'periodo': 'P',
+        'materias': [{'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': [c['codigo'] for c in cursos]}],
+        'cursos': cursos
+    }]
+
+
+def importar(datos):
+    conn = sqlite3.connect('scheduler.db')
+    persistir_catalogo(conn, datos)
+    conn.close()
+
+
+def test_importar_instala_una_foto_nueva_sin_tocar_la_anterior(cliente, monkeypatch):
+    importar(parseado(3))
+    anterior = catalogo.actual()
+    assert len(cliente.get('/api/siu/cursos').get_json()['cursos']) == 3
+
+    importar(parseado(5, catedra='Nueva'))
+    nueva = catalogo.actual()
+
+    assert nueva is not anterior
+    assert nueva.version > anterior.version
+    # Quien tenía la foto anterior la sigue viendo entera y sin cambios
+    assert [c['catedra'] for c in anterior.listar()] == [None] * 3
+    assert [c['catedra'] for c in nueva.listar()] == ['Nueva'] * 5
+
+    # Las lecturas ya no van a SQLite
+    monkeypatch.setattr(catalogo, 'get_db', lambda: pytest.fail('no debería consultar SQLite'))
+    respuesta = cliente.get('/api/siu/cursos/A-4').get_json()
+    assert respuesta['curso']['catedra'] == 'Nueva'
+    assert respuesta['curso']['clases'] == [{'dia': 4, 'hora_inicio': '09:00', 'hora_fin': '12:00'}]
+
+
+def test_consenso_copia_solo_el_curso_que_cambio(cliente):
+    importar(parseado(3))
+    anterior = catalogo.actual()
+    copias = catalogo.estadisticas()['copias']
+
+    for padron in ('100', '101', '102'):
+        feedback.enviar_feedback('A-2', 'virtual', None, padron)
+    nueva = catalogo.actual()
+
+    assert catalogo.estadisticas()['copias'] == copias + 1
+    assert nueva.version == anterior.version + 1
+    assert nueva.curso('A-2')['modalidad'] == 'virtual'
+    assert nueva.votos['A-2'] == 3
+    assert anterior.curso('A-2')['modalidad'] == 'sin_confirmar'
+    # Los demás cursos y los índices de orden se comparten con la foto anterior
+    assert nueva.curso('A-1') is anterior.curso('A-1')
+    assert nueva._orden is anterior._orden
+    assert cliente.get('/api/siu/cursos/A-2').get_json()['curso']['votos_modalidad'] == 3
+
+
+def test_otro_proceso_sube_la_version_y_se_reconstruye(cliente, monkeypatch):
+    importar(parseado(2))
+    assert len(cliente.get('/api/siu/cursos').get_json()['cursos']) == 2
+    anterior = catalogo.actual()
+
+    # Como importar_siu.py: escribe y sube la versión en la BD, sin avisar a este proceso
+    monkeypatch.setattr(catalogo, 'recargar', lambda: None)
+    monkeypatch.setattr(versiones, 'publicar', lambda nombre, version: None)
+    importar(parseado(4))
+    assert catalogo.actual() is anterior
+
+    versiones.olvidar()
+    assert len(list(catalogo.actual().listar())) == 4
+
+
+def test_con_la_foto_atrasada_no_sale_contenido_viejo_con_el_etag_nuevo(cliente, monkeypatch):
+    importar(parseado(2))
+    assert len(cliente.get('/api/siu/cursos').get_json()['cursos']) == 2
+
+    monkeypatch.setattr(catalogo, 'recargar', lambda: None)
+    monkeypatch.setattr(versiones, 'publicar', lambda nombre, version: None)
+    importar(parseado(4))
+    versiones.olvidar()
+
+    # Mientras otro hilo reconstruye, el pedido espera en lugar de servir la foto anterior
+    respuestas = []
+    with catalogo._construyendo:
+        pedido = threading.Thread(target=lambda: respuestas.append(cliente.get('/api/siu/cursos')))
+        pedido.start()
+        pedido.join(0.2)
+        assert pedido.is_alive()
+    pedido.join()
+
+    respuesta = respuestas[0]
+    assert len(respuesta.get_json()['cursos']) == 4
+    assert respuesta.headers['ETag'] == f'"c{catalogo.actual().version}"'
+
+
+def test_las_respuestas_no_exponen_campos_internos_de_la_foto(cliente):
+    importar(parseado(2))
+
+    plan = cliente.post('/api/scheduler/generar-planes', json={'cursos': ['A-1']}).get_json()['planes'][0]
+    detalle = cliente.get('/api/scheduler/curso/A-1').get_json()['curso']
+    for curso in (plan[0], detalle):
+        assert 'retirado' not in curso
+        assert curso['clases'] == [{'dia': 1, 'hora_inicio': '09:00', 'hora_fin': '12:00'}]
+    # La foto compartida conserva los minutos para armar planes
+    assert catalogo.actual().curso('A-1')['clases'][0]['inicio_min'] == 9 * 60
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import cola_feedback
+import feedback
+
+
+@pytest.fixture
+def cliente(cliente, curso):
+    yield cliente
+    cola_feedback.vaciar()
+
+
+def votar(cliente, padron, modalidad='virtual', sede=None, curso='TB025-1'):
+    return cliente.post('/api/feedback/enviar', json={
+        'curso_codigo': curso, 'modalidad': modalidad, 'sede': sede, 'padron': padron
+    })
+
+
+def test_los_votos_se_escriben_en_lotes(cliente):
+    lotes_antes = cola_feedback.estadisticas()['lotes']
+    for padron in range(10):
+        assert votar(cliente, str(padron)).status_code == 202
+    # Un usuario que cambia su voto dentro del mismo lote cuenta una sola vez
+    votar(cliente, '0', 'presencial', 'PC')
+    cola_feedback.vaciar()
+
+    pendientes = feedback.obtener_feedbacks_pendientes('TB025-1')
+    assert pendientes['total_votos'] == 10
+    assert feedback.obtener_modalidad_curso('TB025-1')['votos_totales'] == 9
+    assert cola_feedback.estadisticas()['lotes'] - lotes_antes < 11
+    assert cola_feedback.estadisticas()['en_cola'] == 0
+
+
+def test_voto_invalido_se_rechaza_sin_encolar(cliente):
+    encolados = cola_feedback.estadisticas()['encolados']
+
+    assert votar(cliente, '1', curso='NO-EXISTE').status_code == 400
+    assert votar(cliente, '1', modalidad='a distancia').status_code == 400
+    assert cola_feedback.estadisticas()['encolados'] == encolados
+
+
+def test_lote_con_la_bd_bloqueada_se_reintenta(cliente, monkeypatch):
+    monkeypatch.setattr(cola_feedback, 'ESPERA_REINTENTO', 0.01)
+    registrar_voto = feedback.registrar_voto
+    bloqueos = []
+
+    def bloqueada_una_vez(*args):
+        if not bloqueos:
+            bloqueos.append(1)
+            raise sqlite3.OperationalError('database is locked')
+        return registrar_voto(*args)
+
+    monkeypatch.setattr(feedback, 'registrar_voto', bloqueada_una_vez)
+    reintentos = cola_feedback.estadisticas()['reintentos']
+    for padron in ('1', '2', '3'):
+        votar(cliente, padron)
+    cola_feedback.vaciar()
+
+    assert feedback.obtener_feedbacks_pendientes('TB025-1')['total_votos'] == 3
+    assert cola_feedback.estadisticas()['reintentos'] > reintentos
+
+
+def test_un_voto_que_falla_no_descarta_el_lote(cliente, monkeypatch):
+    registrar_voto = feedback.registrar_voto
+
+    def falla_con_el_padron_2(conn, curso, modalidad, sede, padron):
+        resultado = registrar_voto(conn, curso, modalidad, sede, padron)
+        if padron == '2':
+            raise ValueError('voto roto')
+        return resultado
+
+    monkeypatch.setattr(feedback, 'registrar_voto', falla_con_el_padron_2)
+    antes = cola_feedback.estadisticas()
+    for padron in ('1', '2', '3'):
+        votar(cliente, padron)
+    cola_feedback.vaciar()
+
+    despues = cola_feedback.estadisticas()
+    # El voto roto se deshizo entero (también su conteo) y los otros dos quedaron
+    assert feedback.obtener_feedbacks_pendientes('TB025-1')['total_votos'] == 2
+    assert despues['escritos'] - antes['escritos'] == 2
+    assert despues['descartados'] - antes['descartados'] == 1
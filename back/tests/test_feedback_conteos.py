@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import app
+import feedback
+import versiones
+
+
+def conteos(curso_codigo):
+    conn = sqlite3.connect('scheduler.db')
+    filas = conn.execute('''
+        SELECT modalidad, sede, votos FROM feedback_conteos
+        WHERE curso_codigo = ? ORDER BY modalidad, sede
+    ''', (curso_codigo,)).fetchall()
+    conn.close()
+    return filas
+
+
+def test_cambiar_el_voto_mueve_el_conteo(curso):
+    feedback.enviar_feedback(curso, 'presencial', 'PC', '100')
+    feedback.enviar_feedback(curso, 'presencial', 'PC', '101')
+    feedback.enviar_feedback(curso, 'virtual', None, '102')
+    assert conteos(curso) == [('presencial', 'PC', 2), ('virtual', '', 1)]
+
+    feedback.enviar_feedback(curso, 'virtual', None, '100')
+    feedback.enviar_feedback(curso, 'virtual', None, '100')
+    assert conteos(curso) == [('presencial', 'PC', 1), ('virtual', '', 2)]
+
+    pendientes = feedback.obtener_feedbacks_pendientes(curso)
+    assert pendientes['total_votos'] == 3
+    assert pendientes['votaciones'][0]['modalidad'] == 'virtual'
+    assert pendientes['votaciones'][0]['sede'] is None
+
+
+def test_consenso_desde_los_conteos(curso):
+    for padron in ('100', '101', '102'):
+        feedback.enviar_feedback(curso, 'virtual', None, padron)
+
+    assert feedback.obtener_modalidad_curso(curso) == {
+        'modalidad': 'virtual', 'sede': None, 'votos_totales': 3
+    }
+
+
+def test_init_db_reconstruye_conteos_desincronizados(curso):
+    feedback.enviar_feedback(curso, 'hibrido', 'LH', '100')
+    conn = sqlite3.connect('scheduler.db')
+    conn.execute('DELETE FROM feedback_conteos')
+    conn.commit()
+    conn.close()
+
+    app.init_db()
+    assert conteos(curso) == [('hibrido', 'LH', 1)]
+
+
+def test_recalculo_masivo_con_otro_umbral(curso):
+    for padron in ('100', '101', '102'):
+        feedback.enviar_feedback(curso, 'presencial', 'LH', padron)
+    assert feedback.obtener_modalidad_curso(curso)['modalidad'] == 'presencial'
+
+    stats = feedback.recalcular_todos_los_consensos(umbral=4)
+    assert stats['cursos_desconfirmados'] == 1
+    assert feedback.obtener_modalidad_curso(curso) is None
+
+    stats = feedback.recalcular_todos_los_consensos(umbral=2)
+    assert stats['cursos_confirmados'] == 1
+    assert feedback.obtener_modalidad_curso(curso) == {
+        'modalidad': 'presencial', 'sede': 'LH', 'votos_totales': 3
+    }
+
+    # Sin cambios no se toca nada ni sube la versión del catálogo
+    version = versiones.actual('catalogo')
+    stats = feedback.recalcular_todos_los_consensos(umbral=2)
+    assert stats['cursos_confirmados'] == stats['cursos_desconfirmados'] == 0
+    assert versiones.actual('catalogo') == version
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import feedback
+
+
+@pytest.fixture
+def cliente(cliente, bd):
+    bd.executemany('INSERT INTO materias (codigo, nombre) VALUES (?, ?)',
+                    [('TB025', 'Paradigmas'), ('CB001', 'Análisis')])
+    bd.executemany('''
+        INSERT INTO cursos (codigo, materia_codigo, numero_curso, periodo, sede, modalidad)
+        VALUES (?, ?, ?, '2025-2C', ?, ?)
+    ''', [
+        ('TB025-1', 'TB025', '1', 'PC', 'presencial'),
+        ('TB025-2', 'TB025', '2', 'LH', 'presencial'),
+        ('TB025-3', 'TB025', '3', None, 'virtual'),
+        ('CB001-1', 'CB001', '1', 'PC', 'sin_confirmar'),
+        ('CB001-2', 'CB001', '2', 'PC', 'presencial'),
+    ])
+    bd.commit()
+    return cliente
+
+
+def codigos(respuesta):
+    return [curso['codigo'] for curso in respuesta.get_json()['cursos']]
+
+
+def test_filtros(cliente):
+    assert codigos(cliente.get('/api/feedback/todos-cursos?modalidad=presencial&sede=PC')) == ['CB001-2', 'TB025-1']
+    assert codigos(cliente.get('/api/feedback/todos-cursos?materia=TB025&modalidad=virtual')) == ['TB025-3']
+    assert cliente.get('/api/feedback/todos-cursos?modalidad=remota').status_code == 400
+
+
+def test_paginas_por_keyset(cliente):
+    vistos = []
+    url = '/api/feedback/todos-cursos?limite=2'
+    while url:
+        datos = cliente.get(url).get_json()
+        vistos += [curso['codigo'] for curso in datos['cursos']]
+        url = datos['siguiente'] and f"/api/feedback/todos-cursos?limite=2&cursor={datos['siguiente']}"
+
+    assert vistos == codigos(cliente.get('/api/feedback/todos-cursos'))
+    assert len(vistos) == 5
+
+
+@pytest.mark.parametrize('parametros', ['limite=abc', 'limite=', 'limite=0', 'limite=501', 'cursor=no-es-un-cursor'])
+def test_paginado_invalido(cliente, parametros):
+    respuesta = cliente.get(f'/api/feedback/todos-cursos?{parametros}')
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
+
+
+def test_cache_se_invalida_con_la_version(cliente):
+    assert codigos(cliente.get('/api/feedback/todos-cursos?modalidad=virtual')) == ['TB025-3']
+
+    for padron in ('100', '101', '102'):
+        feedback.enviar_feedback('TB025-1', 'virtual', None, padron)
+
+    assert codigos(cliente.get('/api/feedback/todos-cursos?modalidad=virtual')) == ['TB025-1', 'TB025-3']
@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import importaciones
+
+
+class PoolFalso:
+    def parsear(self, texto, timeout=None):
+        if texto == 'roto':
+            return []
+        return [{'periodo': 'P', 'materias': [], 'cursos': []}]
+
+
+def esperar(trabajo_id):
+    for _ in range(200):
+        trabajo = importaciones.obtener(trabajo_id)
+        if trabajo['fase'] in ('terminado', 'error'):
+            return trabajo
+        time.sleep(0.01)
+    raise AssertionError('la importación no terminó')
+
+
+def test_importacion_reporta_fases(monkeypatch):
+    fases = []
+    encolado = threading.Event()
+
+    def persistir(conn, parsed_data, progreso=None):
+        encolado.wait(1)
+        progreso('guardando', 10)
+        progreso('reindexando', 25)
+        fases.append(importaciones.obtener(trabajo_id)['fase'])
+        return {'filas_escritas': 25}
+
+    monkeypatch.setattr(importaciones.siu_parser_pool, 'obtener_pool', lambda: PoolFalso())
+    monkeypatch.setattr(importaciones.siu_importador, 'persistir_catalogo', persistir)
+    monkeypatch.setattr(importaciones, 'get_db', lambda: type('Conn', (), {'close': lambda self: None})())
+
+    trabajo_id = importaciones.encolar('texto')
+    encolado.set()
+    trabajo = esperar(trabajo_id)
+
+    assert fases == ['reindexando']
+    assert trabajo['fase'] == 'terminado'
+    assert trabajo['filas_escritas'] == 25
+    assert trabajo['segundos'] is not None
+
+
+def test_importacion_fallida_guarda_el_error(monkeypatch):
+    monkeypatch.setattr(importaciones.siu_parser_pool, 'obtener_pool', lambda: PoolFalso())
+
+    trabajo = esperar(importaciones.encolar('roto'))
+
+    assert trabajo['fase'] == 'error'
+    assert 'No se pudieron extraer materias' in trabajo['error']
+    assert importaciones.obtener('inexistente') is None
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import sqlite3
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import importar_siu
+
+PARSEADO = [{
+    'periodo': 'P',
+    'materias': [{'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': ['A-1']}],
+    'cursos': [{
+        'codigo': 'A-1', 'numero': '1', 'catedra': None, 'sede': 'PC', 'docentes': 'Perez',
+        'clases': [{'dia': 1, 'inicio': '09:00', 'fin': '12:00'}]
+    }]
+}]
+
+
+def huella(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_simulacion_no_migra_la_bd(tmp_path, monkeypatch, capsys):
+    # BD con el esquema de antes de las migraciones, en modo rollback journal
+    ruta = str(tmp_path / 'vieja.db')
+    conn = sqlite3.connect(ruta)
+    conn.executescript('''
+        CREATE TABLE materias (codigo TEXT PRIMARY KEY, nombre TEXT NOT NULL, creditos INTEGER);
+        CREATE TABLE cursos (
+            codigo TEXT PRIMARY KEY, materia_codigo TEXT NOT NULL, numero_curso TEXT NOT NULL,
+            catedra TEXT, periodo TEXT NOT NULL, sede TEXT, modalidad TEXT DEFAULT 'sin_confirmar',
+            votos_modalidad INTEGER DEFAULT 0
+        );
+        CREATE TABLE clases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, curso_codigo TEXT NOT NULL,
+            dia INTEGER NOT NULL, hora_inicio TEXT NOT NULL, hora_fin TEXT NOT NULL
+        );
+        INSERT INTO materias VALUES ('A', 'MATERIA A', 4);
+        INSERT INTO cursos (codigo, materia_codigo, numero_curso, periodo) VALUES ('A-2', 'A', '2', 'P');
+    ''')
+    conn.close()
+    antes = huella(ruta)
+
+    archivo = tmp_path / 'siu.txt'
+    archivo.write_text('texto del SIU')
+    monkeypatch.setattr(importar_siu, 'parsear_archivos', lambda archivos, workers: [PARSEADO])
+
+    assert importar_siu.main(['--dry-run', '--db', ruta, str(archivo)]) == 0
+
+    salida = capsys.readouterr().out
+    assert 'nuevos: A-1' in salida
+    assert 'retirados: A-2' in salida
+    assert huella(ruta) == antes
+    assert not os.path.exists(ruta + '-wal')
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import indice_horarios
+from horarios import hora_a_minutos
+from indice_horarios import IndiceHorarios
+from siu_importador import persistir_catalogo
+
+
+def fila(curso, dia, inicio, fin):
+    materia = curso.split('-')[0]
+    return {
+        'curso_codigo': curso, 'dia': dia,
+        'inicio_min': hora_a_minutos(inicio), 'fin_min': hora_a_minutos(fin),
+        'numero_curso': curso.split('-')[1], 'catedra': None,
+        'materia_codigo': materia, 'materia_nombre': materia
+    }
+
+
+INDICE = IndiceHorarios('2025 - 2do Cuatrimestre', [
+    fila('A-1', 0, '09:00', '13:00'),
+    fila('A-2', 0, '14:00', '16:00'),
+    fila('B-1', 0, '12:00', '13:00'),
+    fila('B-1', 2, '18:00', '22:00'),
+    fila('C-1', 1, '07:00', '09:00'),
+])
+
+
+def test_conflictos_respetan_bordes():
+    # [13:00, 14:00) no toca ni a A-1 ni a A-2
+    assert INDICE.cursos_en_conflicto([(0, 13 * 60, 14 * 60)]) == set()
+    # una clase larga que empieza antes del intervalo también choca
+    assert INDICE.cursos_en_conflicto([(0, 10 * 60, 11 * 60)]) == {'A-1'}
+    assert INDICE.cursos_en_conflicto([(2, 21 * 60, 23 * 60)]) == {'B-1'}
+
+
+def test_compatibles_excluye_materias_del_plan():
+    ocupados = INDICE.intervalos_de('A-2')
+    codigos = [c['codigo'] for c in INDICE.compatibles(ocupados, {'A'})]
+    assert codigos == ['B-1', 'C-1']
+
+
+def parseado(periodo, cursos):
+    return [{
+        'periodo': periodo,
+        'materias': [{'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': [codigo for codigo, _ in cursos]}],
+        'cursos': [
+            {'codigo': codigo, 'numero': codigo.split('-')[1], 'catedra': None, 'sede': 'PC',
+             'docentes': 'Perez', 'clases': [{'dia': d, 'inicio': i, 'fin': f} for d, i, f in clases]}
+            for codigo, clases in cursos
+        ]
+    }]
+
+
+def test_indice_de_la_bd_incluye_cursos_sin_clases(bd):
+    persistir_catalogo(bd, parseado('P1', [('A-1', [(0, '09:00', '12:00')]), ('A-2', [])]))
+
+    indice = indice_horarios.obtener_indice('P1')
+    assert indice.intervalos_de('A-2') == []
+    assert [c['codigo'] for c in indice.compatibles([(0, 10 * 60, 11 * 60)])] == ['A-2']
+
+
+def test_solo_los_cambios_de_horarios_reconstruyen_el_indice(cliente, bd):
+    persistir_catalogo(bd, parseado('P1', [('A-1', [(0, '09:00', '12:00')])]))
+    persistir_catalogo(bd, parseado('P2', [('A-2', [(1, '09:00', '12:00')])]))
+    indice = indice_horarios.obtener_indice('P1')
+
+    # Cambiar el periodo activo sube la versión del catálogo pero no la de los horarios
+    assert cliente.put('/api/siu/periodos/activo', json={'periodo': 'P2'}).status_code == 200
+    assert indice_horarios.obtener_indice('P1') is indice
+
+    # Importar otro periodo deja vigente el índice de P1
+    persistir_catalogo(bd, parseado('P2', [('A-2', [(2, '09:00', '12:00')])]))
+    assert indice_horarios.obtener_indice('P1') is indice
+
+    persistir_catalogo(bd, parseado('P1', [('A-1', [(3, '09:00', '12:00')])]))
+    assert indice_horarios.obtener_indice('P1').intervalos_de('A-1') == [(3, 9 * 60, 12 * 60)]
+
+
+def test_error_al_construir_devuelve_la_conexion(bd, monkeypatch):
+    cerradas = []
+
+    class Conexion:
+        def execute(self, *args):
+            raise sqlite3.OperationalError('falla la consulta')
+
+        def close(self):
+            cerradas.append(True)
+
+    monkeypatch.setattr(indice_horarios, 'get_db', Conexion)
+    with pytest.raises(sqlite3.OperationalError):
+        indice_horarios.obtener_indice('P1')
+    assert cerradas == [True]
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import periodos
+from scheduler import generar_planes
+from siu_importador import persistir_catalogo
+
+VIEJO = '2025 - 1er Cuatrimestre'
+NUEVO = '2025 - 2do Cuatrimestre'
+
+
+def parseado(periodo, sufijo):
+    codigo = f'A-{sufijo}'
+    return {
+        'periodo': periodo,
+        'materias': [{'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': [codigo]}],
+        'cursos': [{
+            'codigo': codigo,
+            'numero': sufijo,
+            'catedra': None,
+            'sede': 'PC',
+            'docentes': 'Perez',
+            'clases': [{'dia': 0, 'inicio': '09:00', 'fin': '12:00'}]
+        }]
+    }
+
+
+@pytest.fixture
+def cliente(cliente, bd):
+    persistir_catalogo(bd, [parseado(VIEJO, '1')])
+    persistir_catalogo(bd, [parseado(NUEVO, '2')])
+    return cliente
+
+
+def test_periodo_activo_y_planes(cliente):
+    # La primera importación quedó como activa
+    assert cliente.get('/api/siu/periodos').get_json()['activo'] == VIEJO
+    assert [c['codigo'] for c in generar_planes(['A-1', 'A-2'])[0]] == ['A-1']
+
+    assert cliente.put('/api/siu/periodos/activo', json={'periodo': NUEVO}).status_code == 200
+    assert [c['codigo'] for c in generar_planes(['A-1', 'A-2'])[0]] == ['A-2']
+    assert [c['codigo'] for c in generar_planes(['A-1', 'A-2'], periodo=VIEJO)[0]] == ['A-1']
+
+    assert cliente.put('/api/siu/periodos/activo', json={'periodo': 'no existe'}).status_code == 400
+
+
+def test_ningun_curso_del_periodo_activo(cliente, bd):
+    persistir_catalogo(bd, [parseado('2026 - 1er Cuatrimestre', '3')])
+    assert cliente.get('/api/siu/periodos').get_json()['activo'] == VIEJO
+
+    respuesta = cliente.post('/api/scheduler/generar-planes', json={'cursos': ['A-2', 'A-3']})
+    assert respuesta.status_code == 400
+    error = respuesta.get_json()['error']
+    assert NUEVO in error and '2026 - 1er Cuatrimestre' in error
+
+    respuesta = cliente.post('/api/scheduler/generar-planes', json={'cursos': ['A-1'], 'periodo': NUEVO})
+    assert respuesta.status_code == 400
+    assert VIEJO in respuesta.get_json()['error']
+
+
+def test_archivar_periodo(cliente):
+    assert cliente.post('/api/siu/periodos/archivar', json={'periodo': VIEJO}).status_code == 400
+
+    cliente.put('/api/siu/periodos/activo', json={'periodo': NUEVO})
+    respuesta = cliente.post('/api/siu/periodos/archivar', json={'periodo': VIEJO})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['stats']['filas_archivadas']['clases'] == 1
+
+    datos = cliente.get('/api/siu/periodos').get_json()
+    assert [p['periodo'] for p in datos['periodos']] == [NUEVO]
+    assert datos['archivados'] == [VIEJO]
+
+    conn = sqlite3.connect('scheduler.db')
+    assert conn.execute('SELECT COUNT(*) FROM clases').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM busqueda_fts').fetchone()[0] == 1
+    conn.close()
+
+    archivo = sqlite3.connect(periodos.ruta_archivo())
+    assert archivo.execute('SELECT codigo FROM cursos').fetchall() == [('A-1',)]
+    archivo.close()
@@ -0,0 +1,55 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import plan_analyzer
+from plan_analyzer import analizar_plan
+
+
+def curso(codigo, materia, sede, clases):
+    return {
+        'codigo': codigo,
+        'sede': sede,
+        'materia': {'codigo': materia, 'nombre': materia},
+        'clases': [{'dia': d, 'hora_inicio': i, 'hora_fin': f} for d, i, f in clases]
+    }
+
+
+def test_detecta_hueco_y_cambio_de_sede():
+    plan = [
+        curso('A-1', 'A', 'PC', [(1, '08:00', '10:00')]),
+        curso('B-1', 'B', 'LH', [(1, '14:00', '16:00')]),
+    ]
+    resultado = analizar_plan(plan)
+    tipos = [d['tipo'] for d in resultado['desventajas']]
+
+    assert tipos == ['hueco_grande', 'cambio_sede']
+    assert resultado['desventajas'][0]['texto'] == 'Mar: 4h libre entre clases'
+    assert resultado['ventajas'][0]['texto'] == '5 días sin clases'
+
+
+def test_clases_contiguas_no_son_hueco():
+    plan = [
+        curso('A-1', 'A', 'PC', [(0, '09:00', '11:00')]),
+        curso('B-1', 'B', 'PC', [(0, '11:00', '13:00')]),
+    ]
+    assert analizar_plan(plan)['desventajas'] == []
+
+
+def test_dias_repetidos_se_sirven_del_cache():
+    plan_a = [
+        curso('A-1', 'A', 'PC', [(3, '18:00', '21:00')]),
+        curso('B-1', 'B', 'PC', [(4, '07:00', '09:00')]),
+    ]
+    plan_b = [
+        curso('C-1', 'C', 'PC', [(3, '18:00', '21:00')]),
+        curso('D-1', 'D', 'PC', [(4, '07:00', '09:00')]),
+    ]
+    analizar_plan(plan_a)
+    aciertos_antes = plan_analyzer._cache_dias.estadisticas()['aciertos']
+
+    assert analizar_plan(plan_b) == analizar_plan(plan_a)
+    assert plan_analyzer._cache_dias.estadisticas()['aciertos'] >= aciertos_antes + 2
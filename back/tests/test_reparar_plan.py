@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import app
+import scheduler
+from scheduler import reparar_plan
+
+
+def curso(codigo, clases):
+    return {
+        'codigo': codigo,
+        'periodo': '2025 - 2do Cuatrimestre',
+        'sede': 'PC',
+        'modalidad': 'presencial',
+        'materia': {'codigo': codigo.split('-')[0], 'nombre': codigo.split('-')[0]},
+        'clases': [{'dia': d, 'hora_inicio': i, 'hora_fin': f} for d, i, f in clases]
+    }
+
+
+CURSOS = {
+    'A-1': curso('A-1', [(0, '09:00', '12:00')]),
+    'A-2': curso('A-2', [(1, '09:00', '12:00')]),
+    'B-1': curso('B-1', [(2, '09:00', '12:00')]),
+    'B-2': curso('B-2', [(1, '10:00', '13:00')]),
+    'C-1': curso('C-1', [(3, '09:00', '12:00')]),
+    'C-2': curso('C-2', [(1, '14:00', '16:00')]),
+}
+
+
+@pytest.fixture(autouse=True)
+def cursos_en_memoria(monkeypatch):
+    monkeypatch.setattr(scheduler, 'obtener_datos_curso', lambda codigo, incluir_retirados=False: CURSOS.get(codigo))
+    monkeypatch.setattr(
+        scheduler, 'obtener_codigos_de_materia',
+        lambda materia, periodo: sorted(c for c in CURSOS if c.startswith(materia + '-'))
+    )
+
+
+def test_reemplaza_solo_el_curso_no_disponible():
+    reparaciones = reparar_plan(['A-1', 'B-1', 'C-1'], ['C-1'])
+
+    assert reparaciones[0]['total_cambios'] == 1
+    assert reparaciones[0]['cambios'] == [{'materia': 'C', 'antes': 'C-1', 'despues': 'C-2'}]
+
+
+def test_cambia_otra_materia_si_no_hay_reemplazo_directo():
+    # A-2 choca con B-2, así que reemplazar A obliga a mover también B
+    reparaciones = reparar_plan(['A-1', 'B-2', 'C-1'], ['A-1'], permitir_quitar=False)
+
+    assert [r['total_cambios'] for r in reparaciones] == [2]
+    assert {c['despues'] for c in reparaciones[0]['cambios']} == {'A-2', 'B-1'}
+
+
+def test_quitar_materia_como_ultimo_recurso():
+    reparaciones = reparar_plan(['A-1', 'B-2', 'C-1'], ['A-1'], max_cambios=1)
+
+    assert [c['despues'] for c in reparaciones[0]['cambios']] == [None]
+    assert sorted(c['codigo'] for c in reparaciones[0]['cursos']) == ['B-2', 'C-1']
+
+
+def test_max_cambios_menor_que_los_no_disponibles():
+    with pytest.raises(ValueError, match='max_cambios'):
+        reparar_plan(['A-1', 'B-1', 'C-1'], ['A-1', 'C-1'], max_cambios=1)
+
+    respuesta = app.app.test_client().post('/api/scheduler/reparar-plan', json={
+        'plan': ['A-1', 'B-1', 'C-1'], 'no_disponibles': ['A-1', 'C-1'], 'max_cambios': 1
+    })
+    assert respuesta.status_code == 400
+    assert 'max_cambios' in respuesta.get_json()['error']
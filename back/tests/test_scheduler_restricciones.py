@@ -0,0 +1,142 @@
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import app
+import scheduler
+from scheduler import generar_planes, normalizar_restricciones, compilar_ventanas, penalizacion_plan
+
+
+def curso(codigo, clases):
+    return {
+        'codigo': codigo,
+        'sede': 'PC',
+        'modalidad': 'presencial',
+        'materia': {'codigo': codigo.split('-')[0], 'nombre': codigo.split('-')[0]},
+        'clases': [{'dia': d, 'hora_inicio': i, 'hora_fin': f} for d, i, f in clases]
+    }
+
+
+CURSOS = {
+    'A-1': curso('A-1', [(0, '09:00', '12:00')]),
+    'A-2': curso('A-2', [(2, '18:00', '21:00')]),
+    'B-1': curso('B-1', [(0, '10:00', '13:00')]),
+    'B-2': curso('B-2', [(0, '13:00', '16:00')]),
+    'B-3': curso('B-3', [(4, '09:00', '12:00')]),
+}
+
+
+def adyacencia_en_memoria(codigos):
+    return {
+        a: {b for b in codigos if a != b and scheduler.cursos_se_solapan(CURSOS[a], CURSOS[b])}
+        for a in codigos
+    }
+
+
+# Se prueba tanto con el grafo de conflictos precalculado como sin él
+@pytest.fixture(autouse=True, params=['con_grafo', 'sin_grafo'])
+def cursos_en_memoria(monkeypatch, request):
+    monkeypatch.setattr(scheduler, 'obtener_datos_curso', CURSOS.get)
+    monkeypatch.setattr(scheduler, 'obtener_mascaras', lambda codigos: {})
+    cargar = adyacencia_en_memoria if request.param == 'con_grafo' else (lambda codigos: None)
+    monkeypatch.setattr(scheduler.grafo_conflictos, 'cargar_conflictos', cargar)
+
+
+def codigos(planes):
+    return sorted(tuple(c['codigo'] for c in plan) for plan in planes)
+
+
+def test_sin_restricciones_descarta_solapamientos():
+    planes = generar_planes(list(CURSOS))
+    assert codigos(planes) == [('A-1', 'B-2'), ('A-1', 'B-3'), ('A-2', 'B-1'), ('A-2', 'B-2'), ('A-2', 'B-3')]
+
+
+def test_max_dias_corta_planes_con_mas_dias():
+    planes = generar_planes(list(CURSOS), restricciones={'max_dias': 1})
+    assert codigos(planes) == [('A-1', 'B-2')]
+
+
+def test_min_dias_libres_equivale_a_max_dias():
+    planes = generar_planes(list(CURSOS), restricciones={'min_dias_libres': 5})
+    assert codigos(planes) == [('A-1', 'B-2')]
+
+
+def test_max_horas_dia():
+    planes = generar_planes(list(CURSOS), restricciones={'max_horas_dia': 4})
+    assert ('A-1', 'B-2') not in codigos(planes)
+    assert len(planes) == 4
+
+
+def test_hora_fin_maxima_filtra_cursos():
+    planes = generar_planes(list(CURSOS), restricciones={'hora_fin_maxima': '17:00'})
+    assert codigos(planes) == [('A-1', 'B-2'), ('A-1', 'B-3')]
+
+
+def test_restricciones_invalidas():
+    with pytest.raises(ValueError):
+        normalizar_restricciones({'max_dias': 0})
+    with pytest.raises(ValueError):
+        normalizar_restricciones({'min_dias_libres': 6})
+
+
+@pytest.mark.parametrize('horas', [float('inf'), float('nan'), 0, -2, 25])
+def test_max_horas_dia_invalido(horas):
+    with pytest.raises(ValueError):
+        normalizar_restricciones({'max_horas_dia': horas})
+
+    # El JSON de Flask acepta Infinity y NaN
+    respuesta = app.app.test_client().post('/api/scheduler/generar-planes', json={
+        'cursos': ['A-1'], 'restricciones': {'max_horas_dia': horas}
+    })
+    assert respuesta.status_code == 400
+
+
+@pytest.mark.parametrize('hora', [2200, '25:99', '22:60', '24:30', '19', 'las 7'])
+def test_hora_fin_maxima_invalida(hora):
+    with pytest.raises(ValueError):
+        normalizar_restricciones({'hora_fin_maxima': hora})
+
+    respuesta = app.app.test_client().post('/api/scheduler/generar-planes', json={
+        'cursos': ['A-1'], 'restricciones': {'hora_fin_maxima': hora}
+    })
+    assert respuesta.status_code == 400
+
+
+@pytest.mark.parametrize('parametros', [
+    {'max_resultados': 'abc'}, {'max_resultados': -1}, {'analizar_primeros': 'x'}, {'analizar_primeros': None}
+])
+def test_cantidades_invalidas(parametros):
+    respuesta = app.app.test_client().post('/api/scheduler/generar-planes', json=dict(parametros, cursos=['A-1']))
+    assert respuesta.status_code == 400
+    assert next(iter(parametros)) in respuesta.get_json()['error']
+
+
+@pytest.mark.parametrize('ventana', [
+    {'dia': 0, 'hora_inicio': 900, 'hora_fin': '12:00'},
+    {'dia': 0, 'hora_inicio': '09:00', 'hora_fin': '25:00'},
+    {'dia': 0, 'hora_inicio': '12:00', 'hora_fin': '09:00'},
+    {'dia': 7, 'hora_inicio': '09:00', 'hora_fin': '12:00'},
+    {'dia': 'lunes', 'hora_inicio': '09:00', 'hora_fin': '12:00'},
+])
+def test_horarios_penalizados_invalidos(ventana):
+    with pytest.raises(ValueError):
+        compilar_ventanas([ventana])
+
+    respuesta = app.app.test_client().post('/api/scheduler/generar-planes', json={
+        'cursos': ['A-1'], 'horarios_penalizados': [ventana]
+    })
+    assert respuesta.status_code == 400
+
+
+def test_horarios_penalizados_ordenan_pero_no_descartan():
+    ventanas = [{'dia': 0, 'hora_inicio': '09:00', 'hora_fin': '12:00', 'peso': 2}]
+    planes = generar_planes(['A-1', 'A-2', 'B-3'], horarios_penalizados=ventanas)
+
+    assert [tuple(c['codigo'] for c in plan) for plan in planes] == [('A-2', 'B-3'), ('A-1', 'B-3')]
+    assert penalizacion_plan(planes[0], compilar_ventanas(ventanas)) == 0
+    assert penalizacion_plan(planes[1], compilar_ventanas(ventanas)) == 6
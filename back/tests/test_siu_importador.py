@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import scheduler
+import siu_importador
+from siu_importador import persistir_catalogo
+
+PERIODO = '2025 - 2do Cuatrimestre'
+
+
+def curso(codigo, docentes, clases):
+    return {
+        'codigo': codigo,
+        'numero': codigo.split('-')[1],
+        'catedra': None,
+        'sede': 'PC',
+        'docentes': docentes,
+        'clases': [{'dia': d, 'inicio': i, 'fin': f} for d, i, f in clases]
+    }
+
+
+PARSEADO = [{
+    'periodo': PERIODO,
+    'materias': [
+        {'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': ['A-1', 'A-2']},
+        {'codigo': 'B', 'nombre': 'MATERIA B', 'cursos': ['B-1']}
+    ],
+    'cursos': [
+        curso('A-1', 'Perez, Lopez', [(0, '09:00', '12:00'), (2, '09:00', '12:00')]),
+        curso('A-2', 'Gomez', [(1, '18:00', '21:00')]),
+        curso('B-1', 'Perez', [(0, '11:00', '13:00')])
+    ]
+}]
+
+
+@pytest.fixture
+def conn(bd):
+    return bd
+
+
+def test_persiste_todas_las_tablas(conn):
+    stats = persistir_catalogo(conn, PARSEADO)
+
+    assert stats['saved_to_db'] == 3
+    assert stats['aristas_conflicto'] == 2
+    assert conn.execute('SELECT COUNT(*) FROM clases').fetchone()[0] == 4
+    assert conn.execute('SELECT COUNT(*) FROM docentes').fetchone()[0] == 3
+    assert conn.execute(
+        "SELECT inicio_min, fin_min FROM clases WHERE curso_codigo = 'A-2'"
+    ).fetchone() == (18 * 60, 21 * 60)
+    assert conn.execute(
+        "SELECT curso_b FROM conflictos_cursos WHERE curso_a = 'A-1'"
+    ).fetchall() == [('B-1',)]
+
+
+def test_reimportar_no_duplica_filas(conn):
+    persistir_catalogo(conn, PARSEADO)
+    persistir_catalogo(conn, PARSEADO)
+
+    assert conn.execute('SELECT COUNT(*) FROM clases').fetchone()[0] == 4
+    assert conn.execute('SELECT COUNT(*) FROM curso_docentes').fetchone()[0] == 4
+
+
+def test_error_revierte_la_importacion(conn, monkeypatch):
+    def fallar(*args):
+        raise RuntimeError('falla a mitad de la importación')
+
+    monkeypatch.setattr(siu_importador.grafo_conflictos, 'actualizar_conflictos', fallar)
+
+    with pytest.raises(RuntimeError):
+        persistir_catalogo(conn, PARSEADO)
+
+    assert conn.execute('SELECT COUNT(*) FROM cursos').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM clases').fetchone()[0] == 0
+
+
+def test_otro_escritor_durante_la_importacion(conn):
+    # Otra conexión (p. ej. la cola de feedback) escribe mientras la importación lee
+    escrituras = []
+
+    def escribir():
+        otra = sqlite3.connect('scheduler.db', timeout=5)
+        otra.execute("INSERT INTO materias (codigo, nombre) VALUES ('Z', 'MATERIA Z')")
+        otra.commit()
+        otra.close()
+        escrituras.append('Z')
+
+    def al_ejecutar(sql):
+        # Justo antes de la primera escritura, ya leído el estado de los cursos
+        if 'SELECT codigo, huella' in sql:
+            leidos.append(sql)
+        elif leidos and not hilos:
+            hilos.append(threading.Thread(target=escribir))
+            hilos[0].start()
+            # Con la BD tomada desde el BEGIN, el otro escritor espera a la importación
+            hilos[0].join(0.3)
+
+    leidos, hilos = [], []
+    conn.set_trace_callback(al_ejecutar)
+    stats = persistir_catalogo(conn, PARSEADO)
+    conn.set_trace_callback(None)
+    hilos[0].join()
+
+    assert stats['saved_to_db'] == 3
+    assert escrituras == ['Z']
+    assert conn.execute('SELECT COUNT(*) FROM materias').fetchone()[0] == 3
+
+
+def test_reimportar_sin_cambios_no_escribe(conn):
+    persistir_catalogo(conn, PARSEADO)
+    stats = persistir_catalogo(conn, PARSEADO)
+
+    assert stats['cursos_sin_cambios'] == 3
+    assert stats['filas_escritas'] == 0
+
+
+def test_curso_cambiado_conserva_modalidad(conn):
+    persistir_catalogo(conn, PARSEADO)
+    conn.execute("UPDATE cursos SET modalidad = 'virtual', votos_modalidad = 4 WHERE codigo = 'B-1'")
+    conn.commit()
+
+    cambiado = [dict(PARSEADO[0], cursos=PARSEADO[0]['cursos'][:2] + [curso('B-1', 'Perez', [(4, '11:00', '13:00')])])]
+    stats = persistir_catalogo(conn, cambiado)
+
+    assert stats['cursos_actualizados'] == 1
+    assert conn.execute(
+        "SELECT modalidad, votos_modalidad FROM cursos WHERE codigo = 'B-1'"
+    ).fetchone() == ('virtual', 4)
+    assert conn.execute("SELECT dia FROM clases WHERE curso_codigo = 'B-1'").fetchall() == [(4,)]
+    assert conn.execute('SELECT COUNT(*) FROM conflictos_cursos').fetchone()[0] == 0
+
+
+def test_curso_quitado_se_retira(conn):
+    persistir_catalogo(conn, PARSEADO)
+
+    sin_a2 = [dict(PARSEADO[0], materias=[
+        {'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': ['A-1']}
+    ])]
+    stats = persistir_catalogo(conn, sin_a2)
+
+    # B no vino en el texto, así que sus cursos no se retiran
+    assert stats['cursos_retirados'] == 1
+    assert conn.execute('SELECT codigo FROM cursos WHERE retirado = 1').fetchall() == [('A-2',)]
+
+    stats = persistir_catalogo(conn, PARSEADO)
+    assert stats['cursos_reactivados'] == 1
+    assert conn.execute('SELECT COUNT(*) FROM cursos WHERE retirado = 1').fetchone()[0] == 0
+
+
+def test_curso_retirado_no_se_usa_para_planes(conn):
+    persistir_catalogo(conn, PARSEADO)
+    sin_a2 = [dict(PARSEADO[0], materias=[
+        {'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': ['A-1']}
+    ])]
+    persistir_catalogo(conn, sin_a2)
+
+    # Una selección guardada con el curso retirado ya no lo pone en los planes
+    planes = scheduler.generar_planes(['A-2', 'B-1'])
+    assert [[c['codigo'] for c in plan] for plan in planes] == [['B-1']]
+
+    # Al reparar, se reemplaza por otro curso de la misma materia
+    reparaciones = scheduler.reparar_plan(['A-2'], [])
+    assert reparaciones[0]['cambios'] == [{'materia': 'A', 'antes': 'A-2', 'despues': 'A-1'}]
+
+
+def test_simulacion_no_guarda_y_reporta_cambios(conn):
+    stats = persistir_catalogo(conn, PARSEADO, confirmar=False)
+
+    assert sorted(stats['cambios']['nuevos']) == ['A-1', 'A-2', 'B-1']
+    assert conn.execute('SELECT COUNT(*) FROM cursos').fetchone()[0] == 0
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import siu_routes
+from siu_importador import persistir_catalogo
+
+
+def parseado(cantidad_cursos):
+    cursos = [
+        {
+            'codigo': f'A-{i}', 'numero': str(i), 'catedra': None, 'sede': 'PC',
+            'docentes': f'Docente {i}, Ayudante {i}',
+            'clases': [{'dia': i % 5, 'inicio': '09:00', 'fin': '12:00'}]
+        }
+        for i in range(1, cantidad_cursos + 1)
+    ]
+    return [{
+        'periodo': 'P',
+        'materias': [{'codigo': 'A', 'nombre': 'MATERIA A', 'cursos': [c['codigo'] for c in cursos]}],
+        'cursos': cursos
+    }]
+
+
+@pytest.fixture
+def cliente(cliente, monkeypatch):
+    consultas = []
+
+    def get_db():
+        conn = sqlite3.connect('scheduler.db')
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(consultas.append)
+        return conn
+
+    monkeypatch.setattr(siu_routes, 'get_db', get_db)
+    return cliente, consultas
+
+
+@pytest.mark.parametrize('url', ['/api/siu/cursos', '/api/siu/materias/A/cursos'])
+def test_cantidad_de_consultas_no_depende_de_los_cursos(cliente, url):
+    client, consultas = cliente
+
+    conn = sqlite3.connect('scheduler.db')
+    persistir_catalogo(conn, parseado(3))
+    client.get(url)
+    pocas = len(consultas)
+
+    persistir_catalogo(conn, parseado(40))
+    conn.close()
+    consultas.clear()
+    respuesta = client.get(url).get_json()
+
+    assert len(consultas) == pocas
+    assert len(respuesta['cursos']) == 40
+    curso = next(c for c in respuesta['cursos'] if c['codigo'] == 'A-7')
+    assert sorted(curso['docentes']) == ['Ayudante 7', 'Docente 7']
+    assert curso['clases'] == [{'dia': 2, 'hora_inicio': '09:00', 'hora_fin': '12:00'}]
+
+
+def test_paginas_por_keyset_cubren_el_listado(cliente):
+    client, _ = cliente
+    conn = sqlite3.connect('scheduler.db')
+    persistir_catalogo(conn, parseado(12))
+    conn.close()
+
+    completo = client.get('/api/siu/cursos?campos=codigo').get_json()['cursos']
+    paginas = []
+    url = '/api/siu/cursos?campos=codigo&limite=5'
+    while url:
+        respuesta = client.get(url).get_json()
+        paginas += respuesta['cursos']
+        url = respuesta['siguiente'] and f"/api/siu/cursos?campos=codigo&limite=5&cursor={respuesta['siguiente']}"
+
+    assert paginas == completo
+    assert completo[0] == {'codigo': 'A-1'}
+
+    exportado = client.get('/api/siu/cursos?exportar=1&campos=codigo').get_json()
+    assert exportado['cursos'] == completo
+    assert exportado['total'] == 12
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from siu_parser_pool import PoolParserSIU
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='Node.js no está instalado')
+
+
+@pytest.fixture
+def pool():
+    pool = PoolParserSIU(tamanio=1, timeout=10)
+    yield pool
+    pool.cerrar()
+
+
+def test_parsea_con_el_mismo_worker(pool):
+    texto = open(os.path.join(parent_dir, 'siu_data.txt'), encoding='utf-8').read()
+    proceso = pool._todos[0].proceso
+
+    primero = pool.parsear(texto)
+    segundo = pool.parsear(texto)
+
+    assert [p['materias'] for p in primero] == [p['materias'] for p in segundo]
+    assert primero and primero[0]['materias']
+    assert pool._todos[0].proceso is proceso
+    assert pool.estadisticas()['trabajos'] == 2
+
+
+def test_reinicia_worker_caido(pool):
+    pool._todos[0].proceso.kill()
+    pool._todos[0].proceso.wait()
+
+    assert pool.parsear('') == []
+    assert pool.estadisticas()['reinicios'] == 1
+
+
+def test_timeout_reemplaza_el_worker(pool):
+    proceso = pool._todos[0].proceso
+
+    with pytest.raises(TimeoutError):
+        pool.parsear('x' * 10, timeout=0)
+
+    assert pool._todos[0].proceso is not proceso
+    assert pool.verificar_salud() == {'revisados': 1, 'reiniciados': 0}
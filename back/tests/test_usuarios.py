@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import usuarios
+
+
+@pytest.fixture
+def cliente(cliente):
+    yield cliente
+    usuarios.vaciar()
+
+
+def last_login(padron):
+    conn = sqlite3.connect('scheduler.db')
+    valor = conn.execute('SELECT last_login FROM users WHERE padron = ?', (padron,)).fetchone()[0]
+    conn.close()
+    return valor
+
+
+def test_last_login_se_escribe_en_lote(cliente):
+    assert cliente.post('/api/login', json={'padron': '100000'}).get_json()['is_new_user']
+    registrado = last_login('100000')
+
+    assert not cliente.post('/api/login', json={'padron': '100000'}).get_json()['is_new_user']
+    # Todavía no se escribió, pero /api/user ya lo muestra
+    assert last_login('100000') == registrado
+    pendiente = usuarios.login_pendiente('100000')
+    assert cliente.get('/api/user/100000').get_json()['user']['last_login'] == pendiente
+
+    usuarios.vaciar()
+    assert last_login('100000') == pendiente
+    assert usuarios.login_pendiente('100000') is None
+
+
+def test_stats_con_contadores_cacheados(cliente, monkeypatch):
+    cliente.post('/api/login', json={'padron': '100000'})
+    assert cliente.get('/api/stats').get_json()['total_users'] == 1
+
+    # Las altas se suman al contador en memoria, sin volver a contar en la BD
+    monkeypatch.setattr(usuarios, '_contar_usuarios', lambda: pytest.fail('no debería contar'))
+    cliente.post('/api/login', json={'padron': '100001'})
+    cliente.post('/api/login', json={'padron': '100001'})
+    stats = cliente.get('/api/stats').get_json()
+
+    assert stats['total_users'] == 2
+    assert stats['new_users_today'] == 2
+    assert stats['active_users_today'] == 2
+
+
+def test_stats_usa_indices_de_fecha(cliente):
+    conn = sqlite3.connect('scheduler.db')
+    plan = conn.execute('''
+        EXPLAIN QUERY PLAN SELECT COUNT(*) FROM users
+        WHERE last_login >= DATE('now') AND last_login < DATE('now', '+1 day')
+    ''').fetchall()
+    conn.close()
+    assert 'idx_users_last_login' in str(plan)
+
+
+def test_flushes_concurrentes_no_retroceden_last_login(cliente, monkeypatch):
+    cliente.post('/api/login', json={'padron': '100000'})
+    cliente.post('/api/login', json={'padron': '100000'})
+
+    # El primer flush tarda; mientras tanto llega un login más nuevo y otro flush
+    get_db = usuarios.get_db
+    llamadas = []
+
+    def get_db_lento():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            time.sleep(0.3)
+        return get_db()
+
+    monkeypatch.setattr(usuarios, 'get_db', get_db_lento)
+    primero = threading.Thread(target=usuarios.vaciar)
+    primero.start()
+    time.sleep(0.05)
+    with usuarios._lock:
+        usuarios._pendientes['100000'] = '2099-01-01 00:00:00'
+    usuarios.vaciar()
+    primero.join()
+
+    assert last_login('100000') == '2099-01-01 00:00:00'
+
+
+def test_last_login_en_utc(cliente):
+    tz = os.environ.get('TZ')
+    os.environ['TZ'] = 'Etc/GMT+12'
+    time.tzset()
+    try:
+        cliente.post('/api/login', json={'padron': '100000'})
+        cliente.post('/api/login', json={'padron': '100000'})
+        pendiente = usuarios.login_pendiente('100000')
+    finally:
+        if tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = tz
+        time.tzset()
+
+    conn = sqlite3.connect('scheduler.db')
+    ahora = conn.execute("SELECT DATETIME('now')").fetchone()[0]
+    conn.close()
+    assert pendiente[:10] == ahora[:10]
+    assert len(pendiente) == len(ahora)
+    assert cliente.get('/api/stats').get_json()['active_users_today'] == 1
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import catalogo
+import versiones
+
+
+def test_304_mientras_no_cambie_la_version(cliente, monkeypatch):
+    respuesta = cliente.get('/api/siu/materias')
+    etag = respuesta.headers['ETag']
+
+    # Con el ETag vigente no se llega a ejecutar la vista (que lee la foto del catálogo)
+    monkeypatch.setattr(versiones, 'REVALIDAR_SEGUNDOS', 3600)
+    monkeypatch.setattr(catalogo, 'actual', lambda: pytest.fail('no debería ejecutar la vista'))
+    respuesta = cliente.get('/api/siu/materias', headers={'If-None-Match': etag})
+
+    assert respuesta.status_code == 304
+    assert respuesta.headers['ETag'] == etag
+
+
+def test_incrementar_cambia_el_etag(cliente):
+    etag = cliente.get('/api/siu/materias').headers['ETag']
+
+    conn = sqlite3.connect('scheduler.db')
+    version = versiones.incrementar(conn, 'catalogo')
+    conn.commit()
+    conn.close()
+    versiones.publicar('catalogo', version)
+
+    respuesta = cliente.get('/api/siu/materias', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
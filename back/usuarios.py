@@ -0,0 +1,220 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import db
+import metricas
+import versiones
+from cache import TTLCache
+from db import get_db
+
+# Cada cuánto se escriben en la BD los last_login acumulados
+INTERVALO_ESCRITURA = float(os.environ.get('LOGIN_FLUSH_SEGUNDOS', '2'))
+# Con tantos logins pendientes se escribe sin esperar al intervalo
+MAX_PENDIENTES = 1000
+# Cuánto puede estar viejo el resultado de /api/stats
+TTL_ESTADISTICAS = float(os.environ.get('STATS_TTL_SEGUNDOS', '10'))
+
+_pendientes: Dict[str, str] = {}
+_lock = threading.Lock()
+# Un solo flush a la vez, así un lote viejo no se escribe después de uno más nuevo
+_escribiendo = threading.Lock()
+_hay_que_escribir = threading.Event()
+_escritor: Optional[threading.Thread] = None
+_stats = {
+    'logins': 0,
+    'escritos': 0,
+    'lotes': 0,
+    'errores': 0,
+    'ultimo_flush_ms': 0.0
+}
+
+_cache_estadisticas = TTLCache(ttl=TTL_ESTADISTICAS)
+
+
+def _hoy() -> str:
+    # Mismo día que DATE('now') de SQLite (UTC)
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _ahora() -> str:
+    # Mismo formato y zona (UTC) que CURRENT_TIMESTAMP de SQLite
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _escribir_pendientes() -> None:
+    """
+    Escribe todos los last_login pendientes en una única transacción. Lo
+    llaman el hilo escritor, /api/stats, /api/users y atexit, así que tomar
+    el lote y escribirlo va bajo _escribiendo.
+    """
+    with _escribiendo:
+        with _lock:
+            lote = dict(_pendientes)
+            _pendientes.clear()
+        if not lote:
+            return
+
+        inicio = time.perf_counter()
+        conn = get_db()
+        try:
+            conn.executemany(
+                'UPDATE users SET last_login = ? WHERE padron = ?',
+                [(cuando, padron) for padron, cuando in lote.items()]
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            # Devolverlos a la cola salvo que ya haya un login más nuevo
+            with _lock:
+                for padron, cuando in lote.items():
+                    _pendientes.setdefault(padron, cuando)
+                _stats['errores'] += 1
+            print(f"Error al escribir last_login: {e}")
+            return
+        finally:
+            conn.close()
+
+    with _lock:
+        _stats['escritos'] += len(lote)
+        _stats['lotes'] += 1
+        _stats['ultimo_flush_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def _escribir_siempre() -> None:
+    while True:
+        _hay_que_escribir.wait(INTERVALO_ESCRITURA)
+        _hay_que_escribir.clear()
+        _escribir_pendientes()
+
+
+def _iniciar_escritor() -> None:
+    global _escritor
+    with _lock:
+        if _escritor is None or not _escritor.is_alive():
+            _escritor = threading.Thread(target=_escribir_siempre, name='escritor-logins', daemon=True)
+            _escritor.start()
+
+
+def registrar_login(padron: str, login_anterior: Optional[str] = None) -> None:
+    """
+    Anota el login de un usuario existente. El last_login se escribe en la BD
+    más tarde, junto con los demás, cada INTERVALO_ESCRITURA segundos.
+
+    login_anterior es el last_login que tenía el usuario, para llevar la
+    cuenta de usuarios activos hoy sin volver a consultar la BD.
+    """
+    _iniciar_escritor()
+    with _lock:
+        anterior = _pendientes.get(padron) or login_anterior
+        _pendientes[padron] = _ahora()
+        _stats['logins'] += 1
+        cantidad = len(_pendientes)
+    if cantidad >= MAX_PENDIENTES:
+        _hay_que_escribir.set()
+
+    if not anterior or str(anterior)[:10] < _hoy():
+        _ajustar(active_users_today=1)
+
+
+def registrar_alta() -> None:
+    """Anota un usuario recién creado en los contadores"""
+    _ajustar(total_users=1, new_users_today=1, active_users_today=1)
+
+
+def registrar_baja(padron: str) -> None:
+    """Descarta el login pendiente de un usuario borrado y recalcula los contadores"""
+    with _lock:
+        _pendientes.pop(padron, None)
+    _cache_estadisticas.limpiar()
+
+
+def login_pendiente(padron: str) -> Optional[str]:
+    """Último login de un usuario que todavía no se escribió en la BD"""
+    with _lock:
+        return _pendientes.get(padron)
+
+
+def vaciar() -> None:
+    """Escribe ya los logins pendientes"""
+    _escribir_pendientes()
+
+
+def _ajustar(**deltas: int) -> None:
+    def sumar(valor):
+        return {clave: valor[clave] + deltas.get(clave, 0) for clave in valor}
+    _cache_estadisticas.actualizar(('usuarios', os.path.abspath(db.DATABASE)), sumar)
+
+
+def _contar_usuarios() -> Dict[str, int]:
+    # Así los logins pendientes también cuentan como activos
+    _escribir_pendientes()
+
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM users')
+        total_users = cursor.fetchone()[0]
+
+        # Rangos sobre columnas indexadas en lugar de DATE(columna), que no usa índices
+        cursor.execute('''
+            SELECT COUNT(*) FROM users
+            WHERE created_at >= DATE('now') AND created_at < DATE('now', '+1 day')
+        ''')
+        new_users = cursor.fetchone()[0]
+
+        cursor.execute('''
+            SELECT COUNT(*) FROM users
+            WHERE last_login >= DATE('now') AND last_login < DATE('now', '+1 day')
+        ''')
+        active_users = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        'total_users': total_users,
+        'new_users_today': new_users,
+        'active_users_today': active_users
+    }
+
+
+def _contar_catalogo() -> Dict[str, int]:
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        return {
+            'total_materias': cursor.execute('SELECT COUNT(*) FROM materias').fetchone()[0],
+            'total_cursos': cursor.execute('SELECT COUNT(*) FROM cursos').fetchone()[0],
+            'total_docentes': cursor.execute('SELECT COUNT(*) FROM docentes').fetchone()[0]
+        }
+    finally:
+        conn.close()
+
+
+def estadisticas_generales() -> Dict[str, int]:
+    """
+    Contadores de /api/stats. Los de usuarios se cachean TTL_ESTADISTICAS
+    segundos y se ajustan en memoria con cada alta y login; los del catálogo
+    se cachean con la versión del catálogo en la clave.
+    """
+    ruta = os.path.abspath(db.DATABASE)
+    usuarios = _cache_estadisticas.obtener_o_calcular(('usuarios', ruta), _contar_usuarios)
+    catalogo = _cache_estadisticas.obtener_o_calcular(
+        ('catalogo', ruta, versiones.actual('catalogo')), _contar_catalogo
+    )
+    return {**usuarios, **catalogo}
+
+
+def estadisticas() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats, pendientes=len(_pendientes))
+    stats['intervalo_segundos'] = INTERVALO_ESCRITURA
+    stats['cache_stats'] = _cache_estadisticas.estadisticas()
+    return stats
+
+
+atexit.register(vaciar)
+metricas.registrar('logins', estadisticas)
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Dict
+
+from flask import make_response, request
+
+import metricas
+from db import get_db
+
+# Contadores de versión persistidos en la tabla 'versiones':
+#   catalogo: sube con cada importación que cambia algo y con cada cambio de consenso
+#   votos:    sube con cada voto de modalidad
+#   horarios: sube con cada importación o archivo que cambia los cursos vigentes o sus clases
+CONTADORES = ('catalogo', 'votos', 'horarios')
+
+# Cada cuánto se vuelve a leer la versión de la BD, por si otro proceso
+# (p. ej. importar_siu.py) la cambió. Entre lecturas se usa la de memoria.
+REVALIDAR_SEGUNDOS = 2.0
+
+_versiones: Dict[str, int] = {}
+_leido_en = 0.0
+_lock = threading.Lock()
+_respuestas_304 = 0
+
+
+def crear_tabla(cursor) -> None:
+    """Crea la tabla de versiones (la llama init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versiones (
+            nombre TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.executemany(
+        'INSERT OR IGNORE INTO versiones (nombre, version) VALUES (?, 1)',
+        [(nombre,) for nombre in CONTADORES]
+    )
+
+
+def _leer_de_la_bd() -> None:
+    global _leido_en
+    conn = get_db()
+    try:
+        filas = conn.execute('SELECT nombre, version FROM versiones').fetchall()
+    except sqlite3.OperationalError:
+        filas = []
+    finally:
+        conn.close()
+    for fila in filas:
+        _versiones[fila['nombre']] = max(_versiones.get(fila['nombre'], 0), fila['version'])
+    _leido_en = time.monotonic()
+
+
+def actual(nombre: str) -> int:
+    """Versión actual de un contador, desde memoria salvo cada REVALIDAR_SEGUNDOS"""
+    if time.monotonic() - _leido_en > REVALIDAR_SEGUNDOS:
+        with _lock:
+            if time.monotonic() - _leido_en > REVALIDAR_SEGUNDOS:
+                _leer_de_la_bd()
+    return _versiones.get(nombre, 0)
+
+
+def incrementar(conn: sqlite3.Connection, nombre: str) -> int:
+    """
+    Sube un contador dentro de la transacción de 'conn' y devuelve el valor nuevo.
+    Después del commit hay que llamar a publicar() para que lo vea este proceso.
+    """
+    conn.execute('UPDATE versiones SET version = version + 1 WHERE nombre = ?', (nombre,))
+    return conn.execute('SELECT version FROM versiones WHERE nombre = ?', (nombre,)).fetchone()[0]
+
+
+def publicar(nombre: str, version: int) -> None:
+    with _lock:
+        _versiones[nombre] = max(_versiones.get(nombre, 0), version)
+
+
+def olvidar() -> None:
+    """Descarta las versiones en memoria para que se relean de la BD"""
+    global _leido_en
+    with _lock:
+        _versiones.clear()
+        _leido_en = 0.0
+
+
+def con_etag(*contadores: str):
+    """
+    Decorador para endpoints de lectura: responde con un ETag fuerte armado con
+    las versiones de los contadores indicados y devuelve 304 si el cliente manda
+    ese mismo ETag en If-None-Match, sin ejecutar la vista ni consultar SQLite.
+
+    La versión se lee antes de ejecutar la vista, así el contenido nunca es
+    más viejo que el ETag con el que sale. 'no-cache' hace que el navegador
+    revalide siempre con el ETag en lugar de adivinar cuánto tiempo guardarlo.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            global _respuestas_304
+            etag = '-'.join(f'{nombre[0]}{actual(nombre)}' for nombre in contadores)
+
+            if request.if_none_match.contains(etag):
+                _respuestas_304 += 1
+                respuesta = make_response('', 304)
+                respuesta.set_etag(etag)
+                respuesta.headers['Cache-Control'] = 'no-cache'
+                return respuesta
+
+            respuesta = make_response(vista(*args, **kwargs))
+            if respuesta.status_code == 200:
+                respuesta.set_etag(etag)
+                respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def estadisticas() -> Dict[str, int]:
+    return dict(_versiones, respuestas_304=_respuestas_304)
+
+
+metricas.registrar('versiones', estadisticas)
@@ -2,7 +2,7 @@
 // App.tsx - Componente Principal
 // ============================================
 
-import { useState, useRef, useEffect } from "react";
+import { useState, useRef, useEffect, useCallback } from "react";
 import "./App.css";
 import { WeeklyCalendar } from "./components/WeeklyCalendar";
 import { BuscadorMaterias } from "./BuscadorMaterias";
@@ -85,6 +85,18 @@ function App() {
     []
   );
   const [planesGenerados, setPlanesGenerados] = useState<Plan[]>([]);
+  const analisisPedidos = useRef<Set<number>>(new Set());
+  // Planes cuyo análisis falló: no se vuelven a pedir hasta generar planes nuevos
+  const analisisFallidos = useRef<Set<number>>(new Set());
+  // Los ids de plan son índices y se repiten entre generaciones: cada vez que
+  // se reemplazan los planes sube la generación y se descartan las respuestas viejas
+  const generacionPlanes = useRef(0);
+
+  const reiniciarAnalisis = () => {
+    generacionPlanes.current += 1;
+    analisisPedidos.current.clear();
+    analisisFallidos.current.clear();
+  };
   const [isGenerandoPlanes, setIsGenerandoPlanes] = useState(false);
 
   const [prioridadesGuardadas, setPrioridadesGuardadas] = useUserScopedPersistentState<Record<string, number>>(
@@ -127,6 +139,7 @@ function App() {
     setLoggedInUser(null);
     setIsDropdownOpen(false);
     setError(null);
+    reiniciarAnalisis();
     setPlanesGenerados([]);
     setActiveScreen("home");
   };
@@ -181,12 +194,13 @@ function App() {
         const planesConId = data.planes.map((cursos: Curso[], index: number) => ({
           id: index,
           cursos,
-          analisis: data.analisis ? data.analisis[index] : undefined,
+          analisis: data.analisis?.[index] ?? undefined,
         }));
 
         console.log("Planes con análisis:", planesConId);
         console.log("Data completa del backend:", data);
 
+        reiniciarAnalisis();
         setPlanesGenerados(planesConId);
         setActiveScreen("calendario");
         setIsSideMenuOpen(false);
@@ -207,7 +221,48 @@ function App() {
     }
   };
 
+  // Memorizado para que el efecto de WeeklyCalendar no lo vuelva a disparar en cada render
+  const handleSolicitarAnalisis = useCallback(async (index: number) => {
+    const plan = planesGenerados[index];
+    if (
+      !plan ||
+      plan.analisis ||
+      analisisPedidos.current.has(plan.id) ||
+      analisisFallidos.current.has(plan.id)
+    ) return;
+    analisisPedidos.current.add(plan.id);
+    const generacion = generacionPlanes.current;
+
+    try {
+      const response = await fetch("http://localhost:5000/api/scheduler/analizar-planes", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ planes: [plan.cursos.map((c) => c.codigo)] }),
+      });
+      const data = await response.json();
+      if (generacion !== generacionPlanes.current) return;
+
+      if (data.success) {
+        setPlanesGenerados((prev) =>
+          prev.map((p) => (p.id === plan.id ? { ...p, analisis: data.analisis[0] } : p))
+        );
+      } else {
+        analisisFallidos.current.add(plan.id);
+        console.error("Error al analizar el plan:", data.error);
+      }
+    } catch (err) {
+      if (generacion !== generacionPlanes.current) return;
+      analisisFallidos.current.add(plan.id);
+      console.error("Error al analizar el plan:", err);
+    } finally {
+      if (generacion === generacionPlanes.current) {
+        analisisPedidos.current.delete(plan.id);
+      }
+    }
+  }, [planesGenerados]);
+
   const handleLimpiarPlanes = () => {
+    reiniciarAnalisis();
     setPlanesGenerados([]);
     setCursosSeleccionados([]);
     setPrioridadesGuardadas({});
@@ -356,6 +411,7 @@ function App() {
           <WeeklyCalendar
             planesGenerados={planesGenerados}
             horariosExcluidos={horariosExcluidosGuardados}
+            onSolicitarAnalisis={handleSolicitarAnalisis}
           />
         )}
       </main>
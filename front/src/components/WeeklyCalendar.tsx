@@ -52,6 +52,7 @@ interface HorarioBloqueado {
 interface WeeklyCalendarProps {
   planesGenerados?: Plan[]
   horariosExcluidos?: HorarioBloqueado[]
+  onSolicitarAnalisis?: (index: number) => void
 }
 
 const DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
@@ -149,6 +150,7 @@ function TooltipAnalisis({ analisis }: { analisis: Analisis }) {
 export function WeeklyCalendar({
   planesGenerados = [],
   horariosExcluidos = [],
+  onSolicitarAnalisis,
 }: WeeklyCalendarProps) {
   const [planSeleccionado, setPlanSeleccionado] = useState<number>(0)
   const [coloresPorMateria, setColoresPorMateria] = useState<Record<string, string>>({})
@@ -173,6 +175,13 @@ export function WeeklyCalendar({
     }
   }, [planSeleccionado, planesGenerados])
 
+  // El backend sólo analiza los primeros planes; el resto se pide al verlos
+  useEffect(() => {
+    if (planesGenerados[planSeleccionado] && !planesGenerados[planSeleccionado].analisis) {
+      onSolicitarAnalisis?.(planSeleccionado)
+    }
+  }, [planSeleccionado, planesGenerados, onSolicitarAnalisis])
+
   useEffect(() => {
     const handleClick = (e: MouseEvent) => {
       const target = e.target as HTMLElement
@@ -336,6 +345,9 @@ export function WeeklyCalendar({
           left: rect.left + window.scrollX - 15,
         })
       }
+      if (!planesGenerados[index]?.analisis) {
+        onSolicitarAnalisis?.(index)
+      }
       setTooltipAbierto(index)
     }
   }